@@ -3,6 +3,8 @@ from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 
+from ..metrics import AUTOMATION_JOBS
+
 automation_router = APIRouter()
 
 class AutomationJob(BaseModel):
@@ -68,6 +70,7 @@ async def create_job(request: CreateJobRequest):
     }
     
     MOCK_JOBS.append(new_job)
+    AUTOMATION_JOBS.labels(request.job_type, "created").inc()
     return new_job
 
 @automation_router.get("/jobs/{job_id}", response_model=AutomationJob)
@@ -83,11 +86,13 @@ async def run_job(job_id: str):
     """Manually trigger job execution"""
     job = next((j for j in MOCK_JOBS if j["id"] == job_id), None)
     if not job:
+        AUTOMATION_JOBS.labels("unknown", "not_found").inc()
         raise HTTPException(status_code=404, detail="Job not found")
     
     # Simulate job execution
     job["status"] = "running"
     job["last_run"] = datetime.now()
+    AUTOMATION_JOBS.labels(job["job_type"], "started").inc()
     
     return {"message": "Job started successfully", "execution_id": "exec-123"}
 
@@ -99,4 +104,5 @@ async def pause_job(job_id: str):
         raise HTTPException(status_code=404, detail="Job not found")
     
     job["status"] = "paused"
+    AUTOMATION_JOBS.labels(job["job_type"], "paused").inc()
     return {"message": "Job paused successfully"}
\ No newline at end of file
@@ -0,0 +1,299 @@
+"""
+Health Monitoring for Luna Services
+
+Dependency probes (database pool, Supabase, LLM provider, Riva and the job
+scheduler's broker) run concurrently in the background on an interval, and
+the health endpoints answer instantly from the cached results. Load balancer
+probes therefore never trigger a Gemini call or a database round-trip.
+
+Liveness only reports whether the process and its monitor loop are running;
+readiness additionally requires the critical probes to be passing and fresh.
+
+Configuration (environment variables):
+    HEALTH_CHECK_INTERVAL     seconds between probe rounds (default 15)
+    HEALTH_PROBE_TIMEOUT      per-probe timeout in seconds (default 5)
+    HEALTH_CRITICAL_PROBES    probes required for readiness (default "database")
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .metrics import HEALTH_PROBE_LATENCY, HEALTH_PROBE_UP
+
+logger = logging.getLogger(__name__)
+
+Probe = Callable[[], Awaitable[Dict[str, Any]]]
+
+HEALTHY = "healthy"
+DEGRADED = "degraded"
+UNHEALTHY = "unhealthy"
+DISABLED = "disabled"
+UNKNOWN = "unknown"
+
+
+@dataclass
+class HealthConfig:
+    """Configuration for background health probing"""
+    interval: float = 15.0
+    timeout: float = 5.0
+    critical_probes: List[str] = field(default_factory=lambda: ["database"])
+
+    @property
+    def stale_after(self) -> float:
+        """Results older than this are not trusted for readiness"""
+        return self.interval * 3 + self.timeout
+
+
+def get_health_config() -> HealthConfig:
+    """Get health monitoring configuration from environment variables"""
+    critical = os.getenv("HEALTH_CRITICAL_PROBES", "database")
+    return HealthConfig(
+        interval=float(os.getenv("HEALTH_CHECK_INTERVAL", "15")),
+        timeout=float(os.getenv("HEALTH_PROBE_TIMEOUT", "5")),
+        critical_probes=[p.strip() for p in critical.split(",") if p.strip()],
+    )
+
+
+@dataclass
+class ProbeResult:
+    """Cached outcome of a single dependency probe"""
+    name: str
+    status: str = UNKNOWN
+    latency: Optional[float] = None
+    checked_at: Optional[float] = None
+    error: Optional[str] = None
+    details: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "checked_at": datetime.utcfromtimestamp(self.checked_at).isoformat() + "Z" if self.checked_at else None,
+            "error": self.error,
+            **self.details,
+        }
+
+
+class HealthMonitor:
+    """Runs registered probes in the background and serves cached results"""
+
+    def __init__(self, config: HealthConfig):
+        self.config = config
+        self.probes: Dict[str, Probe] = {}
+        self.results: Dict[str, ProbeResult] = {}
+        self.started_at = time.time()
+        self.last_round: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, probe: Probe):
+        """
+        Register a probe; it should return a dict with a "status" key or raise.
+        Probes holding connections can define an async ``close()``, called by ``stop()``.
+        """
+        self.probes[name] = probe
+        self.results[name] = ProbeResult(name)
+
+    async def _run_probe(self, name: str, probe: Probe) -> ProbeResult:
+        start = time.perf_counter()
+        try:
+            details = await asyncio.wait_for(probe(), timeout=self.config.timeout)
+            status = details.pop("status", HEALTHY)
+            result = ProbeResult(name, status, details=details)
+        except asyncio.TimeoutError:
+            result = ProbeResult(name, UNHEALTHY, error=f"timed out after {self.config.timeout:.1f}s")
+        except Exception as e:
+            result = ProbeResult(name, UNHEALTHY, error=str(e) or type(e).__name__)
+        result.latency = time.perf_counter() - start
+        result.checked_at = time.time()
+        HEALTH_PROBE_LATENCY.labels(name).set(result.latency)
+        HEALTH_PROBE_UP.labels(name).set(1 if result.status in (HEALTHY, DEGRADED, DISABLED) else 0)
+        return result
+
+    async def run_once(self):
+        """Run every probe concurrently and replace the cached results"""
+        names = list(self.probes)
+        results = await asyncio.gather(*(self._run_probe(n, self.probes[n]) for n in names))
+        for result in results:
+            if result.status == UNHEALTHY and self.results[result.name].status != UNHEALTHY:
+                logger.warning(f"Health probe {result.name} failed: {result.error}")
+            self.results[result.name] = result
+        self.last_round = time.time()
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Health probe round failed: {e}")
+            await asyncio.sleep(self.config.interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"Health monitor started with probes: {', '.join(self.probes)}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for name, probe in self.probes.items():
+            close = getattr(probe, "close", None)
+            if close is None:
+                continue
+            try:
+                await close()
+            except Exception as e:
+                logger.warning(f"Closing health probe {name} failed: {e}")
+
+    def _is_fresh(self, result: ProbeResult) -> bool:
+        return result.checked_at is not None and time.time() - result.checked_at <= self.config.stale_after
+
+    def liveness(self) -> Tuple[bool, Dict[str, Any]]:
+        """The process is live while it serves requests and the monitor loop hasn't died"""
+        monitor_running = self._task is not None and not self._task.done()
+        return monitor_running, {
+            "status": "alive" if monitor_running else "monitor_stopped",
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+        }
+
+    def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        """Ready when every critical probe has a fresh passing result"""
+        failing = []
+        for name in self.config.critical_probes:
+            result = self.results.get(name)
+            if result is None:
+                continue
+            if result.status not in (HEALTHY, DEGRADED) or not self._is_fresh(result):
+                failing.append(name)
+        ready = not failing and self.last_round is not None
+        return ready, {
+            "status": "ready" if ready else "not_ready",
+            "failing": failing,
+            "critical": self.config.critical_probes,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Full cached health report"""
+        statuses = []
+        critical_failed = False
+        for name, result in self.results.items():
+            status = result.status if self._is_fresh(result) or result.status == UNKNOWN else UNKNOWN
+            statuses.append(status)
+            if name in self.config.critical_probes and status not in (HEALTHY, DEGRADED):
+                critical_failed = True
+
+        if critical_failed:
+            overall = UNHEALTHY
+        elif all(s in (HEALTHY, DISABLED) for s in statuses):
+            overall = HEALTHY
+        else:
+            overall = DEGRADED
+
+        return {
+            "status": overall,
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "last_checked": datetime.utcfromtimestamp(self.last_round).isoformat() + "Z" if self.last_round else None,
+            "services": {name: result.to_dict() for name, result in self.results.items()},
+        }
+
+
+# ============================================================================
+# Default probes
+# ============================================================================
+
+async def probe_database() -> Dict[str, Any]:
+    """SELECT 1 through the SQLAlchemy pool and report pool usage"""
+    from sqlalchemy import text
+    from .database import engine
+
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return {"status": HEALTHY, "pool": engine.pool.status()}
+
+
+_http_client = None
+
+
+def _get_http_client():
+    global _http_client
+    if _http_client is None:
+        import httpx
+        _http_client = httpx.AsyncClient(timeout=5.0)
+    return _http_client
+
+
+async def probe_supabase() -> Dict[str, Any]:
+    """Query the Supabase auth health endpoint"""
+    from .database import SUPABASE_ANON_KEY, SUPABASE_URL
+
+    response = await _get_http_client().get(
+        f"{SUPABASE_URL}/auth/v1/health",
+        headers={"apikey": SUPABASE_ANON_KEY}
+    )
+    if response.status_code >= 500:
+        return {"status": UNHEALTHY, "http_status": response.status_code}
+    return {"status": HEALTHY, "http_status": response.status_code}
+
+
+def _mcp_service():
+    from .mcp.router import get_enhanced_mcp_service
+    return get_enhanced_mcp_service()
+
+
+async def probe_llm() -> Dict[str, Any]:
+    """Gemini model metadata lookup; never generates"""
+    return await _mcp_service().gemini_service.health_check()
+
+
+async def probe_riva() -> Dict[str, Any]:
+    """Riva gRPC channel readiness (fallback TTS reports as degraded)"""
+    service = _mcp_service()
+    if not service.riva_service:
+        return {"status": DISABLED, "message": "Riva service not initialized"}
+    return await service.riva_service.check_ready()
+
+
+class SchedulerProbe:
+    """Ping the job scheduler's Redis broker over one client kept for the monitor's lifetime"""
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or os.getenv("CELERY_BROKER_URL") or os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.client = None
+
+    async def __call__(self) -> Dict[str, Any]:
+        if self.client is None:
+            try:
+                import redis.asyncio as aioredis
+            except ImportError:
+                return {"status": DISABLED, "message": "redis client not installed"}
+            self.client = aioredis.from_url(self.url, socket_connect_timeout=2)
+        await self.client.ping()
+        return {"status": HEALTHY}
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+
+def create_health_monitor(config: Optional[HealthConfig] = None) -> HealthMonitor:
+    """Create a monitor with the default dependency probes registered"""
+    monitor = HealthMonitor(config or get_health_config())
+    monitor.register("database", probe_database)
+    monitor.register("supabase", probe_supabase)
+    monitor.register("llm", probe_llm)
+    monitor.register("riva", probe_riva)
+    monitor.register("scheduler", SchedulerProbe())
+    return monitor
+
+
+health_monitor = create_health_monitor()
@@ -1,4 +1,5 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
 import structlog
@@ -6,10 +7,16 @@ from contextlib import asynccontextmanager
 
 from .auth.router import auth_router
 from .automation.router import automation_router
-from .mcp.router import mcp_router
+from .mcp.router import mcp_router, shutdown_enhanced_mcp_service, start_enhanced_mcp_service
 from .database import init_db
+from .health import health_monitor
 from .middleware.logging import LoggingMiddleware
 from .middleware.auth import AuthMiddleware
+from .middleware.capture import TrafficCaptureMiddleware, get_capture_config
+from .middleware.metrics import MetricsMiddleware
+from .middleware.tracing import TracingMiddleware
+from .metrics import render_metrics
+from .tracing import get_tracer
 
 logger = structlog.get_logger()
 
@@ -17,10 +24,16 @@ logger = structlog.get_logger()
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Luna-service API")
+    get_tracer().start()
     await init_db()
+    health_monitor.start()
+    await start_enhanced_mcp_service()
     yield
     # Shutdown
     logger.info("Shutting down Luna-service API")
+    await health_monitor.stop()
+    await shutdown_enhanced_mcp_service()
+    get_tracer().shutdown()
 
 app = FastAPI(
     title="Luna-service API",
@@ -43,6 +56,16 @@ app.add_middleware(
 app.add_middleware(LoggingMiddleware)
 app.add_middleware(AuthMiddleware)
 
+# Opt-in traffic capture for replay (TRAFFIC_CAPTURE_ENABLED=true)
+capture_config = get_capture_config()
+if capture_config.enabled:
+    app.add_middleware(TrafficCaptureMiddleware, config=capture_config)
+
+app.add_middleware(MetricsMiddleware)
+
+# Added last so it wraps everything else; echoes X-Trace-Id/traceparent
+app.add_middleware(TracingMiddleware)
+
 # Security
 security = HTTPBearer()
 
@@ -61,26 +84,26 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {
-        "status": "healthy",
-        "timestamp": "2024-01-01T00:00:00Z",
-        "services": {
-            "api": "healthy",
-            "database": "healthy",
-            "redis": "healthy",
-            "celery": "healthy"
-        }
-    }
+    """Cached dependency health, refreshed in the background"""
+    return health_monitor.snapshot()
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: fails only if the process needs restarting"""
+    alive, body = health_monitor.liveness()
+    return JSONResponse(body, status_code=200 if alive else 503)
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe: fails while critical dependencies are down"""
+    ready, body = health_monitor.readiness()
+    return JSONResponse(body, status_code=200 if ready else 503)
 
 @app.get("/api/metrics")
 async def metrics():
     """Prometheus metrics endpoint"""
-    return {
-        "active_jobs": 24,
-        "total_users": 156,
-        "api_requests": 12450,
-        "error_rate": 0.02
-    }
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
 
 if __name__ == "__main__":
     import uvicorn
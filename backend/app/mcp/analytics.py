@@ -0,0 +1,194 @@
+"""
+Analytics Engine for Universal MCP
+
+Keeps incremental per-session, per-user and per-task aggregates (counts,
+success counts, latency and token sums, latency sketches) that are updated in
+O(1) per request, so dashboard queries no longer scan the request history.
+Raw events are kept only in a bounded ring buffer, and session/user aggregates
+are LRU-capped, so memory stays flat regardless of traffic. Every event is also
+appended to a columnar store for time-range and percentile queries.
+"""
+
+import logging
+import math
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from .analytics_store import ColumnarAnalyticsStore
+from .models import MCPAnalytics
+
+logger = logging.getLogger(__name__)
+
+
+class LatencySketch:
+    """
+    Fixed-size log-bucketed latency histogram.
+
+    Buckets grow geometrically by ``gamma`` from ``min_value`` seconds, so any
+    quantile is reported within a relative error of about (gamma - 1) / 2.
+    Insertion is O(1) and quantiles scan a constant number of buckets.
+    """
+
+    __slots__ = ("gamma", "min_value", "_log_gamma", "counts", "count", "max_value")
+
+    def __init__(self, gamma: float = 1.05, min_value: float = 0.001, max_value: float = 3600.0):
+        self.gamma = gamma
+        self.min_value = min_value
+        self._log_gamma = math.log(gamma)
+        size = int(math.ceil(math.log(max_value / min_value) / self._log_gamma)) + 2
+        self.counts = [0] * size
+        self.count = 0
+        self.max_value = 0.0
+
+    def bucket_index(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        return min(len(self.counts) - 1, int(math.log(value / self.min_value) / self._log_gamma) + 1)
+
+    def add(self, value: float):
+        self.counts[self.bucket_index(value)] += 1
+        self.count += 1
+        if value > self.max_value:
+            self.max_value = value
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen > rank:
+                if index == 0:
+                    return self.min_value
+                # Geometric midpoint of the bucket
+                upper = self.min_value * self.gamma ** index
+                return min(upper / math.sqrt(self.gamma), self.max_value)
+        return self.max_value
+
+
+class Aggregate:
+    """Running totals for one session, user, task type or the whole service"""
+
+    __slots__ = ("count", "successes", "total_latency", "total_tokens",
+                 "task_counts", "latency", "first_seen", "last_seen")
+
+    def __init__(self):
+        self.count = 0
+        self.successes = 0
+        self.total_latency = 0.0
+        self.total_tokens = 0
+        self.task_counts: Dict[str, int] = {}
+        self.latency = LatencySketch()
+        self.first_seen: Optional[datetime] = None
+        self.last_seen: Optional[datetime] = None
+
+    def add(self, event: MCPAnalytics):
+        self.count += 1
+        if event.success:
+            self.successes += 1
+        self.total_latency += event.response_time
+        self.total_tokens += event.tokens_used
+        task_type = event.task_type.value
+        self.task_counts[task_type] = self.task_counts.get(task_type, 0) + 1
+        self.latency.add(event.response_time)
+        if self.first_seen is None:
+            self.first_seen = event.created_at
+        self.last_seen = event.created_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_requests": self.count,
+            "task_distribution": dict(self.task_counts),
+            "avg_response_time": self.total_latency / self.count if self.count else 0.0,
+            "success_rate": self.successes / self.count * 100 if self.count else 0.0,
+            "total_tokens": self.total_tokens,
+            "latency_percentiles": {
+                "p50": self.latency.quantile(0.50),
+                "p95": self.latency.quantile(0.95),
+                "p99": self.latency.quantile(0.99),
+            },
+            "first_request": self.first_seen.isoformat() if self.first_seen else None,
+            "last_request": self.last_seen.isoformat() if self.last_seen else None,
+        }
+
+
+class _LRUAggregates:
+    """Aggregates keyed by id, evicting the least recently updated key past ``max_keys``"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._items: "OrderedDict[str, Aggregate]" = OrderedDict()
+
+    def update(self, key: str, event: MCPAnalytics):
+        aggregate = self._items.get(key)
+        if aggregate is None:
+            aggregate = self._items[key] = Aggregate()
+            if len(self._items) > self.max_keys:
+                self._items.popitem(last=False)
+        else:
+            self._items.move_to_end(key)
+        aggregate.add(event)
+
+    def get(self, key: str) -> Optional[Aggregate]:
+        return self._items.get(key)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class AnalyticsEngine:
+    """Bounded analytics store with O(1) recording and constant-time summaries"""
+
+    def __init__(self, max_events: int = 10000, max_keys: int = 10000,
+                 store_max_rows: int = 2_000_000):
+        self.events: Deque[MCPAnalytics] = deque(maxlen=max_events)
+        self.store = ColumnarAnalyticsStore(max_rows=store_max_rows)
+        self.sessions = _LRUAggregates(max_keys)
+        self.users = _LRUAggregates(max_keys)
+        self.tasks: Dict[str, Aggregate] = {}
+        self.overall = Aggregate()
+        self._lock = threading.Lock()
+
+    def record(self, event: MCPAnalytics):
+        """Record one request; O(1) in the number of events seen"""
+        with self._lock:
+            self.events.append(event)
+            self.overall.add(event)
+            self.sessions.update(event.session_id, event)
+            if event.user_id:
+                self.users.update(event.user_id, event)
+            task_type = event.task_type.value
+            aggregate = self.tasks.get(task_type)
+            if aggregate is None:
+                aggregate = self.tasks[task_type] = Aggregate()
+            aggregate.add(event)
+        self.store.append(event)
+
+    def session_summary(self, session_id: str) -> Dict[str, Any]:
+        with self._lock:
+            aggregate = self.sessions.get(session_id)
+            return (aggregate or Aggregate()).to_dict()
+
+    def user_summary(self, user_id: str) -> Dict[str, Any]:
+        with self._lock:
+            aggregate = self.users.get(user_id)
+            return (aggregate or Aggregate()).to_dict()
+
+    def task_summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {task_type: aggregate.to_dict() for task_type, aggregate in self.tasks.items()}
+
+    def overall_summary(self) -> Dict[str, Any]:
+        with self._lock:
+            summary = self.overall.to_dict()
+            summary["tracked_sessions"] = len(self.sessions)
+            summary["tracked_users"] = len(self.users)
+            summary["buffered_events"] = len(self.events)
+            return summary
+
+    def recent_events(self, limit: int = 100) -> List[MCPAnalytics]:
+        with self._lock:
+            return list(self.events)[-limit:]
@@ -0,0 +1,407 @@
+"""
+Durable Analytics Event Log for Universal MCP
+
+Analytics events are enqueued without blocking the request path and written
+in batches by a background task to compact, append-only segment files (one
+JSON array per line, one file per worker process per hour). A rollup job
+folds new segment data into precomputed hourly and daily aggregates per user
+and task type, which the dashboards read instead of raw events, so analytics
+history survives worker restarts.
+
+The rollup job tracks a byte offset per segment file, so it is incremental
+and can run every minute; a file lock ensures only one worker rolls up at a
+time. It can also be run from cron:
+
+    python -m backend.app.mcp.analytics_log rollup --dir data/analytics
+
+Configuration (environment variables):
+    MCP_ANALYTICS_LOG_ENABLED     true/false (default true)
+    MCP_ANALYTICS_LOG_DIR         base directory (default data/analytics)
+    MCP_ANALYTICS_ROLLUP_INTERVAL seconds between in-process rollups (default 60, 0 disables)
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .analytics import LatencySketch
+from .models import MCPAnalytics
+from ..tracing import run_in_thread
+
+logger = logging.getLogger(__name__)
+
+# Column order of a segment row
+EVENT_FIELDS = ("ts", "request_id", "session_id", "user_id", "task_type", "language",
+                "success", "latency", "tokens")
+
+# Rollup cell layout: [count, successes, latency_sum, tokens, {sketch_bucket: count}]
+COUNT, SUCCESSES, LATENCY_SUM, TOKENS, LATENCY_BUCKETS = range(5)
+
+HOUR_FORMAT = "%Y-%m-%dT%H"
+DAY_FORMAT = "%Y-%m-%d"
+
+
+def _utc(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+def event_to_row(event: MCPAnalytics) -> List[Any]:
+    created_at = event.created_at
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return [
+        round(created_at.timestamp(), 3),
+        event.request_id,
+        event.session_id,
+        event.user_id,
+        event.task_type.value,
+        event.language.value if event.language else None,
+        1 if event.success else 0,
+        round(event.response_time, 4),
+        event.tokens_used,
+    ]
+
+
+# ============================================================================
+# Segment writer
+# ============================================================================
+
+class SegmentFileWriter:
+    """Appends rows to hourly segment files named events-<hour>-<pid>.log"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory / "segments"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._hour: Optional[str] = None
+        self._file = None
+
+    def _file_for(self, hour: str):
+        if hour != self._hour:
+            self.close()
+            path = self.directory / f"events-{hour}-{os.getpid()}.log"
+            self._file = open(path, "a", encoding="utf-8")
+            self._hour = hour
+        return self._file
+
+    def write(self, rows: List[List[Any]]):
+        # Group by hour so a batch spanning the boundary lands in the right files
+        by_hour: Dict[str, List[str]] = {}
+        for row in rows:
+            hour = _utc(row[0]).strftime("%Y%m%d%H")
+            by_hour.setdefault(hour, []).append(json.dumps(row, separators=(",", ":")))
+        for hour, lines in by_hour.items():
+            handle = self._file_for(hour)
+            handle.write("\n".join(lines) + "\n")
+            handle.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._hour = None
+
+
+class AnalyticsEventLog:
+    """Non-blocking enqueue with a batched background writer"""
+
+    def __init__(self, directory: str, batch_size: int = 500, flush_interval: float = 1.0,
+                 max_queue: int = 50000):
+        self.directory = Path(directory)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.writer = SegmentFileWriter(self.directory)
+        # None in the queue tells the writer to finish its batch and stop
+        self._queue: "asyncio.Queue[Optional[List[Any]]]" = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+
+    def enqueue(self, event: MCPAnalytics):
+        """Queue an event for durable storage; never blocks the caller"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        try:
+            self._queue.put_nowait(event_to_row(event))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Analytics event log queue full, {self.dropped} events dropped")
+
+    async def _next_batch(self) -> Tuple[List[List[Any]], bool]:
+        """Up to batch_size rows, and whether the stop sentinel was reached"""
+        row = await self._queue.get()
+        if row is None:
+            return [], True
+        batch = [row]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                row = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if row is None:
+                return batch, True
+            batch.append(row)
+        return batch, False
+
+    async def _run(self):
+        while True:
+            batch, stopping = await self._next_batch()
+            if batch:
+                try:
+                    await run_in_thread("analytics.write_segment", self.writer.write, batch)
+                except Exception as e:
+                    logger.error(f"Failed to write {len(batch)} analytics events: {e}")
+            if stopping:
+                return
+
+    async def flush(self):
+        """Write everything queued so far (used on shutdown, once the writer task has stopped)"""
+        batch = []
+        while not self._queue.empty():
+            row = self._queue.get_nowait()
+            if row is not None:
+                batch.append(row)
+        if batch:
+            await run_in_thread("analytics.write_segment", self.writer.write, batch)
+
+    async def close(self):
+        """
+        Stop the writer after it has written everything queued, including the
+        batch it is assembling; cancelling it would lose that batch and leave a
+        write thread racing ``writer.close``
+        """
+        if self._task is not None and not self._task.done():
+            # enqueue() keeps queueing behind the sentinel until the task is done
+            await self._queue.put(None)
+            await self._task
+        self._task = None
+        # Events queued behind the sentinel while the writer finished
+        await self.flush()
+        self.writer.close()
+
+
+# ============================================================================
+# Rollups
+# ============================================================================
+
+class AnalyticsRollup:
+    """Incrementally folds segment files into hourly and daily aggregates"""
+
+    def __init__(self, directory: str, retention_days: int = 30):
+        self.directory = Path(directory)
+        self.retention_days = retention_days
+        self.segments = self.directory / "segments"
+        self.rollups = self.directory / "rollups"
+        self.state_path = self.rollups / "state.json"
+        self.rollups.mkdir(parents=True, exist_ok=True)
+        self._sketch = LatencySketch()
+
+    def _load(self, path: Path) -> Dict[str, Any]:
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def _save(self, path: Path, data: Dict[str, Any]):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _add(cell: Optional[List[Any]], success: int, latency: float, tokens: int, bucket: str) -> List[Any]:
+        if cell is None:
+            cell = [0, 0, 0.0, 0, {}]
+        cell[COUNT] += 1
+        cell[SUCCESSES] += success
+        cell[LATENCY_SUM] += latency
+        cell[TOKENS] += tokens
+        cell[LATENCY_BUCKETS][bucket] = cell[LATENCY_BUCKETS].get(bucket, 0) + 1
+        return cell
+
+    def _read_new_rows(self, state: Dict[str, int]) -> List[List[Any]]:
+        rows = []
+        for path in sorted(self.segments.glob("events-*.log")):
+            offset = state.get(path.name, 0)
+            if path.stat().st_size <= offset:
+                continue
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+            # Only consume complete lines; a writer may be mid-append
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                if line:
+                    rows.append(json.loads(line))
+            state[path.name] = offset + end
+        return rows
+
+    def _expire_segments(self, state: Dict[str, int]):
+        """Delete fully rolled-up segment files older than the retention period"""
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.retention_days)).strftime("%Y%m%d%H")
+        for path in self.segments.glob("events-*.log"):
+            hour = path.name.split("-")[1]
+            if hour < cutoff and state.get(path.name, 0) >= path.stat().st_size:
+                path.unlink()
+                state.pop(path.name, None)
+
+    def run(self) -> int:
+        """Fold new segment rows into the rollups; returns rows processed (0 if another worker holds the lock)"""
+        with open(self.rollups / "rollup.lock", "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+
+            state = self._load(self.state_path)
+            rows = self._read_new_rows(state)
+            if not rows:
+                self._expire_segments(state)
+                self._save(self.state_path, state)
+                return 0
+
+            hourly_files: Dict[str, Dict[str, Any]] = {}
+            daily_files: Dict[str, Dict[str, Any]] = {}
+            for row in rows:
+                ts, _, session_id, user_id, task_type, _, success, latency, tokens = row
+                when = _utc(ts)
+                user = user_id or session_id
+                key = f"{user}|{task_type}"
+                bucket = str(self._sketch.bucket_index(latency))
+
+                day_file = when.strftime(DAY_FORMAT)
+                hourly = hourly_files.get(day_file)
+                if hourly is None:
+                    hourly = hourly_files[day_file] = self._load(self.rollups / "hourly" / f"{day_file}.json")
+                cells = hourly.setdefault(when.strftime(HOUR_FORMAT), {})
+                cells[key] = self._add(cells.get(key), success, latency, tokens, bucket)
+
+                month_file = when.strftime("%Y-%m")
+                daily = daily_files.get(month_file)
+                if daily is None:
+                    daily = daily_files[month_file] = self._load(self.rollups / "daily" / f"{month_file}.json")
+                cells = daily.setdefault(when.strftime(DAY_FORMAT), {})
+                cells[key] = self._add(cells.get(key), success, latency, tokens, bucket)
+
+            for name, data in hourly_files.items():
+                self._save(self.rollups / "hourly" / f"{name}.json", data)
+            for name, data in daily_files.items():
+                self._save(self.rollups / "daily" / f"{name}.json", data)
+            # State last: a crash before this re-processes rows rather than losing them
+            self._save(self.state_path, state)
+            return len(rows)
+
+    def _cells(self, bucket: str, since: datetime) -> List[Tuple[str, Dict[str, Any]]]:
+        """(bucket key, cells) pairs at or after ``since``, in time order"""
+        now = datetime.now(timezone.utc)
+        if bucket == "hour":
+            files = {(since + timedelta(days=d)).strftime(DAY_FORMAT) for d in range((now - since).days + 2)}
+            directory, key_format = self.rollups / "hourly", HOUR_FORMAT
+        else:
+            files = {(since + timedelta(days=d)).strftime("%Y-%m") for d in range((now - since).days + 32)}
+            directory, key_format = self.rollups / "daily", DAY_FORMAT
+        start_key = since.strftime(key_format)
+        result = []
+        for name in sorted(files):
+            for key, cells in sorted(self._load(directory / f"{name}.json").items()):
+                if key >= start_key:
+                    result.append((key, cells))
+        return result
+
+    def user_report(self, user_id: str, days: int = 30, bucket: str = "day") -> Dict[str, Any]:
+        """
+        Dashboard payload for a user, computed from rollups only; same shape as
+        ``ColumnarAnalyticsStore.user_report``. Rollups are hourly at the finest,
+        so ``bucket`` is "hour" or "day".
+        """
+        if bucket not in ("hour", "day"):
+            raise ValueError(f"Rollups have no {bucket!r} buckets; use 'hour' or 'day'")
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        key_format = HOUR_FORMAT if bucket == "hour" else DAY_FORMAT
+        prefix = f"{user_id}|"
+
+        totals = [0, 0, 0.0, 0]
+        sketch = LatencySketch()
+        task_counts: Dict[str, int] = {}
+        task_tokens: Dict[str, int] = {}
+        timeline = []
+        for key, cells in self._cells(bucket, since):
+            # Naive UTC isoformat, like the columnar store's bucket_start
+            point = {"bucket_start": datetime.strptime(key, key_format).isoformat(),
+                     "requests": 0, "errors": 0, "tokens": 0}
+            point_sketch = LatencySketch()
+            for cell_key, cell in cells.items():
+                if not cell_key.startswith(prefix):
+                    continue
+                task_type = cell_key[len(prefix):]
+                totals[COUNT] += cell[COUNT]
+                totals[SUCCESSES] += cell[SUCCESSES]
+                totals[LATENCY_SUM] += cell[LATENCY_SUM]
+                totals[TOKENS] += cell[TOKENS]
+                task_counts[task_type] = task_counts.get(task_type, 0) + cell[COUNT]
+                task_tokens[task_type] = task_tokens.get(task_type, 0) + cell[TOKENS]
+                for index, count in cell[LATENCY_BUCKETS].items():
+                    sketch.counts[int(index)] += count
+                    point_sketch.counts[int(index)] += count
+                sketch.count += cell[COUNT]
+                point_sketch.count += cell[COUNT]
+                point["requests"] += cell[COUNT]
+                point["errors"] += cell[COUNT] - cell[SUCCESSES]
+                point["tokens"] += cell[TOKENS]
+            if point["requests"]:
+                point_sketch.max_value = float("inf")
+                point["p50_latency"] = point_sketch.quantile(0.50)
+                point["p95_latency"] = point_sketch.quantile(0.95)
+                timeline.append(point)
+
+        total = totals[COUNT]
+        sketch.max_value = float("inf")
+        return {
+            "total_requests": total,
+            "successful_requests": totals[SUCCESSES],
+            "success_rate": totals[SUCCESSES] / total if total else 0,
+            "avg_execution_time": totals[LATENCY_SUM] / total if total else 0,
+            "latency_percentiles": {
+                "p50": sketch.quantile(0.50),
+                "p95": sketch.quantile(0.95),
+                "p99": sketch.quantile(0.99),
+            },
+            "total_tokens_used": totals[TOKENS],
+            "task_type_breakdown": task_counts,
+            "tokens_by_task_type": task_tokens,
+            "timeline": timeline,
+            "period_days": days,
+            "source": "rollups",
+        }
+
+
+async def run_rollups_periodically(rollup: AnalyticsRollup, interval: float):
+    """Background loop running the rollup job off the event loop"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            processed = await run_in_thread("analytics.rollup", rollup.run)
+            if processed:
+                logger.info(f"Rolled up {processed} analytics events")
+        except Exception as e:
+            logger.error(f"Analytics rollup failed: {e}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Roll up MCP analytics segment files")
+    parser.add_argument("command", choices=["rollup"])
+    parser.add_argument("--dir", default=os.getenv("MCP_ANALYTICS_LOG_DIR", "data/analytics"))
+    args = parser.parse_args()
+    print(f"Rolled up {AnalyticsRollup(args.dir).run()} events")
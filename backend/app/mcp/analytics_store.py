@@ -0,0 +1,221 @@
+"""
+Columnar Analytics Store for Universal MCP
+
+Stores analytics events as parallel NumPy columns (timestamp, user index,
+task type code, latency, tokens, success) in fixed-size, append-only
+segments. Queries are vectorized over whole segments, and segments entirely
+outside the requested time range are skipped using their min/max timestamps,
+so time-bucketed counts, latency percentiles and token totals stay fast over
+millions of rows. The oldest segments are dropped past ``max_rows``.
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .models import MCPAnalytics, MCPTaskType
+
+TASK_TYPES: List[MCPTaskType] = list(MCPTaskType)
+TASK_CODES: Dict[MCPTaskType, int] = {task_type: code for code, task_type in enumerate(TASK_TYPES)}
+
+BUCKET_SECONDS = {"minute": 60, "hour": 3600, "day": 86400}
+
+
+def _epoch(value: datetime) -> float:
+    """Epoch seconds; naive datetimes are UTC throughout the MCP models"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class _Segment:
+    """Preallocated column arrays; rows are only ever appended"""
+
+    __slots__ = ("ts", "user", "task", "latency", "tokens", "success", "length")
+
+    def __init__(self, capacity: int):
+        self.ts = np.empty(capacity, dtype=np.float64)
+        self.user = np.empty(capacity, dtype=np.int32)
+        self.task = np.empty(capacity, dtype=np.int8)
+        self.latency = np.empty(capacity, dtype=np.float32)
+        self.tokens = np.empty(capacity, dtype=np.int32)
+        self.success = np.empty(capacity, dtype=np.bool_)
+        self.length = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.ts.shape[0]
+
+
+class ColumnarAnalyticsStore:
+    """Append-only, segment-chunked columnar store with vectorized queries"""
+
+    def __init__(self, segment_size: int = 65536, max_rows: int = 2_000_000):
+        self.segment_size = segment_size
+        self.max_segments = max(1, max_rows // segment_size)
+        self.segments: List[_Segment] = [_Segment(segment_size)]
+        self.user_ids: List[str] = []
+        self._user_index: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(segment.length for segment in self.segments)
+
+    def _intern_user(self, user_id: str) -> int:
+        index = self._user_index.get(user_id)
+        if index is None:
+            index = self._user_index[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+        return index
+
+    def append(self, event: MCPAnalytics):
+        """Append one event; amortized O(1)"""
+        with self._lock:
+            segment = self.segments[-1]
+            if segment.length == segment.capacity:
+                segment = _Segment(self.segment_size)
+                self.segments.append(segment)
+                if len(self.segments) > self.max_segments:
+                    self.segments.pop(0)
+            i = segment.length
+            segment.ts[i] = _epoch(event.created_at)
+            segment.user[i] = self._intern_user(event.user_id or event.session_id)
+            segment.task[i] = TASK_CODES[event.task_type]
+            segment.latency[i] = event.response_time
+            segment.tokens[i] = event.tokens_used
+            segment.success[i] = event.success
+            segment.length = i + 1
+
+    def _select(self, user_id: Optional[str], task_type: Optional[MCPTaskType],
+                since: Optional[datetime], until: Optional[datetime]) -> Optional[Dict[str, np.ndarray]]:
+        """Gather the matching rows of every column, or None if nothing can match"""
+        with self._lock:
+            user = self._user_index.get(user_id) if user_id is not None else None
+            if user_id is not None and user is None:
+                return None
+            # Snapshot (segment, length) pairs; rows below length are immutable
+            segments = [(s, s.length) for s in self.segments if s.length]
+
+        start = _epoch(since) if since else None
+        end = _epoch(until) if until else None
+        parts: Dict[str, List[np.ndarray]] = {c: [] for c in ("ts", "user", "task", "latency", "tokens", "success")}
+
+        for segment, length in segments:
+            ts = segment.ts[:length]
+            # Rows are appended in time order, so the ends bound the segment
+            if (start is not None and ts[-1] < start) or (end is not None and ts[0] >= end):
+                continue
+            mask = np.ones(length, dtype=np.bool_)
+            if start is not None:
+                mask &= ts >= start
+            if end is not None:
+                mask &= ts < end
+            if user is not None:
+                mask &= segment.user[:length] == user
+            if task_type is not None:
+                mask &= segment.task[:length] == TASK_CODES[task_type]
+            if not mask.any():
+                continue
+            for column in parts:
+                parts[column].append(getattr(segment, column)[:length][mask])
+
+        if not parts["ts"]:
+            return None
+        return {column: np.concatenate(arrays) for column, arrays in parts.items()}
+
+    @staticmethod
+    def _percentiles(latency: np.ndarray) -> Dict[str, float]:
+        if latency.size == 0:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+        p50, p95, p99 = np.percentile(latency, [50, 95, 99])
+        return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+    def summary(self, user_id: Optional[str] = None, task_type: Optional[MCPTaskType] = None,
+                since: Optional[datetime] = None, until: Optional[datetime] = None) -> Dict[str, Any]:
+        """Counts, success rate, latency percentiles and token totals for the matching rows"""
+        rows = self._select(user_id, task_type, since, until)
+        if rows is None:
+            return {
+                "total_requests": 0,
+                "successful_requests": 0,
+                "success_rate": 0,
+                "avg_execution_time": 0,
+                "latency_percentiles": self._percentiles(np.empty(0)),
+                "total_tokens_used": 0,
+                "task_type_breakdown": {},
+                "tokens_by_task_type": {},
+            }
+
+        total = int(rows["ts"].size)
+        successful = int(np.count_nonzero(rows["success"]))
+        task_counts = np.bincount(rows["task"], minlength=len(TASK_TYPES))
+        task_tokens = np.bincount(rows["task"], weights=rows["tokens"], minlength=len(TASK_TYPES))
+        return {
+            "total_requests": total,
+            "successful_requests": successful,
+            "success_rate": successful / total,
+            "avg_execution_time": float(rows["latency"].mean()),
+            "latency_percentiles": self._percentiles(rows["latency"]),
+            "total_tokens_used": int(rows["tokens"].sum(dtype=np.int64)),
+            "task_type_breakdown": {
+                TASK_TYPES[code].value: int(count) for code, count in enumerate(task_counts) if count
+            },
+            "tokens_by_task_type": {
+                TASK_TYPES[code].value: int(task_tokens[code]) for code, count in enumerate(task_counts) if count
+            },
+        }
+
+    def time_buckets(self, bucket: str = "day", user_id: Optional[str] = None,
+                     task_type: Optional[MCPTaskType] = None, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Per-bucket request/error counts, token totals and latency percentiles"""
+        width = BUCKET_SECONDS[bucket]
+        rows = self._select(user_id, task_type, since, until)
+        if rows is None:
+            return []
+
+        keys = np.floor_divide(rows["ts"], width).astype(np.int64)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse)
+        successes = np.bincount(inverse, weights=rows["success"])
+        tokens = np.bincount(inverse, weights=rows["tokens"])
+
+        # Sort latencies within each bucket once, then index percentiles directly
+        order = np.lexsort((rows["latency"], inverse))
+        sorted_latency = rows["latency"][order]
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+
+        def bucket_percentile(i: int, q: float) -> float:
+            return float(sorted_latency[offsets[i] + int(q * (counts[i] - 1))])
+
+        return [
+            {
+                "bucket_start": datetime.utcfromtimestamp(int(key) * width).isoformat(),
+                "requests": int(counts[i]),
+                "errors": int(counts[i] - successes[i]),
+                "tokens": int(tokens[i]),
+                "p50_latency": bucket_percentile(i, 0.50),
+                "p95_latency": bucket_percentile(i, 0.95),
+            }
+            for i, key in enumerate(unique_keys)
+        ]
+
+    def top_users_by_tokens(self, limit: int = 10, since: Optional[datetime] = None) -> List[Tuple[str, int]]:
+        """Users with the highest token usage in the window"""
+        rows = self._select(None, None, since, None)
+        if rows is None:
+            return []
+        totals = np.bincount(rows["user"], weights=rows["tokens"])
+        top = np.argsort(totals)[::-1][:limit]
+        return [(self.user_ids[i], int(totals[i])) for i in top if totals[i] > 0]
+
+    def user_report(self, user_id: str, days: int = 30, bucket: str = "day") -> Dict[str, Any]:
+        """Dashboard payload for /analytics/user"""
+        since = datetime.utcnow() - timedelta(days=days)
+        report = self.summary(user_id=user_id, since=since)
+        report["timeline"] = self.time_buckets(bucket, user_id=user_id, since=since)
+        report["period_days"] = days
+        report["source"] = "memory"
+        return report
@@ -0,0 +1,138 @@
+"""
+Streaming Speech Recognition over WebSocket for Universal MCP
+
+``/ws/{session_id}/asr`` takes microphone audio as it is captured and answers
+with transcripts while the user is still speaking. Every final transcript is
+submitted as a voice command right away, without waiting for the rest of the
+audio, and its response is sent back on the same socket.
+
+Client frames:
+    binary                      16-bit mono PCM at the negotiated sample rate
+    {"type": "end"}             no more audio; remaining results follow, then "done"
+
+Server frames (JSON text):
+    {"type": "partial", "text": ...}
+    {"type": "final", "text": ..., "request_id": ...}
+    {"type": "response", "request_id": ..., "data": MCPResponse}
+    {"type": "error", "message": ...}
+    {"type": "done"}
+"""
+
+import asyncio
+import json
+import logging
+from contextlib import aclosing
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from .models import MCPRequest, MCPSession, MCPTaskType
+from .timing import serialize_response
+from ..tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingASRConnection:
+    """Runs one streaming recognition session over an accepted WebSocket"""
+
+    def __init__(self, websocket: WebSocket, service: Any, session: MCPSession,
+                 language: Optional[str] = None, sample_rate: int = 16000, process: bool = True):
+        self.websocket = websocket
+        self.service = service
+        self.session = session
+        self.language = language
+        self.sample_rate = sample_rate
+        self.process = process
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.disconnected = False
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, frame: Dict[str, Any]):
+        if self.disconnected:
+            return
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps(frame, separators=(",", ":")))
+
+    async def serve(self):
+        """Recognize until the client ends the audio or disconnects"""
+        try:
+            transcripts = self.service.riva_service.stream_recognition(
+                self._audio(), self.language, self.sample_rate
+            )
+            async with aclosing(transcripts):
+                async for text, is_final in transcripts:
+                    if self.disconnected:
+                        break
+                    if not is_final:
+                        await self.send({"type": "partial", "text": text})
+                    else:
+                        await self._final(text)
+            if self.disconnected:
+                # Nobody is left to answer; close() cancels the commands still running
+                return
+            if self.tasks:
+                await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+            await self.send({"type": "done"})
+        except WebSocketDisconnect:
+            self.disconnected = True
+        except Exception as e:
+            logger.error(f"Streaming recognition failed for session {self.session.id}: {e}")
+            await self.send({"type": "error", "message": str(e)})
+        finally:
+            await self.close()
+
+    async def close(self):
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _audio(self) -> AsyncGenerator[bytes, None]:
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                self.disconnected = True
+                return
+            if message.get("bytes") is not None:
+                yield message["bytes"]
+            elif message.get("text"):
+                try:
+                    frame = json.loads(message["text"])
+                except ValueError:
+                    continue
+                if frame.get("type") == "end":
+                    return
+
+    async def _final(self, text: str):
+        text = text.strip()
+        if not text or self.disconnected:
+            return
+        request = MCPRequest(
+            task_type=MCPTaskType.VOICE_COMMAND,
+            user_id=self.session.user_id,
+            project_id=self.session.project_id,
+            prompt=text,
+            metadata={"session_id": self.session.id, "source": "streaming_asr"}
+        )
+        await self.send({"type": "final", "text": text, "request_id": request.id})
+        if self.process:
+            # Processing overlaps with recognition of whatever the user says next
+            task = asyncio.create_task(self._process(request))
+            self.tasks[request.id] = task
+            task.add_done_callback(lambda done: self.tasks.pop(request.id, None))
+
+    async def _process(self, request: MCPRequest):
+        try:
+            with get_tracer().span(
+                "WS /api/mcp/ws/{session_id}/asr", kind="server",
+                **{"mcp.session_id": self.session.id, "mcp.task_type": request.task_type.value}
+            ):
+                response = await self.service.process_request(request)
+            await self.send({"type": "response", "request_id": request.id, "data": serialize_response(response)})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Voice command {request.id} from streaming ASR failed: {e}")
+            await self.send({"type": "error", "request_id": request.id, "message": str(e)})
@@ -0,0 +1,86 @@
+"""
+Binary Audio Helpers for Universal MCP
+
+Voice audio travels through the service as raw bytes (or memoryviews over
+them) rather than base64 strings. Only the JSON endpoints encode to base64, at
+the edge. This module wraps 16-bit PCM in a WAV container and slices a buffer
+into chunks for streamed responses without copying the samples.
+"""
+
+import struct
+from typing import Iterator, Tuple, Union
+
+# Anything exposing the buffer protocol over raw audio bytes
+AudioBuffer = Union[bytes, bytearray, memoryview]
+
+STREAM_CHUNK_BYTES = 32 * 1024
+
+# Shared all-zero buffer that silence() hands out views of; grows to the longest request
+_silence = b""
+
+
+def wav_header(data_bytes: int, sample_rate: int, channels: int = 1, sample_width: int = 2) -> bytes:
+    """44-byte RIFF header for ``data_bytes`` of little-endian PCM"""
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_bytes, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, byte_rate, channels * sample_width, sample_width * 8,
+        b"data", data_bytes
+    )
+
+
+def iter_chunks(audio: AudioBuffer, chunk_size: int = STREAM_CHUNK_BYTES) -> Iterator[memoryview]:
+    """Zero-copy slices of ``audio``"""
+    view = memoryview(audio).cast("B")
+    for offset in range(0, len(view), chunk_size):
+        yield view[offset:offset + chunk_size]
+
+
+def iter_wav(pcm: AudioBuffer, sample_rate: int, chunk_size: int = STREAM_CHUNK_BYTES) -> Iterator[AudioBuffer]:
+    """A WAV file as its header followed by zero-copy slices of the PCM samples"""
+    view = memoryview(pcm).cast("B")
+    yield wav_header(len(view), sample_rate)
+    yield from iter_chunks(view, chunk_size)
+
+
+def to_wav(pcm: AudioBuffer, sample_rate: int) -> bytes:
+    """A complete WAV file in one buffer (a single copy of the samples)"""
+    view = memoryview(pcm).cast("B")
+    return b"".join((wav_header(len(view), sample_rate), view))
+
+
+def silence(num_bytes: int) -> memoryview:
+    """``num_bytes`` of 16-bit silence as a read-only view of one shared buffer"""
+    global _silence
+    num_bytes -= num_bytes % 2
+    if num_bytes > len(_silence):
+        _silence = bytes(max(num_bytes, 2 * len(_silence)))
+    return memoryview(_silence)[:num_bytes]
+
+
+def wav_pcm(data: AudioBuffer) -> Tuple[memoryview, int]:
+    """
+    Zero-copy view of the samples in a 16-bit mono WAV file, and its sample rate.
+
+    Tolerates the oversized data length written by encoders that stream to a pipe.
+    """
+    view = memoryview(data).cast("B")
+    if bytes(view[:4]) != b"RIFF" or bytes(view[8:12]) != b"WAVE":
+        raise ValueError("Not a WAV file")
+    offset = 12
+    sample_rate = None
+    while offset + 8 <= len(view):
+        chunk_id, size = struct.unpack_from("<4sI", view, offset)
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            _, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", view, body)
+            if channels != 1 or bits != 16:
+                raise ValueError(f"Expected 16-bit mono WAV, got {channels} channels of {bits} bits")
+        elif chunk_id == b"data":
+            if sample_rate is None:
+                raise ValueError("WAV data before its fmt chunk")
+            end = min(body + size, len(view))
+            return view[body:end - (end - body) % 2], sample_rate
+        offset = body + size + size % 2
+    raise ValueError("WAV file has no data chunk")
@@ -0,0 +1,166 @@
+"""
+Compressed Voice Output Formats for Universal MCP
+
+Synthesized speech is 16-bit mono PCM at 22.05 kHz, about 2.6 MB per minute
+before base64. Clients can ask for a smaller encoding with an Accept-style
+list (``"audio/ogg; codecs=opus, audio/flac;q=0.5"`` or just ``"opus"``):
+
+    opus   Ogg/Opus at 24 kHz (soundfile with libsndfile >= 1.0.29), ~8-12x smaller
+    flac   lossless FLAC (soundfile), ~1.5-2.5x smaller, more with pauses
+    mulaw  G.711 µ-law at 8 kHz (``audio/basic``), 5.5x smaller, no dependencies
+    wav    16-bit PCM in a WAV container
+    pcm    headerless 16-bit little-endian PCM (the original voice_output format)
+
+Encoding is CPU work, so callers run ``encode_audio`` off the event loop.
+"""
+
+import io
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .audio import AudioBuffer, to_wav
+from ..tracing import run_in_thread
+
+try:
+    import soundfile as sf
+except (ImportError, OSError):  # OSError: the package is installed but libsndfile is missing
+    sf = None
+
+
+class AudioFormat(NamedTuple):
+    name: str
+    media_type: str
+
+
+FORMATS: Dict[str, AudioFormat] = {
+    "opus": AudioFormat("opus", "audio/ogg; codecs=opus"),
+    "flac": AudioFormat("flac", "audio/flac"),
+    "mulaw": AudioFormat("mulaw", "audio/basic"),
+    "wav": AudioFormat("wav", "audio/wav"),
+    "pcm": AudioFormat("pcm", "application/octet-stream"),
+}
+
+# Names and media types clients may use for each format
+_ALIASES = {
+    "opus": "opus", "audio/opus": "opus", "audio/ogg": "opus",
+    "flac": "flac", "audio/flac": "flac", "audio/x-flac": "flac",
+    "mulaw": "mulaw", "ulaw": "mulaw", "pcmu": "mulaw", "audio/basic": "mulaw",
+    "audio/pcmu": "mulaw", "audio/x-mulaw": "mulaw",
+    "wav": "wav", "audio/wav": "wav", "audio/x-wav": "wav", "audio/wave": "wav",
+    "pcm": "pcm", "audio/l16": "pcm", "application/octet-stream": "pcm",
+}
+
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+MULAW_SAMPLE_RATE = 8000
+
+
+def available_formats() -> List[str]:
+    formats = ["mulaw", "wav", "pcm"]
+    if sf is not None:
+        if "FLAC" in sf.available_formats():
+            formats.insert(0, "flac")
+        if "OPUS" in sf.available_subtypes("OGG"):
+            formats.insert(0, "opus")
+    return formats
+
+
+_AVAILABLE = set(available_formats())
+
+
+def negotiate_audio_format(accept: Optional[str], default: str = "pcm") -> AudioFormat:
+    """Best available format from an Accept-style preference list"""
+    if not accept:
+        return FORMATS[default]
+    candidates = []
+    for position, item in enumerate(accept.split(",")):
+        parts = [part.strip() for part in item.split(";")]
+        name = parts[0].lower()
+        params = dict(part.split("=", 1) for part in parts[1:] if "=" in part)
+        try:
+            quality = float(params.get("q", 1.0))
+        except ValueError:
+            quality = 0.0
+        if name == "audio/ogg" and params.get("codecs", "opus").lower() != "opus":
+            continue
+        if name in ("*/*", "audio/*"):
+            name = default
+        name = _ALIASES.get(name)
+        if name in _AVAILABLE and quality > 0:
+            candidates.append((-quality, position, name))
+    return FORMATS[min(candidates)[2]] if candidates else FORMATS[default]
+
+
+def _resample(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    if source_rate == target_rate or not len(samples):
+        return samples
+    try:
+        import librosa
+        return librosa.resample(samples, orig_sr=source_rate, target_sr=target_rate)
+    except ImportError:
+        # Linear interpolation is plenty for speech at these ratios
+        positions = np.arange(int(len(samples) * target_rate / source_rate)) * (source_rate / target_rate)
+        return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def _samples(pcm: AudioBuffer) -> np.ndarray:
+    view = memoryview(pcm).cast("B")
+    return np.frombuffer(view, dtype="<i2", count=len(view) // 2).astype(np.float32) / 32768.0
+
+
+def resample_pcm(pcm: AudioBuffer, source_rate: int, target_rate: int) -> bytes:
+    """16-bit mono PCM at ``target_rate``; blocking"""
+    samples = _resample(_samples(pcm), source_rate, target_rate)
+    return (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+
+def _mulaw(samples: np.ndarray) -> bytes:
+    """G.711 µ-law encoding of float samples in [-1, 1]"""
+    pcm = np.clip(samples * 32768.0, -32768, 32767).astype(np.int32)
+    sign = (pcm < 0).astype(np.int32) << 7
+    magnitude = np.minimum(np.abs(pcm), 32635) + 0x84
+    exponent = np.floor(np.log2(magnitude)).astype(np.int32) - 7
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8).tobytes()
+
+
+def output_sample_rate(audio_format: str, sample_rate: int) -> int:
+    """Sample rate of ``encode_audio`` output for PCM at ``sample_rate``"""
+    if audio_format == "mulaw":
+        return MULAW_SAMPLE_RATE
+    if audio_format == "opus":
+        # Opus only runs at fixed rates; go up to the nearest one so nothing is lost
+        return next((rate for rate in OPUS_SAMPLE_RATES if rate >= sample_rate), OPUS_SAMPLE_RATES[-1])
+    return sample_rate
+
+
+def encode_audio(pcm: AudioBuffer, sample_rate: int, audio_format: str) -> Tuple[bytes, int]:
+    """
+    Encode 16-bit mono PCM; returns the encoded bytes and their sample rate.
+
+    Blocking and CPU-bound: call through ``encode_audio_async`` on the event loop.
+    """
+    if audio_format == "pcm":
+        return bytes(pcm), sample_rate
+    if audio_format == "wav":
+        return to_wav(pcm, sample_rate), sample_rate
+
+    rate = output_sample_rate(audio_format, sample_rate)
+    samples = _resample(_samples(pcm), sample_rate, rate)
+    if audio_format == "mulaw":
+        return _mulaw(samples), rate
+
+    out = io.BytesIO()
+    if audio_format == "flac":
+        sf.write(out, samples, rate, format="FLAC", subtype="PCM_16")
+        return out.getvalue(), rate
+    if audio_format == "opus":
+        sf.write(out, samples, rate, format="OGG", subtype="OPUS")
+        return out.getvalue(), rate
+    raise ValueError(f"Unsupported audio format: {audio_format}")
+
+
+async def encode_audio_async(pcm: AudioBuffer, sample_rate: int, audio_format: str) -> Tuple[bytes, int]:
+    if audio_format == "pcm":
+        return bytes(pcm), sample_rate
+    return await run_in_thread(f"audio.encode_{audio_format}", encode_audio, pcm, sample_rate, audio_format)
@@ -0,0 +1,156 @@
+"""
+Audio Preprocessing for Speech Recognition
+
+Client audio arrives in whatever shape the client recorded it: WAV, FLAC or
+Ogg at any sample rate, stereo, with seconds of silence either side. Before
+recognition it is decoded, downmixed to mono, resampled to the ASR rate,
+trimmed to the voiced region and loudness-normalized, then re-encoded as
+16-bit PCM. Every step is vectorized numpy; the voice activity detector
+compares per-frame energy against both an absolute floor and the loudest
+frame.
+
+The work is CPU-bound (resampling dominates), so it runs in a small process
+pool instead of the event loop or its thread pool. ``preprocess_audio`` is a
+plain top-level function so it can be sent to worker processes.
+"""
+
+import asyncio
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from ..tracing import run_in_thread
+
+logger = logging.getLogger(__name__)
+
+# Container signatures soundfile can decode; anything else is taken as raw 16-bit PCM
+_CONTAINER_MAGIC = (b"RIFF", b"fLaC", b"OggS", b"FORM")
+
+FRAME_SECONDS = 0.02
+SPEECH_PAD_SECONDS = 0.15
+SILENCE_FLOOR_DB = -50.0  # frames quieter than this are never speech
+DYNAMIC_RANGE_DB = 35.0  # nor are frames this far below the loudest one
+TARGET_RMS_DB = -20.0
+PEAK_CEILING_DB = -1.0
+MAX_GAIN_DB = 30.0
+
+
+def _decode(data: bytes, source_rate: int) -> Tuple[np.ndarray, int]:
+    """Float32 samples in [-1, 1], shape (frames, channels)"""
+    if data[:4] in _CONTAINER_MAGIC:
+        import soundfile as sf
+        samples, rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+        return samples, rate
+    usable = len(data) - len(data) % 2
+    samples = np.frombuffer(data, dtype="<i2", count=usable // 2).astype(np.float32) / 32768.0
+    return samples[:, None], source_rate
+
+
+def voiced_region(samples: np.ndarray, sample_rate: int) -> Optional[Tuple[int, int]]:
+    """Start and end sample of the voiced part of a mono signal, or None if there is no speech"""
+    frame = max(1, int(sample_rate * FRAME_SECONDS))
+    frames = len(samples) // frame
+    if frames == 0:
+        return None
+    energy = np.square(samples[:frames * frame].reshape(frames, frame)).mean(axis=1)
+    energy_db = 10.0 * np.log10(energy + 1e-12)
+    threshold = max(SILENCE_FLOOR_DB, float(energy_db.max()) - DYNAMIC_RANGE_DB)
+    voiced = np.flatnonzero(energy_db > threshold)
+    if voiced.size == 0:
+        return None
+    pad = int(sample_rate * SPEECH_PAD_SECONDS)
+    start = max(0, int(voiced[0]) * frame - pad)
+    end = min(len(samples), (int(voiced[-1]) + 1) * frame + pad)
+    return start, end
+
+
+def preprocess_audio(data: bytes, target_rate: int = 16000,
+                     source_rate: int = 16000) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Decode, downmix, resample, VAD-trim and normalize a clip.
+
+    Args:
+        data: A WAV/FLAC/Ogg file, or raw little-endian 16-bit PCM
+        target_rate: Sample rate expected by the recognizer
+        source_rate: Sample rate of raw PCM input (containers carry their own)
+
+    Returns:
+        Mono 16-bit PCM at ``target_rate`` (empty when no speech was found) and
+        a summary of what was done
+    """
+    samples, rate = _decode(data, source_rate)
+    mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    input_seconds = len(mono) / rate if rate else 0.0
+
+    if rate != target_rate and len(mono):
+        import librosa
+        mono = librosa.resample(mono, orig_sr=rate, target_sr=target_rate)
+
+    info: Dict[str, Any] = {
+        "sample_rate": target_rate,
+        "source_sample_rate": rate,
+        "channels": int(samples.shape[1]),
+        "input_seconds": round(input_seconds, 3),
+    }
+    region = voiced_region(mono, target_rate)
+    if region is None:
+        info.update(output_seconds=0.0, speech=False, gain_db=0.0)
+        return b"", info
+    mono = mono[region[0]:region[1]]
+
+    rms_db = 10.0 * np.log10(float(np.square(mono).mean()) + 1e-12)
+    peak_db = 20.0 * np.log10(float(np.abs(mono).max()) + 1e-12)
+    gain_db = min(TARGET_RMS_DB - rms_db, PEAK_CEILING_DB - peak_db, MAX_GAIN_DB)
+    mono = mono * np.float32(10.0 ** (gain_db / 20.0))
+
+    pcm = (np.clip(mono, -1.0, 1.0) * 32767.0).astype("<i2")
+    info.update(output_seconds=round(len(pcm) / target_rate, 3), speech=True, gain_db=round(float(gain_db), 1))
+    return pcm.tobytes(), info
+
+
+class AudioPreprocessor:
+    """Runs ``preprocess_audio`` in a lazily started process pool"""
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned workers: forking a process that already runs threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def warm_up(self):
+        """Start the workers and load the resampler now rather than on the first clip"""
+        if self.max_workers <= 0:
+            return
+        clip = b"\0\0" * 800
+        for _ in range(self.max_workers):
+            self._executor().submit(preprocess_audio, clip, 16000, 8000)
+
+    async def process(self, data: bytes, target_rate: int,
+                      source_rate: int = 16000) -> Tuple[bytes, Dict[str, Any]]:
+        if self.max_workers <= 0:
+            return await run_in_thread("audio.preprocess", preprocess_audio, data, target_rate, source_rate)
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        try:
+            return await loop.run_in_executor(pool, preprocess_audio, data, target_rate, source_rate)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool for the next clip
+            if self._pool is pool:
+                self._pool = None
+            raise
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,138 @@
+"""
+Hybrid Conversation Memory for LangChain
+
+Keeps the most recent turns verbatim up to a token budget and folds older turns
+into a running summary. Turns pushed out of the budget wait in ``pending``
+until the service runs ``summarize_pending`` after the reply has been returned,
+so no turn waits on a summarization call and every prompt is bounded by the
+budget plus the summary.
+"""
+
+import logging
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from langchain.memory import ConversationSummaryMemory
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain_core.messages import BaseMessage, get_buffer_string
+from langchain_core.pydantic_v1 import PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Not installed, or the BPE file cannot be fetched (offline deployments)
+        logger.warning(f"tiktoken unavailable, estimating tokens from text length: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count; close enough to Gemini's tokenizer for budgeting"""
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class HybridConversationMemory(BaseChatMemory):
+    """Recent messages verbatim within ``max_token_limit``, older ones as a running summary"""
+
+    summarizer: ConversationSummaryMemory
+    memory_key: str = "history"
+    human_prefix: str = "Human"
+    ai_prefix: str = "AI"
+    max_token_limit: int = 2000
+    max_pending_messages: int = 40  # bound if summarization keeps failing
+    summary: str = ""
+    pending: List[BaseMessage] = []
+
+    # Turns are saved from the chain's worker thread while a summary may be running in another
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            summary = self.summary
+            messages = list(self.chat_memory.messages)
+        history = get_buffer_string(messages, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix)
+        if summary:
+            history = f"Summary of the earlier conversation: {summary}\n{history}"
+        return {self.memory_key: history}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        super().save_context(inputs, outputs)
+        self._prune()
+
+    def _prune(self):
+        """Move the oldest messages out of the verbatim buffer until it fits the budget"""
+        with self._lock:
+            messages = self.chat_memory.messages
+            sizes = [count_tokens(str(message.content)) for message in messages]
+            total = sum(sizes)
+            cut = 0
+            # Always keep the latest exchange, however large
+            while total > self.max_token_limit and cut < len(messages) - 2:
+                total -= sizes[cut]
+                cut += 1
+            if not cut:
+                return
+            self.pending.extend(messages[:cut])
+            del messages[:cut]
+            overflow = len(self.pending) - self.max_pending_messages
+            if overflow > 0:
+                del self.pending[:overflow]
+                logger.warning(f"Dropped {overflow} unsummarized messages; summarization is falling behind")
+
+    @property
+    def needs_summary(self) -> bool:
+        return bool(self.pending)
+
+    def pending_snapshot(self) -> Tuple[List[BaseMessage], str]:
+        """The pending messages and the summary they should be folded into"""
+        with self._lock:
+            return list(self.pending), self.summary
+
+    def summarize(self, batch: List[BaseMessage], summary: str) -> str:
+        """New summary covering ``batch``; blocking LLM call, run it off the event loop"""
+        return self.summarizer.predict_new_summary(batch, summary).strip()
+
+    def apply_summary(self, batch: List[BaseMessage], summary: str, new_summary: str) -> bool:
+        """
+        Replace the summary and drop ``batch`` from pending, unless the memory
+        moved on since the snapshot (pending trimmed or summary replaced)
+        """
+        with self._lock:
+            if self.summary != summary or self.pending[:len(batch)] != batch:
+                return False
+            self.summary = new_summary
+            del self.pending[:len(batch)]
+            return True
+
+    def summarize_pending(self) -> bool:
+        """Fold pending messages into the summary; blocking LLM call, run it off the event loop"""
+        batch, summary = self.pending_snapshot()
+        if not batch:
+            return False
+        return self.apply_summary(batch, summary, self.summarize(batch, summary))
+
+    def clear(self) -> None:
+        super().clear()
+        with self._lock:
+            self.summary = ""
+            self.pending = []
+
+
+def create_hybrid_memory(llm: Any, max_token_limit: int) -> HybridConversationMemory:
+    return HybridConversationMemory(
+        summarizer=ConversationSummaryMemory(llm=llm),
+        max_token_limit=max_token_limit
+    )
@@ -24,6 +24,8 @@ from ..models import (
     CodeGenerationRequest, DebuggingRequest, ArchitectureRequest,
     GeminiConfig
 )
+from ..timing import stage
+from ...tracing import run_in_thread
 
 logger = logging.getLogger(__name__)
 
@@ -82,6 +84,25 @@ class EnhancedGeminiService:
             logger.error(f"Failed to initialize Gemini model: {e}")
             raise
     
+    async def health_check(self, timeout: float = 5.0) -> Dict[str, Any]:
+        """
+        Check the Gemini API is reachable and the configured model is served,
+        using a model metadata lookup so no tokens are spent
+        """
+        start = datetime.utcnow()
+        model_name = self.config.model_name
+        if not model_name.startswith("models/"):
+            model_name = f"models/{model_name}"
+        info = await asyncio.wait_for(
+            run_in_thread("gemini.get_model", genai.get_model, model_name),
+            timeout=timeout
+        )
+        return {
+            "status": "healthy",
+            "model": info.name,
+            "response_time": (datetime.utcnow() - start).total_seconds()
+        }
+    
     def _get_code_generation_prompt(self) -> str:
         """Get specialized prompt for code generation tasks"""
         return """
@@ -243,13 +264,14 @@ Response Format:
             start_time = datetime.utcnow()
             
             # Build the prompt with context
-            prompt = self._build_prompt(request)
-            
-            # Handle multi-modal inputs
-            inputs = [prompt]
-            if request.image_input:
-                image = self._decode_image(request.image_input)
-                inputs.append(image)
+            with stage("gemini.prompt_build"):
+                prompt = self._build_prompt(request)
+                
+                # Handle multi-modal inputs
+                inputs = [prompt]
+                if request.image_input:
+                    image = self._decode_image(request.image_input)
+                    inputs.append(image)
             
             # Generate response
             response = await self._generate_response(inputs, request)
@@ -311,29 +333,36 @@ Response Format:
         """Generate response using Gemini model"""
         try:
             # Generate content
-            response = await asyncio.to_thread(
-                self.model.generate_content,
-                inputs,
-                stream=False
-            )
-            
-            # Parse the response
-            content = response.text
-            
-            # Extract structured information
-            result = {
-                "content": content,
-                "tokens_used": response.usage_metadata.total_token_count if hasattr(response, 'usage_metadata') else None,
-                "confidence": self._calculate_confidence(response)
-            }
+            with stage("gemini.generate") as timing:
+                response = await run_in_thread(
+                    "gemini.generate_content",
+                    self.model.generate_content,
+                    inputs,
+                    stream=False
+                )
+                usage = getattr(response, "usage_metadata", None)
+                if usage is not None:
+                    timing.tokens_in = getattr(usage, "prompt_token_count", None)
+                    timing.tokens_out = getattr(usage, "candidates_token_count", None)
             
-            # Task-specific parsing
-            if request.task_type == MCPTaskType.CODE_GENERATION:
-                result.update(self._parse_code_response(content))
-            elif request.task_type == MCPTaskType.DEBUGGING:
-                result.update(self._parse_debug_response(content))
-            elif request.task_type == MCPTaskType.ARCHITECTURE_DESIGN:
-                result.update(self._parse_architecture_response(content))
+            with stage("gemini.parse"):
+                # Parse the response
+                content = response.text
+                
+                # Extract structured information
+                result = {
+                    "content": content,
+                    "tokens_used": usage.total_token_count if usage is not None else None,
+                    "confidence": self._calculate_confidence(response)
+                }
+                
+                # Task-specific parsing
+                if request.task_type == MCPTaskType.CODE_GENERATION:
+                    result.update(self._parse_code_response(content))
+                elif request.task_type == MCPTaskType.DEBUGGING:
+                    result.update(self._parse_debug_response(content))
+                elif request.task_type == MCPTaskType.ARCHITECTURE_DESIGN:
+                    result.update(self._parse_architecture_response(content))
             
             return result
             
@@ -7,10 +7,13 @@ memory management, and chain-of-thought reasoning for development tasks.
 
 import asyncio
 import logging
-from typing import Dict, List, Optional, Any, Callable, Union
+from dataclasses import dataclass
+from typing import AsyncGenerator, Dict, List, Optional, Any, Callable, Union
 from datetime import datetime, timedelta
 import json
+import time
 import uuid
+import weakref
 
 from langchain.chains import ConversationChain, LLMChain, SequentialChain
 from langchain.memory import ConversationBufferWindowMemory, ConversationSummaryMemory
@@ -21,44 +24,134 @@ from langchain.schema.output_parser import OutputParserException
 from langchain_core.output_parsers import JsonOutputParser, PydanticOutputParser
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+from .conversation_memory import HybridConversationMemory, create_hybrid_memory
 from ..models import (
     MCPRequest, MCPResponse, MCPTaskType, ProgrammingLanguage,
     LangChainConfig, MCPSession
 )
+from ..session_backend import MemorySessionBackend, SessionBackend, SessionConflictError
+from ..session_store import SessionStore
+from ..timing import get_current_timer, record_stage
+from ...tracing import get_tracer, run_in_thread
 
 logger = logging.getLogger(__name__)
 
+# Summary rounds per scheduling; a round whose result is overtaken by a turn is retried
+SUMMARY_ATTEMPTS = 3
+
+def _token_usage(response: Any) -> tuple:
+    """Extract (tokens_in, tokens_out) from an LLMResult, if the provider reported them"""
+    llm_output = getattr(response, "llm_output", None) or {}
+    usage = llm_output.get("token_usage") or llm_output.get("usage_metadata")
+    if usage:
+        return (
+            usage.get("prompt_tokens", usage.get("input_tokens")),
+            usage.get("completion_tokens", usage.get("output_tokens")),
+        )
+    try:
+        usage = response.generations[0][0].message.usage_metadata
+        return usage.get("input_tokens"), usage.get("output_tokens")
+    except (AttributeError, IndexError, TypeError):
+        return None, None
+
 class MCPCallbackHandler(BaseCallbackHandler):
     """Custom callback handler for MCP-specific logging and monitoring"""
     
-    def __init__(self, session_id: str):
+    def __init__(self, session_id: str, workflow_type: str = "workflow",
+                 stage_names: Optional[List[str]] = None):
         self.session_id = session_id
+        self.workflow_type = workflow_type
+        self.stage_names = stage_names or []
         self.tokens_used = 0
         self.start_time = None
+        # Captured here because callbacks fire on the executor thread
+        self.timer = get_current_timer()
+        self._llm_starts: Dict[Any, float] = {}
+        self._llm_spans: Dict[Any, Any] = {}
+        self._llm_calls = 0
         
     def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs) -> None:
         self.start_time = datetime.utcnow()
+        self._llm_starts[kwargs.get("run_id")] = time.perf_counter()
+        self._llm_spans[kwargs.get("run_id")] = get_tracer().start_span(
+            f"langchain.{self.workflow_type}.llm", attributes={"mcp.session_id": self.session_id}
+        )
         logger.info(f"LangChain LLM started for session {self.session_id}")
         
     def on_llm_end(self, response: Any, **kwargs) -> None:
         if self.start_time:
             duration = (datetime.utcnow() - self.start_time).total_seconds()
             logger.info(f"LangChain LLM completed in {duration:.2f}s for session {self.session_id}")
+        
+        start = self._llm_starts.pop(kwargs.get("run_id"), None)
+        if start is not None:
+            # Sequential chains call the LLM once per step, in order
+            index = self._llm_calls
+            self._llm_calls += 1
+            step = self.stage_names[index] if index < len(self.stage_names) else f"llm_{index}"
+            tokens_in, tokens_out = _token_usage(response)
+            self.tokens_used += (tokens_in or 0) + (tokens_out or 0)
+            span = self._llm_spans.pop(kwargs.get("run_id"), None)
+            if span is not None:
+                span.name = f"langchain.{self.workflow_type}.{step}"
+                span.set_attribute("llm.tokens_in", tokens_in or 0)
+                span.set_attribute("llm.tokens_out", tokens_out or 0)
+                span.end()
+            record_stage(
+                f"langchain.{self.workflow_type}.{step}",
+                start, time.perf_counter() - start,
+                tokens_in, tokens_out,
+                timer=self.timer
+            )
             
     def on_llm_error(self, error: Union[Exception, KeyboardInterrupt], **kwargs) -> None:
         logger.error(f"LangChain LLM error in session {self.session_id}: {error}")
+        span = self._llm_spans.pop(kwargs.get("run_id"), None)
+        if span is not None:
+            span.record_exception(error)
+            span.end()
+
+@dataclass
+class ConversationSession:
+    """Live conversation state for one LangChain session"""
+    user_id: str
+    project_id: Optional[str]
+    conversation_chain: ConversationChain
+    memory: Union[HybridConversationMemory, ConversationBufferWindowMemory]
+    version: str = ""  # token of the backend record this copy matches; detects stale local copies
+
+
+def conversation_size(session: ConversationSession) -> int:
+    """Approximate bytes held by a conversation: its messages plus chain overhead"""
+    messages = list(session.memory.chat_memory.messages)
+    size = 4096
+    if isinstance(session.memory, HybridConversationMemory):
+        messages += session.memory.pending
+        size += len(session.memory.summary) * 2
+    return size + sum(len(str(message.content)) * 2 + 256 for message in messages)
+
 
 class EnhancedLangChainService:
     """
     Advanced LangChain service for orchestrating complex AI development workflows
     """
     
-    def __init__(self, config: LangChainConfig, gemini_api_key: str):
+    def __init__(self, config: LangChainConfig, gemini_api_key: str,
+                 sessions: Optional[SessionStore] = None,
+                 backend: Optional[SessionBackend] = None, session_ttl: float = 3600.0):
         """Initialize the enhanced LangChain service"""
         self.config = config
         self.gemini_api_key = gemini_api_key
         self.chains: Dict[str, Any] = {}
-        self.sessions: Dict[str, MCPSession] = {}
+        if sessions is None:
+            sessions = SessionStore("langchain", size_of=conversation_size)
+        # Local cache of live chains; the backend holds the shared, serialized memory
+        self.sessions: SessionStore[ConversationSession] = sessions
+        self.backend = backend or MemorySessionBackend()
+        self.session_ttl = session_ttl
+        self._summary_tasks: Dict[str, asyncio.Task] = {}
+        # Turns and summaries of one session run one at a time in this worker
+        self._turn_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
         
         # Initialize the LLM
         self._initialize_llm()
@@ -554,7 +647,6 @@ class EnhancedLangChainService:
         """Process a request using the appropriate LangChain workflow"""
         try:
             session_id = request.user_id
-            callback_handler = MCPCallbackHandler(session_id)
             
             # Select the appropriate chain
             if workflow_type not in self.chains:
@@ -562,11 +654,16 @@ class EnhancedLangChainService:
             
             chain = self.chains[workflow_type]
             
+            # Name timing stages after each step's output key
+            stage_names = [c.output_key for c in getattr(chain, "chains", [])] or ["generate"]
+            callback_handler = MCPCallbackHandler(session_id, workflow_type, stage_names)
+            
             # Prepare inputs based on workflow type
             inputs = self._prepare_workflow_inputs(request, workflow_type)
             
             # Execute the chain
-            result = await asyncio.to_thread(
+            result = await run_in_thread(
+                f"langchain.{workflow_type}",
                 chain.run,
                 callbacks=[callback_handler],
                 **inputs
@@ -576,7 +673,8 @@ class EnhancedLangChainService:
                 "workflow_type": workflow_type,
                 "result": result,
                 "session_id": session_id,
-                "execution_time": callback_handler.start_time
+                "execution_time": callback_handler.start_time,
+                "tokens_used": callback_handler.tokens_used
             }
             
         except Exception as e:
@@ -628,17 +726,29 @@ class EnhancedLangChainService:
         else:
             return {"input": request.prompt}
     
-    async def create_conversation_session(self, user_id: str, project_id: Optional[str] = None) -> str:
-        """Create a new conversation session with memory"""
-        
-        session_id = str(uuid.uuid4())
-        
-        # Initialize conversation memory
-        memory = ConversationBufferWindowMemory(
-            k=self.config.max_memory_length,
-            return_messages=True,
-            memory_key="chat_history"
-        )
+    def _build_session(self, user_id: str, project_id: Optional[str],
+                       messages: List[List[str]] = (), version: str = "",
+                       summary: str = "", pending: List[List[str]] = ()) -> ConversationSession:
+        """Create a conversation chain, replaying stored ``[role, content]`` messages into its memory"""
+        
+        # Initialize conversation memory; both kinds fill ConversationChain's {history}
+        if self.config.memory_type == "hybrid":
+            memory = create_hybrid_memory(self.llm, self.config.memory_token_budget)
+            memory.summary = summary
+            memory.pending = [
+                HumanMessage(content=content) if role == "h" else AIMessage(content=content)
+                for role, content in pending
+            ]
+        else:
+            memory = ConversationBufferWindowMemory(
+                k=self.config.max_memory_length,
+                memory_key="history"
+            )
+        for role, content in messages:
+            if role == "h":
+                memory.chat_memory.add_user_message(content)
+            else:
+                memory.chat_memory.add_ai_message(content)
         
         # Create conversation chain
         conversation_chain = ConversationChain(
@@ -647,16 +757,129 @@ class EnhancedLangChainService:
             verbose=True
         )
         
-        # Store session
-        session = MCPSession(
-            id=session_id,
+        return ConversationSession(
             user_id=user_id,
             project_id=project_id,
             conversation_chain=conversation_chain,
-            memory=memory
+            memory=memory,
+            version=version
         )
+    
+    @staticmethod
+    def _pack_messages(messages: List[BaseMessage]) -> List[List[str]]:
+        return [["h" if isinstance(message, HumanMessage) else "a", message.content] for message in messages]
+    
+    def _to_record(self, session: ConversationSession) -> Dict[str, Any]:
+        """Compact backend record; only what the memory can still put in a prompt is kept"""
+        memory = session.memory
+        record = {"u": session.user_id, "p": session.project_id, "v": session.version}
+        if isinstance(memory, HybridConversationMemory):
+            record["m"] = self._pack_messages(memory.chat_memory.messages)
+            record["s"] = memory.summary
+            record["q"] = self._pack_messages(memory.pending)
+        else:
+            record["m"] = self._pack_messages(memory.chat_memory.messages[-2 * self.config.max_memory_length:])
+        return record
+    
+    def _turn_lock(self, session_id: str) -> asyncio.Lock:
+        lock = self._turn_locks.get(session_id)
+        if lock is None:
+            lock = self._turn_locks[session_id] = asyncio.Lock()
+        return lock
+    
+    async def _commit(self, session_id: str, session: ConversationSession):
+        """
+        Persist a changed session under a new version token, only if the backend
+        still holds the version this copy was built from
+        """
+        record = self._to_record(session)
+        record["v"] = uuid.uuid4().hex
+        if not await self.backend.compare_and_save(
+            "conversation", session_id, session.user_id, record, self.session_ttl, session.version
+        ):
+            # Another worker took a turn first; this copy is stale, so drop it and the change
+            self.sessions.remove(session_id)
+            raise SessionConflictError(f"Conversation session {session_id} was changed by another request")
+        session.version = record["v"]
+        # The conversation changed; keep the store's memory accounting current
+        self.sessions.resize(session_id)
+    
+    def _schedule_summary(self, session_id: str, session: ConversationSession):
+        """Fold turns that left the token budget into the summary, after the reply has gone out"""
+        memory = session.memory
+        if not isinstance(memory, HybridConversationMemory) or not memory.needs_summary:
+            return
+        task = self._summary_tasks.get(session_id)
+        if task is None or task.done():
+            self._summary_tasks[session_id] = asyncio.create_task(self._summarize(session_id, session))
+    
+    async def _summarize(self, session_id: str, session: ConversationSession):
+        """
+        The LLM call runs without the turn lock, so the next turn never waits for
+        it; the result is merged only if no turn was committed in the meantime,
+        otherwise the (now larger) pending batch is summarized again
+        """
+        memory = session.memory
+        try:
+            for _ in range(SUMMARY_ATTEMPTS):
+                async with self._turn_lock(session_id):
+                    if self.sessions.get(session_id) is not session:
+                        return  # replaced by a newer copy
+                    batch, summary = memory.pending_snapshot()
+                    if not batch:
+                        return
+                    version = session.version
+                
+                new_summary = await run_in_thread("langchain.summarize", memory.summarize, batch, summary)
+                
+                async with self._turn_lock(session_id):
+                    if self.sessions.get(session_id) is not session:
+                        return
+                    if session.version != version or not memory.apply_summary(batch, summary, new_summary):
+                        continue  # a turn landed while summarizing
+                    await self._commit(session_id, session)
+            # Still pending after repeated interleaved turns; the next turn schedules another try
+        except SessionConflictError:
+            # The worker that wrote the newer version summarizes its own copy
+            logger.debug(f"Summary of conversation session {session_id} superseded by a newer turn")
+        except Exception as e:
+            # Pending turns stay queued and are retried after the next turn
+            logger.warning(f"Summarizing conversation session {session_id} failed: {e}")
+        finally:
+            self._summary_tasks.pop(session_id, None)
+    
+    async def _load_session(self, session_id: str) -> Optional[ConversationSession]:
+        """Locally cached session, rehydrated from the backend when missing or stale"""
+        record = await self.backend.load("conversation", session_id)
+        if record is None:
+            self.sessions.remove(session_id)
+            return None
+        
+        session = self.sessions.get(session_id)
+        if session is not None and session.version == record["v"]:
+            return session
+        
+        # First use in this worker, or another worker has moved the conversation on
+        session = self._build_session(
+            record["u"], record.get("p"), record["m"], record["v"], record.get("s", ""), record.get("q", ())
+        )
+        self.sessions.put(session_id, session.user_id, session)
+        self._schedule_summary(session_id, session)
+        logger.debug(f"Rehydrated conversation session {session_id} at version {session.version}")
+        return session
+    
+    async def has_session(self, session_id: str) -> bool:
+        return await self._load_session(session_id) is not None
+    
+    async def create_conversation_session(self, user_id: str, project_id: Optional[str] = None) -> str:
+        """Create a new conversation session with memory"""
         
-        self.sessions[session_id] = session
+        session_id = str(uuid.uuid4())
+        session = self._build_session(user_id, project_id, version=uuid.uuid4().hex)
+        
+        # Store session
+        self.sessions.put(session_id, user_id, session)
+        await self.backend.save("conversation", session_id, user_id, self._to_record(session), self.session_ttl)
         
         logger.info(f"Created conversation session {session_id} for user {user_id}")
         return session_id
@@ -664,31 +887,86 @@ class EnhancedLangChainService:
     async def continue_conversation(self, session_id: str, message: str) -> str:
         """Continue a conversation in an existing session"""
         
-        if session_id not in self.sessions:
-            raise ValueError(f"Session {session_id} not found")
-        
-        session = self.sessions[session_id]
-        
-        try:
-            response = await asyncio.to_thread(
-                session.conversation_chain.predict,
-                input=message
+        async with self._turn_lock(session_id):
+            session = await self._load_session(session_id)
+            if session is None:
+                raise ValueError(f"Session {session_id} not found")
+            
+            try:
+                callback_handler = MCPCallbackHandler(session.user_id, "conversation", ["reply"])
+                response = await run_in_thread(
+                    "langchain.conversation",
+                    session.conversation_chain.predict,
+                    input=message,
+                    callbacks=[callback_handler]
+                )
+                
+                # Persist the turn so any worker can continue from here; a turn taken
+                # elsewhere in the meantime rejects this one (SessionConflictError)
+                await self._commit(session_id, session)
+                self._schedule_summary(session_id, session)
+                return response
+                
+            except Exception as e:
+                logger.error(f"Error in conversation session {session_id}: {e}")
+                raise
+    
+    async def stream_conversation(self, session_id: str, message: str) -> AsyncGenerator[str, None]:
+        """
+        Continue a conversation, yielding reply text as the model produces it.
+        
+        The exchange is committed to memory only once the reply is complete; if
+        the consumer stops early (client disconnect), the upstream model stream is
+        closed and the session is left exactly as it was before the turn.
+        """
+        
+        async with self._turn_lock(session_id):
+            session = await self._load_session(session_id)
+            if session is None:
+                raise ValueError(f"Session {session_id} not found")
+            
+            chain = session.conversation_chain
+            prompt = chain.prompt.format(input=message, **session.memory.load_memory_variables({"input": message}))
+            callback_handler = MCPCallbackHandler(session.user_id, "conversation", ["reply"])
+            span = get_tracer().start_span(
+                "langchain.conversation.stream", attributes={"mcp.session_id": session_id}
             )
-            
-            return response
-            
-        except Exception as e:
-            logger.error(f"Error in conversation session {session_id}: {e}")
-            raise
+            chunks: List[str] = []
+            completed = False
+            try:
+                async for chunk in self.llm.astream(prompt, config={"callbacks": [callback_handler]}):
+                    text = chunk.content if isinstance(chunk.content, str) else ""
+                    if text:
+                        chunks.append(text)
+                        yield text
+                completed = True
+            except Exception as e:
+                span.record_exception(e)
+                logger.error(f"Error streaming conversation session {session_id}: {e}")
+                raise
+            finally:
+                span.set_attribute("stream.completed", completed)
+                span.set_attribute("stream.chunks", len(chunks))
+                span.end()
+                if not completed:
+                    logger.info(f"Discarded partial turn in conversation session {session_id} ({len(chunks)} chunks)")
+            
+            # Commit the full exchange, exactly as ConversationChain.predict would have
+            session.memory.save_context({chain.input_key: message}, {chain.output_key: "".join(chunks)})
+            await self._commit(session_id, session)
+            self._schedule_summary(session_id, session)
     
-    def get_session_history(self, session_id: str) -> List[Dict[str, str]]:
+    async def get_session_history(self, session_id: str) -> List[Dict[str, str]]:
         """Get conversation history for a session"""
         
-        if session_id not in self.sessions:
+        session = await self._load_session(session_id)
+        if session is None:
             return []
         
-        session = self.sessions[session_id]
-        messages = session.memory.chat_memory.messages
+        messages = list(session.memory.chat_memory.messages)
+        if isinstance(session.memory, HybridConversationMemory):
+            # Turns awaiting summarization are older than the verbatim buffer
+            messages = session.memory.pending + messages
         
         history = []
         for message in messages:
@@ -699,8 +977,8 @@ class EnhancedLangChainService:
         
         return history
     
-    def clear_session(self, session_id: str):
+    async def clear_session(self, session_id: str, user_id: str):
         """Clear a conversation session"""
-        if session_id in self.sessions:
-            del self.sessions[session_id]
-            logger.info(f"Cleared session {session_id}")
+        self.sessions.remove(session_id)
+        await self.backend.delete("conversation", session_id, user_id)
+        logger.info(f"Cleared session {session_id}")
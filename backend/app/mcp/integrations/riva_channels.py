@@ -0,0 +1,151 @@
+"""
+Pooled gRPC Channels for NVIDIA Riva
+
+A single channel is a single HTTP/2 connection: every synthesis and
+recognition in the process shares its flow-control window and the server's
+per-connection stream limit, so a long streaming recognition or a burst of
+sentences delays everything behind it. The pool keeps ``size`` channels to the
+same server, each on its own connection, with keepalive pings so idle
+connections survive NATs and load balancers and dead ones are noticed before a
+request is sent on them.
+
+Calls go to the next READY channel in round-robin order, or to the next
+channel at all while none is ready, so gRPC connects it. Per-channel state,
+in-flight calls and call latency are exported as ``luna_riva_channel_ready``,
+``luna_riva_channel_in_flight`` and ``luna_riva_call_duration_seconds``.
+"""
+
+import asyncio
+import itertools
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import grpc
+
+from ...metrics import RIVA_CALL_LATENCY, RIVA_CHANNEL_IN_FLIGHT, RIVA_CHANNEL_READY
+from ...tracing import run_in_thread
+
+
+def channel_options(keepalive_seconds: float) -> List[tuple]:
+    return [
+        # Without a local subchannel pool, channels with identical arguments share one connection
+        ("grpc.use_local_subchannel_pool", 1),
+        ("grpc.keepalive_time_ms", int(keepalive_seconds * 1000)),
+        ("grpc.keepalive_timeout_ms", 10000),
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.max_pings_without_data", 0),
+    ]
+
+
+class RivaChannel:
+    """One gRPC connection with the Riva TTS and ASR clients bound to it"""
+
+    def __init__(self, index: int, auth: Any, tts: Any, asr: Any):
+        self.name = str(index)
+        self.auth = auth
+        self.tts = tts
+        self.asr = asr
+        self.state = grpc.ChannelConnectivity.IDLE
+        self.in_flight = 0
+        # Called from a gRPC thread on every connectivity change; try_to_connect starts connecting now
+        auth.channel.subscribe(self._on_state, try_to_connect=True)
+
+    def _on_state(self, state: grpc.ChannelConnectivity):
+        self.state = state
+        RIVA_CHANNEL_READY.labels(self.name).set(1 if self.ready else 0)
+
+    @property
+    def ready(self) -> bool:
+        return self.state == grpc.ChannelConnectivity.READY
+
+    def synthesize(self, request: Any) -> Any:
+        return self.tts.stub.Synthesize(request, metadata=self.auth.get_auth_metadata())
+
+    def recognize(self, request: Any) -> Any:
+        return self.asr.stub.Recognize(request, metadata=self.auth.get_auth_metadata())
+
+    def close(self):
+        self.auth.channel.unsubscribe(self._on_state)
+        self.auth.channel.close()
+
+
+class RivaChannelPool:
+    """Round-robin pool of Riva channels"""
+
+    def __init__(self, server_url: str, size: int = 2, keepalive_seconds: float = 30.0):
+        import riva.client as riva_client
+
+        self.server_url = server_url
+        self.channels: List[RivaChannel] = []
+        for index in range(max(1, size)):
+            auth = riva_client.Auth(uri=server_url, options=channel_options(keepalive_seconds))
+            self.channels.append(RivaChannel(
+                index, auth, riva_client.SpeechSynthesisService(auth), riva_client.ASRService(auth)
+            ))
+        self._counter = itertools.count()
+
+    def pick(self) -> RivaChannel:
+        start = next(self._counter)
+        count = len(self.channels)
+        for offset in range(count):
+            channel = self.channels[(start + offset) % count]
+            if channel.ready:
+                return channel
+        return self.channels[start % count]
+
+    async def call(self, method: str, func: Callable[[RivaChannel], Any],
+                   channel: Optional[RivaChannel] = None) -> Any:
+        """Run the blocking ``func(channel)`` on an executor thread, tracked per channel"""
+        channel = channel or self.pick()
+        channel.in_flight += 1
+        in_flight = RIVA_CHANNEL_IN_FLIGHT.labels(channel.name)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            return await run_in_thread(f"riva.{method}", func, channel)
+        finally:
+            RIVA_CALL_LATENCY.labels(channel.name, method).observe(time.perf_counter() - started)
+            in_flight.dec()
+            channel.in_flight -= 1
+
+    @staticmethod
+    async def _wait_channel(channel: RivaChannel, timeout: float):
+        if channel.ready:
+            return
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+
+        def settle(_):
+            if not ready.done():
+                ready.set_result(None)
+
+        # Also asks an idle channel to connect; completes from a gRPC thread
+        future = grpc.channel_ready_future(channel.auth.channel)
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(settle, None))
+        try:
+            await asyncio.wait_for(ready, timeout)
+        finally:
+            # Drops the future's connectivity subscription when it timed out
+            future.cancel()
+
+    async def wait_ready(self, timeout: float = 2.0) -> Dict[str, Any]:
+        """Wait for every channel to connect; raises only if none of them does"""
+        results = await asyncio.gather(*(
+            self._wait_channel(channel, timeout) for channel in self.channels
+        ), return_exceptions=True)
+        failures = [result for result in results if isinstance(result, BaseException)]
+        if len(failures) == len(self.channels):
+            raise ConnectionError(
+                f"No Riva channel to {self.server_url} became ready within {timeout}s"
+            ) from failures[0]
+        return {"channels": len(self.channels), "ready_channels": len(self.channels) - len(failures)}
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {"channel": channel.name, "state": channel.state.name, "in_flight": channel.in_flight}
+            for channel in self.channels
+        ]
+
+    def close(self):
+        for channel in self.channels:
+            channel.close()
@@ -7,20 +7,21 @@ enabling voice-enabled development assistance and audio response generation.
 
 import asyncio
 import logging
-from typing import Dict, List, Optional, Any, Union
+import queue
+from contextlib import aclosing
+from typing import AsyncGenerator, AsyncIterable, Awaitable, Callable, Dict, List, Optional, Any, Tuple, Union
 from datetime import datetime
 import base64
 import io
 import json
 import wave
+from xml.sax.saxutils import escape as xml_escape
 import tempfile
 import os
+import time
 
 import grpc
 import httpx
-import librosa
-import soundfile as sf
-import numpy as np
 
 # Riva imports (would be added when Riva is properly set up)
 try:
@@ -37,9 +38,21 @@ from ..models import (
     MCPRequest, MCPResponse, VoiceCommandRequest,
     RivaConfig
 )
+from ..audio import AudioBuffer
+from ..audio_codecs import AudioFormat, encode_audio_async, negotiate_audio_format
+from ..audio_preprocess import AudioPreprocessor
+from ..local_tts import EspeakSynthesizer, estimated_silence
+from ..speech import SentenceSplitter, SpeechNormalizer
+from ..timing import stage
+from ..tts_cache import TTSCache
+from .riva_channels import RivaChannelPool
+from ...metrics import TTS_FIRST_AUDIO
 
 logger = logging.getLogger(__name__)
 
+# Runs a recognized voice command through the MCP pipeline; None leaves the reply to the voice service
+VoiceResponder = Callable[[str, MCPRequest], Awaitable[Optional[MCPResponse]]]
+
 class EnhancedRivaService:
     """
     Advanced NVIDIA Riva service for voice synthesis and recognition
@@ -48,9 +61,20 @@ class EnhancedRivaService:
     def __init__(self, config: RivaConfig):
         """Initialize the enhanced Riva service"""
         self.config = config
-        self.tts_client = None
-        self.asr_client = None
+        self.channels: Optional[RivaChannelPool] = None
+        self.fallback_client = None
         self.is_available = RIVA_AVAILABLE
+        self.local_tts = EspeakSynthesizer() if config.fallback_tts == "espeak" else None
+        if self.local_tts and not self.local_tts.available:
+            logger.info("espeak-ng not found; fallback TTS will produce silence")
+            self.local_tts = None
+        self.preprocessor = AudioPreprocessor(config.audio_preprocess_workers)
+        self.preprocessor.warm_up()
+        self.tts_cache = TTSCache(
+            memory_max_bytes=config.tts_cache_memory_mb * 1024 * 1024,
+            disk_dir=config.tts_cache_dir or None,
+            disk_max_bytes=config.tts_cache_disk_mb * 1024 * 1024
+        )
         
         if self.is_available:
             self._initialize_riva_clients()
@@ -84,16 +108,14 @@ class EnhancedRivaService:
     def _initialize_riva_clients(self):
         """Initialize NVIDIA Riva TTS and ASR clients"""
         try:
-            # Create authentication credentials
-            auth = riva_client.Auth(uri=self.config.server_url)
-            
-            # Initialize TTS client
-            self.tts_client = riva_client.SpeechSynthesisService(auth)
-            
-            # Initialize ASR client
-            self.asr_client = riva_client.ASRService(auth)
+            # TTS and ASR clients on a pool of kept-alive channels
+            self.channels = RivaChannelPool(
+                self.config.server_url,
+                size=self.config.grpc_channels,
+                keepalive_seconds=self.config.grpc_keepalive_seconds
+            )
             
-            logger.info("NVIDIA Riva clients initialized successfully")
+            logger.info(f"NVIDIA Riva clients initialized successfully ({len(self.channels.channels)} channels)")
             
         except Exception as e:
             logger.error(f"Failed to initialize Riva clients: {e}")
@@ -105,8 +127,12 @@ class EnhancedRivaService:
         self.fallback_client = httpx.AsyncClient(timeout=30.0)
         logger.info("Fallback TTS service initialized")
     
-    async def synthesize_speech(self, text: str, voice_type: str = "default", 
-                              language: str = "en-US") -> str:
+    def sample_rate_for(self, voice_type: str = "default") -> int:
+        """Sample rate of the 16-bit mono PCM synthesized for a voice type"""
+        return self.voice_settings.get(voice_type, self.voice_settings["default"])["sample_rate"]
+    
+    async def synthesize_audio(self, text: str, voice_type: str = "default", 
+                             language: str = "en-US") -> AudioBuffer:
         """
         Synthesize speech from text using NVIDIA Riva TTS
         
@@ -116,115 +142,228 @@ class EnhancedRivaService:
             language: Language code
             
         Returns:
-            Base64 encoded audio data
+            Raw 16-bit mono PCM at ``sample_rate_for(voice_type)`` (bytes, or a
+            read-only view for fallback audio)
         """
         try:
-            if self.is_available and self.tts_client:
-                return await self._riva_synthesize_speech(text, voice_type, language)
-            else:
-                return await self._fallback_synthesize_speech(text, voice_type, language)
+            with stage("tts.synthesize"):
+                if self.is_available and self.channels:
+                    return await self._riva_synthesize_speech(text, voice_type, language)
+                else:
+                    return await self._fallback_synthesize_speech(text, voice_type, language)
                 
         except Exception as e:
             logger.error(f"Error synthesizing speech: {e}")
-            return ""
+            return b""
+    
+    async def stream_speech(self, text_chunks: AsyncIterable[str], voice_type: str = "explanation",
+                          language: str = "en-US",
+                          max_parallel: Optional[int] = None) -> AsyncGenerator[AudioBuffer, None]:
+        """
+        Synthesize streamed text sentence by sentence
+        
+        Sentences are cut from ``text_chunks`` as they complete, rewritten for
+        speech (code blocks and tables summarized, markup dropped, at most
+        ``config.max_spoken_seconds`` in total) and synthesized concurrently, at
+        most ``max_parallel`` (default ``config.tts_max_parallel``) at a time,
+        including finished audio not yet consumed. PCM for each sentence is
+        yielded in text order, so the first audio is ready one sentence's
+        synthesis after that sentence has been generated.
+        """
+        slots = asyncio.Semaphore(max_parallel or self.config.tts_max_parallel)
+        ordered: asyncio.Queue = asyncio.Queue()
+        started = time.perf_counter()
+        
+        async def schedule(sentence: str):
+            await slots.acquire()
+            ordered.put_nowait(asyncio.create_task(self.synthesize_audio(sentence, voice_type, language)))
+        
+        async def split():
+            splitter = SentenceSplitter()
+            normalizer = SpeechNormalizer(self.config.max_spoken_seconds)
+            try:
+                async for chunk in text_chunks:
+                    for sentence in splitter.feed(chunk):
+                        for spoken in normalizer.push(sentence):
+                            await schedule(spoken)
+                for sentence in splitter.flush():
+                    for spoken in normalizer.push(sentence):
+                        await schedule(spoken)
+                for spoken in normalizer.flush():
+                    await schedule(spoken)
+            finally:
+                ordered.put_nowait(None)
+        
+        splitter_task = asyncio.create_task(split())
+        first = True
+        try:
+            while True:
+                task = await ordered.get()
+                if task is None:
+                    break
+                try:
+                    audio = await task
+                finally:
+                    slots.release()
+                if audio:
+                    if first:
+                        TTS_FIRST_AUDIO.observe(time.perf_counter() - started)
+                        first = False
+                    yield audio
+            # Surface errors from the text source
+            await splitter_task
+        finally:
+            splitter_task.cancel()
+            pending = [splitter_task]
+            while not ordered.empty():
+                task = ordered.get_nowait()
+                if task is not None:
+                    task.cancel()
+                    pending.append(task)
+            await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def synthesize_text(self, text: str, voice_type: str = "explanation",
+                            language: str = "en-US") -> bytes:
+        """
+        Synthesize a complete text sentence by sentence: sentences run
+        concurrently and each is cached on its own, so texts that repeat
+        sentences only synthesize the new ones
+        """
+        async def chunks():
+            yield text
+        
+        return b"".join([audio async for audio in self.stream_speech(chunks(), voice_type, language)])
+    
+    async def synthesize_speech(self, text: str, voice_type: str = "default", 
+                              language: str = "en-US") -> str:
+        """Base64 encoded ``synthesize_audio`` output, for JSON responses"""
+        audio = await self.synthesize_audio(text, voice_type, language)
+        return base64.b64encode(audio).decode('ascii') if audio else ""
     
     async def _riva_synthesize_speech(self, text: str, voice_type: str, 
-                                    language: str) -> str:
-        """Synthesize speech using NVIDIA Riva"""
+                                    language: str) -> AudioBuffer:
+        """Synthesize speech using NVIDIA Riva, through the TTS cache"""
         try:
             # Get voice settings
             settings = self.voice_settings.get(voice_type, self.voice_settings["default"])
             
-            # Prepare synthesis request
-            req = rtts.SynthesizeSpeechRequest()
-            req.text = text
-            req.language_code = settings["language_code"]
-            req.voice_name = settings["voice"]
-            req.audio_config.audio_encoding = rtts.AudioEncoding.LINEAR_PCM
-            req.audio_config.sample_rate_hertz = settings["sample_rate"]
-            
-            # Add speaking rate if specified
-            if "speaking_rate" in settings:
-                req.audio_config.speaking_rate = settings["speaking_rate"]
+            cache_key = TTSCache.key(text, settings)
+            cached = await self.tts_cache.get(cache_key)
+            if cached is not None:
+                return cached
             
             # Synthesize speech
-            response = await asyncio.to_thread(
-                self.tts_client.synthesize,
-                req
+            req = self._tts_request(text, settings)
+            response = await self.channels.call(
+                "tts_synthesize",
+                lambda channel: channel.synthesize(req)
             )
             
-            # Convert audio to base64
-            audio_base64 = base64.b64encode(response.audio).decode('utf-8')
-            
             logger.info(f"Successfully synthesized speech for text: {text[:50]}...")
-            return audio_base64
+            # Only Riva output is cached; fallback audio must not outlive an outage
+            await self.tts_cache.put(cache_key, response.audio)
+            return response.audio
             
         except Exception as e:
             logger.error(f"Riva TTS synthesis error: {e}")
             # Fallback to alternative TTS
             return await self._fallback_synthesize_speech(text, voice_type, language)
     
+    @staticmethod
+    def _tts_request(text: str, settings: Dict[str, Any]):
+        req = rtts.SynthesizeSpeechRequest()
+        req.text = text
+        req.language_code = settings["language_code"]
+        req.voice_name = settings["voice"]
+        req.encoding = riva_client.AudioEncoding.LINEAR_PCM
+        req.sample_rate_hz = settings["sample_rate"]
+        
+        # Riva takes the speaking rate as SSML prosody
+        rate = settings.get("speaking_rate", 1.0)
+        if rate != 1.0:
+            req.text = f'<speak><prosody rate="{round(rate * 100)}%">{xml_escape(text)}</prosody></speak>'
+        return req
+    
     async def _fallback_synthesize_speech(self, text: str, voice_type: str, 
-                                        language: str) -> str:
-        """Fallback TTS using web services or local synthesis"""
-        try:
-            # For demo purposes, return empty audio
-            # In production, this would integrate with services like:
-            # - Google Cloud Text-to-Speech
-            # - Amazon Polly
-            # - Azure Cognitive Services Speech
-            # - Local TTS engines like espeak, festival, etc.
-            
-            logger.info(f"Using fallback TTS for: {text[:50]}...")
-            
-            # Generate silent audio as placeholder
-            duration = len(text) * 0.1  # Approximate duration
-            sample_rate = 22050
-            samples = int(duration * sample_rate)
-            audio_data = np.zeros(samples, dtype=np.float32)
-            
-            # Convert to bytes
-            audio_bytes = (audio_data * 32767).astype(np.int16).tobytes()
-            
-            # Encode as base64
-            audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-            
-            return audio_base64
-            
-        except Exception as e:
-            logger.error(f"Fallback TTS error: {e}")
-            return ""
+                                        language: str) -> AudioBuffer:
+        """Fallback TTS: local espeak-ng when installed, otherwise silence of the right length"""
+        settings = self.voice_settings.get(voice_type, self.voice_settings["default"])
+        sample_rate = settings["sample_rate"]
+        speaking_rate = settings.get("speaking_rate", 1.0)
+        
+        if self.local_tts:
+            try:
+                with stage("tts.local"):
+                    return await self.local_tts.synthesize(
+                        text, language or settings["language_code"], settings["voice"], sample_rate, speaking_rate
+                    )
+            except Exception as e:
+                logger.warning(f"Local TTS failed, falling back to silence: {e}")
+        
+        logger.info(f"Using silent fallback TTS for: {text[:50]}...")
+        # A view of a shared zero buffer: no allocation per response
+        return estimated_silence(text, sample_rate, speaking_rate)
     
-    async def recognize_speech(self, audio_data: str, language: str = "en-US") -> str:
+    async def recognize_audio(self, audio: AudioBuffer, language: str = "en-US",
+                            sample_rate: Optional[int] = None) -> str:
         """
         Recognize speech from audio data using NVIDIA Riva ASR
         
+        The clip is first decoded, downmixed, resampled to ``config.asr_sample_rate``,
+        trimmed to its voiced region and normalized in the preprocessing pool;
+        clips without speech never reach the recognizer.
+        
         Args:
-            audio_data: Base64 encoded audio data
+            audio: A WAV/FLAC/Ogg file or 16-bit mono PCM, as bytes or a memoryview
             language: Language code for recognition
+            sample_rate: Sample rate of raw PCM input (default ``config.asr_sample_rate``)
             
         Returns:
             Recognized text
         """
         try:
-            if self.is_available and self.asr_client:
-                return await self._riva_recognize_speech(audio_data, language)
-            else:
-                return await self._fallback_recognize_speech(audio_data, language)
+            asr_rate = self.config.asr_sample_rate
+            try:
+                with stage("asr.preprocess"):
+                    audio, info = await self.preprocessor.process(bytes(audio), asr_rate, sample_rate or asr_rate)
+                if not info["speech"]:
+                    logger.info(f"No speech detected in {info['input_seconds']}s of audio")
+                    return ""
+            except Exception as e:
+                # Undecodable input still goes to the recognizer as-is
+                logger.warning(f"Audio preprocessing failed, recognizing raw audio: {e}")
+                asr_rate = None
+            
+            with stage("asr.recognize"):
+                if self.is_available and self.channels:
+                    return await self._riva_recognize_speech(audio, language, asr_rate)
+                else:
+                    return await self._fallback_recognize_speech(audio, language)
                 
         except Exception as e:
             logger.error(f"Error recognizing speech: {e}")
             return ""
     
-    async def _riva_recognize_speech(self, audio_data: str, language: str) -> str:
+    async def recognize_speech(self, audio_data: str, language: str = "en-US") -> str:
+        """``recognize_audio`` for base64 encoded audio from JSON requests"""
+        try:
+            audio = base64.b64decode(audio_data)
+        except (ValueError, TypeError) as e:
+            logger.error(f"Invalid base64 audio: {e}")
+            return ""
+        return await self.recognize_audio(audio, language)
+    
+    async def _riva_recognize_speech(self, audio: AudioBuffer, language: str,
+                                   sample_rate: Optional[int] = None) -> str:
         """Recognize speech using NVIDIA Riva ASR"""
         try:
-            # Decode audio data
-            audio_bytes = base64.b64decode(audio_data)
-            
-            # Prepare recognition request
+            # Prepare recognition request; protobuf bytes fields need bytes, so views are copied once here
             req = rasr.RecognizeRequest()
-            req.audio = audio_bytes
+            req.audio = audio if isinstance(audio, bytes) else bytes(audio)
+            if sample_rate:
+                # Preprocessed audio is headerless PCM
+                req.config.encoding = riva_client.AudioEncoding.LINEAR_PCM
+                req.config.sample_rate_hertz = sample_rate
             req.config.language_code = language
             req.config.max_alternatives = 1
             req.config.profanity_filter = False
@@ -232,9 +371,9 @@ class EnhancedRivaService:
             req.config.enable_word_time_offsets = True
             
             # Perform recognition
-            response = await asyncio.to_thread(
-                self.asr_client.recognize,
-                req
+            response = await self.channels.call(
+                "asr_recognize",
+                lambda channel: channel.recognize(req)
             )
             
             if response.results:
@@ -246,9 +385,115 @@ class EnhancedRivaService:
                 
         except Exception as e:
             logger.error(f"Riva ASR recognition error: {e}")
-            return await self._fallback_recognize_speech(audio_data, language)
+            return await self._fallback_recognize_speech(audio, language)
     
-    async def _fallback_recognize_speech(self, audio_data: str, language: str) -> str:
+    async def stream_recognition(self, audio_chunks: AsyncIterable[AudioBuffer],
+                               language: Optional[str] = None, sample_rate: int = 16000,
+                               partial_interval: float = 1.0) -> AsyncGenerator[Tuple[str, bool], None]:
+        """
+        Recognize speech while it is still being captured
+        
+        Args:
+            audio_chunks: 16-bit mono PCM at ``sample_rate``, in arrival order
+            language: Language code (defaults to the configured one)
+            sample_rate: Sample rate of the PCM
+            partial_interval: Seconds of audio between partial results from the stand-in
+            
+        Yields:
+            ``(transcript, is_final)``; Riva emits a final result per utterance,
+            the stand-in a single one when the audio ends
+        """
+        language = language or self.config.language_code
+        if self.is_available and self.channels:
+            stream = self._riva_stream_recognition(audio_chunks, language, sample_rate)
+        else:
+            stream = self._buffered_stream_recognition(audio_chunks, language, sample_rate, partial_interval)
+        async with aclosing(stream):
+            async for result in stream:
+                yield result
+    
+    async def _riva_stream_recognition(self, audio_chunks: AsyncIterable[AudioBuffer], language: str,
+                                     sample_rate: int) -> AsyncGenerator[Tuple[str, bool], None]:
+        """Riva streaming ASR; its blocking bidirectional stream runs on an executor thread"""
+        loop = asyncio.get_running_loop()
+        audio_queue: queue.Queue = queue.Queue()
+        results: asyncio.Queue = asyncio.Queue()
+        streaming_config = riva_client.StreamingRecognitionConfig(
+            config=riva_client.RecognitionConfig(
+                encoding=riva_client.AudioEncoding.LINEAR_PCM,
+                sample_rate_hertz=sample_rate,
+                language_code=language,
+                max_alternatives=1,
+                enable_automatic_punctuation=True
+            ),
+            interim_results=True
+        )
+        
+        def audio():
+            while (chunk := audio_queue.get()) is not None:
+                yield chunk
+        
+        def recognize(channel):
+            try:
+                responses = channel.asr.streaming_response_generator(
+                    audio_chunks=audio(), streaming_config=streaming_config
+                )
+                for response in responses:
+                    for result in response.results:
+                        if result.alternatives:
+                            loop.call_soon_threadsafe(
+                                results.put_nowait, (result.alternatives[0].transcript, result.is_final)
+                            )
+            finally:
+                loop.call_soon_threadsafe(results.put_nowait, None)
+        
+        async def feed():
+            try:
+                async for chunk in audio_chunks:
+                    audio_queue.put(bytes(chunk))
+            finally:
+                audio_queue.put(None)
+        
+        feeder = asyncio.create_task(feed())
+        recognizer = asyncio.ensure_future(self.channels.call("asr_streaming", recognize))
+        try:
+            while (result := await results.get()) is not None:
+                yield result
+            await recognizer
+            await feeder
+        finally:
+            # Ending the audio ends the gRPC stream, which releases the executor thread
+            feeder.cancel()
+            await asyncio.gather(feeder, return_exceptions=True)
+            audio_queue.put(None)
+            recognizer.add_done_callback(lambda done: done.cancelled() or done.exception())
+    
+    async def _buffered_stream_recognition(self, audio_chunks: AsyncIterable[AudioBuffer], language: str,
+                                         sample_rate: int,
+                                         partial_interval: float) -> AsyncGenerator[Tuple[str, bool], None]:
+        """
+        Stand-in for servers without streaming ASR: buffers the audio, re-runs
+        one-shot recognition for a partial result every ``partial_interval``
+        seconds of audio and once more for the final transcript
+        """
+        buffer = bytearray()
+        step = max(2, int(partial_interval * sample_rate) * 2)
+        next_partial = step
+        async for chunk in audio_chunks:
+            buffer += chunk
+            if len(buffer) >= next_partial:
+                next_partial = len(buffer) + step
+                # The view must be released before the buffer can grow again
+                with memoryview(buffer) as view:
+                    text = await self.recognize_audio(view, language, sample_rate)
+                if text:
+                    yield text, False
+        if buffer:
+            with memoryview(buffer) as view:
+                text = await self.recognize_audio(view, language, sample_rate)
+            yield text, True
+    
+    async def _fallback_recognize_speech(self, audio: AudioBuffer, language: str) -> str:
         """Fallback speech recognition using web services"""
         try:
             # For demo purposes, return placeholder text
@@ -265,17 +510,61 @@ class EnhancedRivaService:
             logger.error(f"Fallback ASR error: {e}")
             return ""
     
-    async def process_voice_command(self, request: VoiceCommandRequest) -> MCPResponse:
-        """Process a voice command request"""
+    async def process_voice_command(self, request: VoiceCommandRequest,
+                                  respond: Optional[VoiceResponder] = None) -> MCPResponse:
+        """Process a voice command request carrying base64 audio (JSON API)"""
+        audio = None
+        if request.voice_input:
+            try:
+                audio = base64.b64decode(request.voice_input, validate=True)
+            except (ValueError, TypeError) as e:
+                return MCPResponse(
+                    request_id=request.id,
+                    status="error",
+                    error_message=f"Invalid base64 voice input: {e}",
+                    completed_at=datetime.utcnow()
+                )
+        
+        response, voice_output = await self.process_voice_audio(request, audio, respond=respond)
+        if voice_output:
+            audio_format = self.output_format((request.metadata or {}).get("audio_format"))
+            encoded, sample_rate = await encode_audio_async(
+                voice_output, response.result["sample_rate"], audio_format.name
+            )
+            response.voice_output = base64.b64encode(encoded).decode('ascii')
+            response.voice_format = audio_format.name
+            response.result["sample_rate"] = sample_rate
+        return response
+    
+    def output_format(self, accept: Optional[str] = None) -> AudioFormat:
+        """Negotiate the voice output encoding from an Accept-style list (``"opus, audio/flac;q=0.5"``)"""
+        return negotiate_audio_format(accept, self.config.output_format)
+    
+    async def process_voice_audio(self, request: MCPRequest,
+                                audio: Optional[AudioBuffer] = None,
+                                language: Optional[str] = None,
+                                sample_rate: Optional[int] = None,
+                                respond: Optional[VoiceResponder] = None) -> Tuple[MCPResponse, bytes]:
+        """
+        Process a voice command from raw audio
+        
+        ``respond(command_text, request)`` runs the recognized command through
+        the MCP pipeline; when it returns None (or is not given) the command is
+        answered locally with help or an acknowledgement.
+        
+        Returns the response (without ``voice_output``) and the synthesized reply
+        as raw 16-bit mono PCM; its sample rate is in ``result["sample_rate"]``.
+        """
         try:
             start_time = datetime.utcnow()
             
             # Step 1: Recognize speech if audio input provided
             recognized_text = ""
-            if request.voice_input:
-                recognized_text = await self.recognize_speech(
-                    request.voice_input, 
-                    request.language or "en-US"
+            if audio is not None and len(audio):
+                recognized_text = await self.recognize_audio(
+                    audio, 
+                    language or self.config.language_code,
+                    sample_rate
                 )
             
             # Step 2: Use recognized text or provided prompt
@@ -287,34 +576,49 @@ class EnhancedRivaService:
                     status="error",
                     error_message="No voice input or text prompt provided",
                     completed_at=datetime.utcnow()
-                )
-            
-            # Step 3: Process the command (this would integrate with other MCP services)
-            response_text = await self._process_voice_command_text(command_text, request)
+                ), b""
+            
+            # Step 3: Process the command through the MCP pipeline
+            reply = await respond(command_text, request) if respond else None
+            if reply is not None and reply.status != "success":
+                return reply.copy(update={"request_id": request.id}), b""
+            if reply is not None:
+                response_text = self._spoken_reply(reply)
+            else:
+                response_text = self._process_voice_command_text(command_text)
             
-            # Step 4: Generate voice response
-            voice_output = ""
+            # Step 4: Generate voice response (per sentence, so fixed sentences come from the cache)
+            voice_output = b""
             if response_text:
-                voice_output = await self.synthesize_speech(
-                    response_text,
-                    voice_type="explanation"
-                )
+                voice_output = await self.synthesize_text(response_text, voice_type="explanation")
             
             execution_time = (datetime.utcnow() - start_time).total_seconds()
             
+            result = {
+                "recognized_text": recognized_text,
+                "command_text": command_text,
+                "response_text": response_text,
+                "sample_rate": self.sample_rate_for("explanation")
+            }
+            if reply is not None:
+                # The pipeline's answer (code, suggestions, ...) with the voice details added
+                result = {**(reply.result or {}), **result}
+                return reply.copy(update={
+                    "request_id": request.id,
+                    "result": result,
+                    "explanation": reply.explanation or response_text,
+                    "execution_time": execution_time,
+                    "completed_at": datetime.utcnow()
+                }), voice_output
+            
             return MCPResponse(
                 request_id=request.id,
                 status="success",
-                result={
-                    "recognized_text": recognized_text,
-                    "command_text": command_text,
-                    "response_text": response_text
-                },
+                result=result,
                 explanation=response_text,
-                voice_output=voice_output,
                 execution_time=execution_time,
                 completed_at=datetime.utcnow()
-            )
+            ), voice_output
             
         except Exception as e:
             logger.error(f"Error processing voice command: {e}")
@@ -323,43 +627,22 @@ class EnhancedRivaService:
                 status="error",
                 error_message=str(e),
                 completed_at=datetime.utcnow()
-            )
-    
-    async def _process_voice_command_text(self, command_text: str, 
-                                       request: VoiceCommandRequest) -> str:
-        """Process voice command text and generate response"""
-        try:
-            # This would integrate with the main MCP processing pipeline
-            # For now, provide basic voice command handling
-            
-            command_lower = command_text.lower()
-            
-            if "generate code" in command_lower:
-                return self._handle_code_generation_command(command_text, request)
-            elif "debug" in command_lower or "error" in command_lower:
-                return self._handle_debugging_command(command_text, request)
-            elif "explain" in command_lower:
-                return self._handle_explanation_command(command_text, request)
-            elif "help" in command_lower:
-                return self._handle_help_command()
-            else:
-                return f"I heard: '{command_text}'. How can I help you with your development tasks?"
-                
-        except Exception as e:
-            logger.error(f"Error processing voice command text: {e}")
-            return "I'm sorry, I had trouble processing your voice command."
-    
-    def _handle_code_generation_command(self, command: str, request: VoiceCommandRequest) -> str:
-        """Handle code generation voice commands"""
-        return f"I understand you want to generate code. Based on your command: '{command}', I'll help you create the code you need. Please provide more specific requirements through the voice interface or text input."
+            ), b""
     
-    def _handle_debugging_command(self, command: str, request: VoiceCommandRequest) -> str:
-        """Handle debugging voice commands"""
-        return f"I'm ready to help you debug. From your command: '{command}', I understand you're experiencing an issue. Please share the error message or describe the problem you're facing."
+    @staticmethod
+    def _spoken_reply(reply: MCPResponse) -> str:
+        """What to say for a pipeline response; code itself is left to the written answer"""
+        if reply.explanation:
+            return reply.explanation
+        if reply.generated_code:
+            return "Done. The code is in the written response."
+        return "Done."
     
-    def _handle_explanation_command(self, command: str, request: VoiceCommandRequest) -> str:
-        """Handle explanation voice commands"""
-        return f"I'll explain what you need to know. Based on: '{command}', please share the code or concept you'd like me to explain, and I'll provide a clear explanation."
+    def _process_voice_command_text(self, command_text: str) -> str:
+        """Local reply for commands that are not MCP tasks"""
+        if "help" in command_text.lower():
+            return self._handle_help_command()
+        return f"I heard: '{command_text}'. How can I help you with your development tasks?"
     
     def _handle_help_command(self) -> str:
         """Handle help voice commands"""
@@ -374,18 +657,20 @@ class EnhancedRivaService:
         Just speak naturally and I'll understand your development needs."""
     
     async def create_audio_response(self, text_response: str, 
-                                  response_type: str = "explanation") -> str:
-        """Create an audio response for any text output"""
+                                  response_type: str = "explanation",
+                                  audio_format: str = "pcm") -> str:
+        """Create a base64 audio response for any text output, encoded as ``audio_format``"""
         try:
             # Choose appropriate voice based on response type
             voice_type = "explanation"
             if "code" in response_type.lower():
                 voice_type = "code_narration"
             
-            # Synthesize speech
-            audio_base64 = await self.synthesize_speech(text_response, voice_type)
-            
-            return audio_base64
+            audio = await self.synthesize_text(text_response, voice_type)
+            if not audio:
+                return ""
+            encoded, _ = await encode_audio_async(audio, self.sample_rate_for(voice_type), audio_format)
+            return base64.b64encode(encoded).decode('ascii')
             
         except Exception as e:
             logger.error(f"Error creating audio response: {e}")
@@ -403,20 +688,70 @@ class EnhancedRivaService:
         else:
             logger.warning(f"Unknown voice type: {voice_type}")
     
+    async def warm_up(self, timeout: float = 10.0):
+        """
+        Connect every Riva channel and run one short synthesis on each, so the
+        first voice request pays for neither connection setup nor a cold model
+        """
+        if not self.channels:
+            return
+        try:
+            await self.channels.wait_ready(timeout)
+        except ConnectionError as e:
+            logger.warning(f"Riva warmup skipped: {e}")
+            return
+        
+        req = self._tts_request("Ready.", self.voice_settings["default"])
+        ready = [channel for channel in self.channels.channels if channel.ready]
+        results = await asyncio.gather(*(
+            self.channels.call("tts_warmup", lambda channel: channel.synthesize(req), channel=channel)
+            for channel in ready
+        ), return_exceptions=True)
+        failures = [result for result in results if isinstance(result, Exception)]
+        for failure in failures:
+            logger.warning(f"Riva warmup call failed: {failure}")
+        logger.info(f"Riva warmed up on {len(ready) - len(failures)} of {len(self.channels.channels)} channels")
+    
+    def close(self):
+        """Stop the audio preprocessing workers and close the Riva channels"""
+        self.preprocessor.shutdown()
+        if self.channels:
+            self.channels.close()
+    
+    async def check_ready(self, timeout: float = 2.0) -> Dict[str, Any]:
+        """
+        Cheap readiness probe: waits for the gRPC channel to the Riva server to
+        become ready without synthesizing anything
+        """
+        if not (self.is_available and self.channels):
+            return {
+                "status": "degraded",
+                "message": "Riva unavailable, using fallback TTS",
+                "fallback_ready": bool(self.fallback_client)
+            }
+        
+        ready = await self.channels.wait_ready(timeout)
+        status = "healthy" if ready["ready_channels"] == ready["channels"] else "degraded"
+        return {"status": status, "server_url": self.config.server_url, **ready}
+    
     async def health_check(self) -> Dict[str, Any]:
         """Check the health of Riva services"""
         health_status = {
             "riva_available": self.is_available,
-            "tts_ready": bool(self.tts_client),
-            "asr_ready": bool(self.asr_client),
+            "tts_ready": bool(self.channels),
+            "asr_ready": bool(self.channels),
+            "channels": self.channels.stats() if self.channels else [],
             "fallback_ready": bool(self.fallback_client),
-            "server_url": self.config.server_url if self.config else "Not configured"
+            "local_tts": self.local_tts.executable if self.local_tts else None,
+            "server_url": self.config.server_url if self.config else "Not configured",
+            "tts_cache": self.tts_cache.stats()
         }
         
-        if self.is_available and self.tts_client:
+        if self.is_available and self.channels:
             try:
-                # Test TTS with a simple phrase
-                test_audio = await self.synthesize_speech("Test", "default")
+                # Test TTS with a simple phrase (served from the TTS cache after the first probe;
+                # check_ready covers the connection itself)
+                test_audio = await self.synthesize_audio("Test", "default")
                 health_status["tts_test"] = "success" if test_audio else "failed"
             except Exception as e:
                 health_status["tts_test"] = f"failed: {e}"
@@ -0,0 +1,71 @@
+"""
+Local Speech Synthesis for Universal MCP
+
+When Riva is unreachable, speech comes from espeak-ng (or classic espeak) if
+it is on the PATH: a few MB, no models to download, and far faster than real
+time on one core. It sounds robotic but is intelligible, which beats silence.
+
+Without it the fallback is silence of about the right length, handed out as
+views of one shared zero buffer, so a long reply costs no memory.
+"""
+
+import asyncio
+import logging
+import shutil
+from typing import Optional
+
+from .audio import AudioBuffer, silence, wav_pcm
+from .audio_codecs import resample_pcm
+from .speech import WORDS_PER_MINUTE
+from ..tracing import run_in_thread
+
+logger = logging.getLogger(__name__)
+
+ESPEAK_WORDS_PER_MINUTE = 175  # espeak's own default speed
+MAX_SILENCE_SECONDS = 30.0  # longer than any one sentence; bounds the shared buffer
+
+
+def estimated_silence(text: str, sample_rate: int, speaking_rate: float = 1.0) -> memoryview:
+    """Silence as long as ``text`` would take to say, up to ``MAX_SILENCE_SECONDS``"""
+    seconds = min(len(text.split()) * 60.0 / (WORDS_PER_MINUTE * speaking_rate), MAX_SILENCE_SECONDS)
+    return silence(int(seconds * sample_rate) * 2)
+
+
+class EspeakSynthesizer:
+    """Synthesizes 16-bit mono PCM with an espeak-ng subprocess per sentence"""
+
+    def __init__(self, executable: Optional[str] = None, timeout: float = 30.0):
+        self.executable = executable or shutil.which("espeak-ng") or shutil.which("espeak")
+        self.timeout = timeout
+
+    @property
+    def available(self) -> bool:
+        return self.executable is not None
+
+    async def synthesize(self, text: str, language: str, voice: str, sample_rate: int,
+                         speaking_rate: float = 1.0) -> AudioBuffer:
+        # espeak voices are lower-case language tags; Riva voice names carry the gender
+        variant = "f3" if "female" in voice.lower() else "m3"
+        process = await asyncio.create_subprocess_exec(
+            self.executable, "--stdout", "--stdin",
+            "-v", f"{language.lower()}+{variant}",
+            "-s", str(int(ESPEAK_WORDS_PER_MINUTE * speaking_rate)),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            # Text goes over stdin so nothing in it can be read as an option
+            wav, errors = await asyncio.wait_for(process.communicate(text.encode("utf-8")), self.timeout)
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+        if process.returncode:
+            message = errors.decode("utf-8", "replace").strip()
+            raise RuntimeError(f"{self.executable} exited with status {process.returncode}: {message}")
+
+        pcm, rate = wav_pcm(wav)
+        if rate != sample_rate:
+            return await run_in_thread("tts.resample", resample_pcm, pcm, rate, sample_rate)
+        return pcm
@@ -64,6 +64,21 @@ class MCPRequest(BaseModel):
     metadata: Optional[Dict[str, Any]] = {}
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class StageTiming(BaseModel):
+    """Timing for a single processing stage of an MCP request"""
+    name: str  # e.g. queue_wait, gemini.generate, langchain.debugging.problem_analysis
+    start_offset: float  # seconds since the request started
+    duration: float  # in seconds
+    tokens_in: Optional[int] = None
+    tokens_out: Optional[int] = None
+
+class RequestTiming(BaseModel):
+    """Per-request breakdown of where processing time was spent"""
+    total: float  # in seconds
+    stages: List[StageTiming] = []
+    tokens_in: int = 0
+    tokens_out: int = 0
+
 class MCPResponse(BaseModel):
     """Base model for MCP responses"""
     request_id: str
@@ -77,6 +92,8 @@ class MCPResponse(BaseModel):
     execution_time: Optional[float] = None
     tokens_used: Optional[int] = None
     voice_output: Optional[str] = None  # Base64 encoded audio
+    voice_format: Optional[str] = None  # encoding of voice_output: pcm, wav, flac, opus or mulaw
+    timing: Optional[RequestTiming] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     completed_at: Optional[datetime] = None
 
@@ -140,6 +157,7 @@ class MCPAnalytics(BaseModel):
     """Model for MCP analytics tracking"""
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     session_id: str
+    user_id: Optional[str] = None
     request_id: str
     task_type: MCPTaskType
     language: Optional[ProgrammingLanguage] = None
@@ -161,8 +179,9 @@ class GeminiConfig(BaseModel):
 class LangChainConfig(BaseModel):
     """Configuration for LangChain integration"""
     chain_type: str = "conversational"
-    memory_type: str = "conversation_buffer"
-    max_memory_length: int = 10
+    memory_type: str = "hybrid"  # hybrid (token budget + rolling summary) or conversation_buffer
+    max_memory_length: int = 10  # exchanges kept by conversation_buffer memory
+    memory_token_budget: int = 2000  # verbatim history tokens per prompt for hybrid memory
     enable_tools: bool = True
     custom_tools: List[str] = []
 
@@ -173,6 +192,17 @@ class RivaConfig(BaseModel):
     voice_name: str = "English-US.Female-1"
     sample_rate: int = 22050
     audio_encoding: str = "LINEAR_PCM"
+    grpc_channels: int = 2  # pooled connections to the Riva server, used round-robin
+    grpc_keepalive_seconds: float = 30.0  # HTTP/2 ping interval on idle channels
+    output_format: str = "pcm"  # voice_output encoding when the client doesn't ask for one
+    fallback_tts: str = "espeak"  # without Riva: espeak (espeak-ng if installed, else silence) or silence
+    tts_max_parallel: int = 4  # sentences synthesized concurrently for one streamed reply
+    max_spoken_seconds: Optional[float] = 90.0  # longer replies are cut short in speech; None for no limit
+    asr_sample_rate: int = 16000  # client audio is resampled to this before recognition
+    audio_preprocess_workers: int = 2  # processes for decode/resample/VAD; 0 runs it on a thread
+    tts_cache_memory_mb: int = 32  # in-process LRU of synthesized sentences
+    tts_cache_dir: Optional[str] = "data/tts_cache"  # shared on-disk tier; None disables it
+    tts_cache_disk_mb: int = 512
 
 class MCPConfig(BaseModel):
     """Main configuration for MCP system"""
@@ -185,3 +215,15 @@ class MCPConfig(BaseModel):
     enable_voice: bool = True
     enable_multimodal: bool = True
     enable_analytics: bool = True
+    analytics_max_events: int = 10000  # raw events kept in the ring buffer
+    analytics_max_keys: int = 10000  # sessions/users with live aggregates
+    analytics_store_max_rows: int = 2000000  # rows kept in the columnar store
+    analytics_log_dir: Optional[str] = None  # durable event log + rollups; None disables
+    analytics_rollup_interval: float = 60.0  # seconds; 0 leaves rollups to an external job
+    session_idle_ttl: float = 3600.0  # seconds without activity before a session is evicted
+    max_sessions_per_user: int = Field(default=20, ge=1)  # oldest session is evicted past this
+    session_memory_limit_mb: int = 256  # approximate cap across all sessions in the process
+    session_backend: str = "memory"  # memory (single worker), sqlite or redis (shared across workers)
+    ws_max_in_flight: int = 8  # concurrent requests per WebSocket connection
+    max_voice_audio_mb: int = 25  # largest raw audio body accepted by the binary voice endpoint
+    voice_intent_model: Optional[str] = None  # joblib text classifier consulted when voice keywords are inconclusive
@@ -5,13 +5,17 @@ This module provides comprehensive REST API endpoints for the Universal MCP syst
 enabling developers to access advanced AI-powered development tools through HTTP requests.
 """
 
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, UploadFile, File, WebSocket, Request
 from fastapi.security import HTTPBearer
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.formparsers import MultiPartException, MultiPartParser
 from typing import Dict, List, Optional, Any
 import asyncio
+import base64
 import logging
+from contextlib import aclosing
 from datetime import datetime
+from urllib.parse import quote
 import json
 
 # Local imports
@@ -22,6 +26,14 @@ from .models import (
     GeminiConfig, LangChainConfig, RivaConfig
 )
 from .service_enhanced import EnhancedMCPService
+from .audio import iter_chunks, iter_wav, to_wav
+from .audio_codecs import encode_audio_async, negotiate_audio_format, output_sample_rate
+from .ws_connection import MCPWebSocketConnection, negotiate_codec
+from .asr_stream import StreamingASRConnection
+from .session_backend import SessionConflictError
+from .timing import serialize_response, server_timing_header, stage_stats
+from ..metrics import ACTIVE_CONNECTIONS
+from ..tracing import get_tracer
 from ..auth.router import get_current_user
 
 # Initialize router and logging
@@ -29,6 +41,9 @@ mcp_router = APIRouter()
 security = HTTPBearer()
 logger = logging.getLogger(__name__)
 
+# Room for multipart boundaries and text fields on top of the voice audio limit
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
 # Global enhanced MCP service instance
 enhanced_mcp_service: Optional[EnhancedMCPService] = None
 
@@ -46,15 +61,47 @@ def get_enhanced_mcp_config() -> MCPConfig:
         ),
         langchain=LangChainConfig(
             chain_type=os.getenv("LANGCHAIN_CHAIN_TYPE", "conversational"),
-            memory_type=os.getenv("LANGCHAIN_MEMORY_TYPE", "conversation_buffer"),
-            max_memory_length=int(os.getenv("LANGCHAIN_MAX_MEMORY", "10"))
+            memory_type=os.getenv("LANGCHAIN_MEMORY_TYPE", "hybrid"),
+            max_memory_length=int(os.getenv("LANGCHAIN_MAX_MEMORY", "10")),
+            memory_token_budget=int(os.getenv("LANGCHAIN_MEMORY_TOKEN_BUDGET", "2000"))
         ),
         riva=RivaConfig(
             server_url=os.getenv("RIVA_SERVER_URL", "localhost:50051"),
             language_code=os.getenv("RIVA_LANGUAGE", "en-US"),
             voice_name=os.getenv("RIVA_VOICE", "English-US.Female-1"),
-            sample_rate=int(os.getenv("RIVA_SAMPLE_RATE", "22050"))
-        )
+            sample_rate=int(os.getenv("RIVA_SAMPLE_RATE", "22050")),
+            grpc_channels=int(os.getenv("RIVA_GRPC_CHANNELS", "2")),
+            grpc_keepalive_seconds=float(os.getenv("RIVA_GRPC_KEEPALIVE_SECONDS", "30")),
+            output_format=os.getenv("RIVA_OUTPUT_FORMAT", "pcm"),
+            fallback_tts=os.getenv("RIVA_FALLBACK_TTS", "espeak"),
+            tts_max_parallel=int(os.getenv("RIVA_TTS_MAX_PARALLEL", "4")),
+            max_spoken_seconds=float(os.getenv("RIVA_MAX_SPOKEN_SECONDS", "90")) or None,
+            asr_sample_rate=int(os.getenv("RIVA_ASR_SAMPLE_RATE", "16000")),
+            audio_preprocess_workers=int(os.getenv("AUDIO_PREPROCESS_WORKERS", "2")),
+            tts_cache_memory_mb=int(os.getenv("RIVA_TTS_CACHE_MEMORY_MB", "32")),
+            tts_cache_dir=os.getenv("RIVA_TTS_CACHE_DIR", "data/tts_cache") or None,
+            tts_cache_disk_mb=int(os.getenv("RIVA_TTS_CACHE_DISK_MB", "512"))
+        ),
+        vector_db_url=os.getenv("VECTOR_DB_URL", "http://localhost:8000"),
+        max_concurrent_requests=int(os.getenv("MCP_MAX_CONCURRENT", "100")),
+        enable_voice=os.getenv("MCP_ENABLE_VOICE", "true").lower() == "true",
+        enable_multimodal=os.getenv("MCP_ENABLE_MULTIMODAL", "true").lower() == "true",
+        enable_analytics=os.getenv("MCP_ENABLE_ANALYTICS", "true").lower() == "true",
+        analytics_max_events=int(os.getenv("MCP_ANALYTICS_MAX_EVENTS", "10000")),
+        analytics_max_keys=int(os.getenv("MCP_ANALYTICS_MAX_KEYS", "10000")),
+        analytics_store_max_rows=int(os.getenv("MCP_ANALYTICS_STORE_MAX_ROWS", "2000000")),
+        analytics_log_dir=(
+            os.getenv("MCP_ANALYTICS_LOG_DIR", "data/analytics")
+            if os.getenv("MCP_ANALYTICS_LOG_ENABLED", "true").lower() == "true" else None
+        ),
+        analytics_rollup_interval=float(os.getenv("MCP_ANALYTICS_ROLLUP_INTERVAL", "60")),
+        session_idle_ttl=float(os.getenv("MCP_SESSION_IDLE_TTL", "3600")),
+        max_sessions_per_user=int(os.getenv("MCP_MAX_SESSIONS_PER_USER", "20")),
+        session_memory_limit_mb=int(os.getenv("MCP_SESSION_MEMORY_LIMIT_MB", "256")),
+        session_backend=os.getenv("MCP_SESSION_BACKEND", "memory"),
+        ws_max_in_flight=int(os.getenv("MCP_WS_MAX_IN_FLIGHT", "8")),
+        max_voice_audio_mb=int(os.getenv("MCP_MAX_VOICE_AUDIO_MB", "25")),
+        voice_intent_model=os.getenv("VOICE_INTENT_MODEL")
     )
 
 def get_enhanced_mcp_service() -> EnhancedMCPService:
@@ -65,6 +112,19 @@ def get_enhanced_mcp_service() -> EnhancedMCPService:
         enhanced_mcp_service = EnhancedMCPService(config)
     return enhanced_mcp_service
 
+async def start_enhanced_mcp_service():
+    """Create the enhanced MCP service at app startup so Riva can warm up before the first voice request"""
+    try:
+        get_enhanced_mcp_service().start()
+    except Exception as e:
+        # The service is created again on first use; startup must not depend on it
+        logger.error(f"Could not start enhanced MCP service: {e}")
+
+async def shutdown_enhanced_mcp_service():
+    """Flush and stop the enhanced MCP service's background work (app shutdown)"""
+    if enhanced_mcp_service is not None:
+        await enhanced_mcp_service.close()
+
 @mcp_router.post("/process", response_model=MCPResponse)
 async def process_mcp_request(
     request: MCPRequest,
@@ -89,10 +149,17 @@ async def process_mcp_request(
         service = get_enhanced_mcp_service()
         
         # Process the request
-        response = await service.process_request(request)
+        with get_tracer().span("mcp.router.process", **{"mcp.task_type": request.task_type.value}):
+            response = await service.process_request(request)
         
         logger.info(f"Enhanced MCP request processed successfully: {response.status}")
-        return response
+        
+        # Serialize here so serialization shows up in the stage breakdown
+        payload = serialize_response(response)
+        headers = {}
+        if payload.get("timing"):
+            headers["Server-Timing"] = server_timing_header(payload["timing"])
+        return JSONResponse(content=payload, headers=headers)
         
     except Exception as e:
         logger.error(f"Error processing enhanced MCP request: {e}")
@@ -115,9 +182,10 @@ async def stream_mcp_response(
         service = get_enhanced_mcp_service()
         
         async def generate_stream():
-            async for chunk in service.gemini_service.stream_response(request):
-                yield f"data: {json.dumps({'chunk': chunk})}\n\n"
-            yield f"data: {json.dumps({'done': True})}\n\n"
+            with ACTIVE_CONNECTIONS.labels("sse").track_inprogress():
+                async for chunk in service.gemini_service.stream_response(request):
+                    yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+                yield f"data: {json.dumps({'done': True})}\n\n"
         
         return StreamingResponse(
             generate_stream(),
@@ -144,7 +212,7 @@ async def process_voice_command(
         logger.info(f"Processing voice command for user {request.user_id}")
         
         service = get_enhanced_mcp_service()
-        response = await service.riva_service.process_voice_command(request)
+        response = await service.riva_service.process_voice_command(request, respond=service.respond_to_voice)
         
         return response
         
@@ -157,6 +225,105 @@ async def process_voice_command(
             completed_at=datetime.utcnow()
         )
 
+async def _limited_body(http_request: Request, max_bytes: int):
+    """The request body as it arrives, failing with 413 once it passes ``max_bytes``"""
+    received = 0
+    async for chunk in http_request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(status_code=413, detail="Audio body too large")
+        yield chunk
+
+async def _read_voice_audio(http_request: Request, max_bytes: int):
+    """Raw audio and form fields from a multipart upload or a bare audio body"""
+    content_type = http_request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        # Count bytes while parsing: the form parser would otherwise spool any size of upload
+        body = _limited_body(http_request, max_bytes + MULTIPART_OVERHEAD_BYTES)
+        try:
+            form = await MultiPartParser(http_request.headers, body).parse()
+        except MultiPartException as e:
+            raise HTTPException(status_code=400, detail=e.message)
+        try:
+            upload = form.get("audio")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail="Multipart body needs an 'audio' file part")
+            if upload.size is not None and upload.size > max_bytes:
+                raise HTTPException(status_code=413, detail="Audio body too large")
+            fields = {key: value for key, value in form.items() if isinstance(value, str)}
+            return await upload.read(), fields
+        finally:
+            await form.close()
+    
+    audio = bytearray()
+    async for chunk in _limited_body(http_request, max_bytes):
+        audio += chunk
+    return memoryview(audio), {}
+
+@mcp_router.post("/voice/audio")
+async def process_voice_audio(
+    http_request: Request,
+    prompt: str = "",
+    language: Optional[str] = None,
+    sample_rate: Optional[int] = None,
+    project_id: Optional[str] = None,
+    stream: bool = False,
+    format: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Process a voice command sent as raw audio and reply with audio
+    
+    The body is the audio itself (``application/octet-stream`` or ``audio/*``)
+    or a multipart form with an ``audio`` file part and optional ``prompt`` and
+    ``language`` fields. WAV, FLAC and Ogg are decoded; anything else is taken
+    as 16-bit mono PCM at ``sample_rate``. The reply is encoded as ``format``
+    (or the best match for the ``Accept`` header: opus, flac, mulaw, wav or pcm;
+    WAV by default), sent chunked when ``stream`` is set, with the recognized
+    and response text in percent-encoded headers. No base64 is involved in
+    either direction.
+    """
+    service = get_enhanced_mcp_service()
+    if not service.riva_service:
+        raise HTTPException(status_code=503, detail="Voice processing not available")
+    
+    audio, fields = await _read_voice_audio(http_request, service.config.max_voice_audio_mb * 1024 * 1024)
+    prompt = fields.get("prompt", prompt)
+    if not len(audio) and not prompt:
+        raise HTTPException(status_code=400, detail="No audio or text prompt provided")
+    
+    request = MCPRequest(
+        task_type=MCPTaskType.VOICE_COMMAND,
+        user_id=current_user["id"],
+        project_id=project_id,
+        prompt=prompt
+    )
+    response, voice_output = await service.riva_service.process_voice_audio(
+        request, audio, fields.get("language", language), sample_rate,
+        respond=service.respond_to_voice
+    )
+    if response.status != "success":
+        return JSONResponse(content=serialize_response(response), status_code=500)
+    
+    result = response.result or {}
+    sample_rate = result.get("sample_rate") or service.config.riva.sample_rate
+    audio_format = negotiate_audio_format(format or http_request.headers.get("accept"), default="wav")
+    headers = {
+        "X-MCP-Request-Id": request.id,
+        "X-MCP-Recognized-Text": quote(result.get("recognized_text", "")),
+        "X-MCP-Response-Text": quote(result.get("response_text", "")),
+    }
+    if audio_format.name == "wav":
+        if stream:
+            return StreamingResponse(iter_wav(voice_output, sample_rate), media_type="audio/wav", headers=headers)
+        return Response(content=to_wav(voice_output, sample_rate), media_type="audio/wav", headers=headers)
+    
+    encoded, encoded_rate = await encode_audio_async(voice_output, sample_rate, audio_format.name)
+    headers["X-MCP-Sample-Rate"] = str(encoded_rate)
+    if stream:
+        return StreamingResponse(iter_chunks(encoded), media_type=audio_format.media_type, headers=headers)
+    return Response(content=encoded, media_type=audio_format.media_type, headers=headers)
+
 @mcp_router.post("/session/create", response_model=MCPSession)
 async def create_enhanced_session(
     user_id: str,
@@ -193,10 +360,85 @@ async def continue_conversation(
         
         return {"session_id": session_id, "response": response}
         
+    except SessionConflictError as e:
+        # Another turn in this session was committed first; the client can retry
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error(f"Error continuing conversation: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@mcp_router.post("/session/{session_id}/continue/stream")
+async def stream_conversation(
+    session_id: str,
+    message: str,
+    voice: bool = False,
+    audio_format: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Continue a conversation, streaming the reply over Server-Sent Events.
+    
+    Emits ``{"chunk": ...}`` events as tokens arrive, then ``{"done": true, "response": ...}``
+    once the exchange is committed to session memory. If the client disconnects
+    first, the partial turn is discarded and the session is left unchanged.
+    
+    With ``voice``, ``{"audio": ..., "seq": n, "sample_rate": ..., "format": ...}``
+    events carry base64 audio for each sentence, in order, as soon as it is
+    synthesized: 16-bit mono PCM unless ``audio_format`` (an Accept-style list)
+    asks for opus, flac, mulaw or wav, in which case each sentence is a complete clip.
+    """
+    service = get_enhanced_mcp_service()
+    if not await service.get_session(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    if voice and not service.riva_service:
+        raise HTTPException(status_code=503, detail="Voice processing not available")
+    
+    async def conversation_events():
+        if not voice:
+            async with aclosing(service.stream_conversation(session_id, message)) as stream:
+                async for chunk in stream:
+                    yield "chunk", chunk
+            return
+        speech = service.stream_conversation_speech(session_id, message, audio_format=output.name)
+        async with aclosing(speech) as stream:
+            async for event in stream:
+                yield event
+    
+    output = service.riva_service.output_format(audio_format) if voice else None
+    
+    async def generate_stream():
+        chunks = []
+        seq = 0
+        sample_rate = (
+            output_sample_rate(output.name, service.riva_service.sample_rate_for("explanation")) if voice else None
+        )
+        with ACTIVE_CONNECTIONS.labels("sse").track_inprogress():
+            try:
+                async with aclosing(conversation_events()) as stream:
+                    async for kind, value in stream:
+                        if kind == "chunk":
+                            chunks.append(value)
+                            yield f"data: {json.dumps({'chunk': value})}\n\n"
+                        else:
+                            audio = base64.b64encode(value).decode('ascii')
+                            event = {'audio': audio, 'seq': seq, 'sample_rate': sample_rate, 'format': output.name}
+                            yield f"data: {json.dumps(event)}\n\n"
+                            seq += 1
+            except Exception as e:
+                logger.error(f"Error streaming conversation for session {session_id}: {e}")
+                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                return
+            yield f"data: {json.dumps({'done': True, 'response': ''.join(chunks)})}\n\n"
+    
+    return StreamingResponse(
+        generate_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
+
 @mcp_router.get("/analytics/session/{session_id}")
 async def get_session_analytics(
     session_id: str,
@@ -365,24 +607,27 @@ async def get_ai_models_status():
     except Exception as e:
         logger.error(f"Error getting models status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-            server_url=os.getenv("RIVA_SERVER_URL", "http://localhost:50051"),
-            language_code=os.getenv("RIVA_LANGUAGE", "en-US"),
-            voice_name=os.getenv("RIVA_VOICE", "English-US.Female-1")
-        ),
-        vector_db_url=os.getenv("VECTOR_DB_URL", "http://localhost:8000"),
-        max_concurrent_requests=int(os.getenv("MCP_MAX_CONCURRENT", "100")),
-        enable_voice=os.getenv("MCP_ENABLE_VOICE", "true").lower() == "true",
-        enable_multimodal=os.getenv("MCP_ENABLE_MULTIMODAL", "true").lower() == "true",
-        enable_analytics=os.getenv("MCP_ENABLE_ANALYTICS", "true").lower() == "true"
-    )
+
+@mcp_router.get("/metrics/stages")
+async def get_stage_metrics():
+    """
+    Get aggregated per-stage timing and token statistics for this worker
+    """
+    return {
+        "stages": stage_stats.snapshot(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+# ============================================================================
+# Legacy Service Dependency
+# ============================================================================
+
+# The legacy endpoints below share the enhanced service instance
+MCPService = EnhancedMCPService
 
 async def get_mcp_service() -> MCPService:
     """Dependency to get MCP service instance"""
-    global mcp_service
-    if mcp_service is None:
-        config = get_mcp_config()
-        mcp_service = MCPService(config)
-    return mcp_service
+    return get_enhanced_mcp_service()
 
 # ============================================================================
 # Session Management Endpoints
@@ -433,11 +678,7 @@ async def list_user_sessions(
     service: MCPService = Depends(get_mcp_service)
 ):
     """List all sessions for the current user"""
-    user_sessions = [
-        session for session in service.sessions.values()
-        if session.user_id == current_user["id"] and session.is_active
-    ]
-    return user_sessions
+    return await service.list_user_sessions(current_user["id"])
 
 # ============================================================================
 # Core AI Processing Endpoints
@@ -446,7 +687,6 @@ async def list_user_sessions(
 @mcp_router.post("/generate", response_model=MCPResponse)
 async def generate_code(
     request: CodeGenerationRequest,
-    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
     service: MCPService = Depends(get_mcp_service)
 ):
@@ -463,14 +703,6 @@ async def generate_code(
         # Process the request
         response = await service.process_request(request)
         
-        # Add background task for analytics processing
-        background_tasks.add_task(
-            _process_analytics,
-            request.dict(),
-            response.dict(),
-            current_user["id"]
-        )
-        
         return response
     except Exception as e:
         logger.error(f"Code generation failed: {e}")
@@ -479,7 +711,6 @@ async def generate_code(
 @mcp_router.post("/debug", response_model=MCPResponse)
 async def debug_code(
     request: DebuggingRequest,
-    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
     service: MCPService = Depends(get_mcp_service)
 ):
@@ -493,13 +724,6 @@ async def debug_code(
         request.user_id = current_user["id"]
         response = await service.process_request(request)
         
-        background_tasks.add_task(
-            _process_analytics,
-            request.dict(),
-            response.dict(),
-            current_user["id"]
-        )
-        
         return response
     except Exception as e:
         logger.error(f"Debugging failed: {e}")
@@ -508,7 +732,6 @@ async def debug_code(
 @mcp_router.post("/architect", response_model=MCPResponse)
 async def design_architecture(
     request: ArchitectureRequest,
-    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
     service: MCPService = Depends(get_mcp_service)
 ):
@@ -522,13 +745,6 @@ async def design_architecture(
         request.user_id = current_user["id"]
         response = await service.process_request(request)
         
-        background_tasks.add_task(
-            _process_analytics,
-            request.dict(),
-            response.dict(),
-            current_user["id"]
-        )
-        
         return response
     except Exception as e:
         logger.error(f"Architecture design failed: {e}")
@@ -537,7 +753,6 @@ async def design_architecture(
 @mcp_router.post("/voice", response_model=MCPResponse)
 async def process_voice_command(
     request: VoiceCommandRequest,
-    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
     service: MCPService = Depends(get_mcp_service)
 ):
@@ -551,13 +766,6 @@ async def process_voice_command(
         request.user_id = current_user["id"]
         response = await service.process_request(request)
         
-        background_tasks.add_task(
-            _process_analytics,
-            request.dict(),
-            response.dict(),
-            current_user["id"]
-        )
-        
         return response
     except Exception as e:
         logger.error(f"Voice command processing failed: {e}")
@@ -566,7 +774,6 @@ async def process_voice_command(
 @mcp_router.post("/process", response_model=MCPResponse)
 async def process_general_request(
     request: MCPRequest,
-    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
     service: MCPService = Depends(get_mcp_service)
 ):
@@ -580,13 +787,6 @@ async def process_general_request(
         request.user_id = current_user["id"]
         response = await service.process_request(request)
         
-        background_tasks.add_task(
-            _process_analytics,
-            request.dict(),
-            response.dict(),
-            current_user["id"]
-        )
-        
         return response
     except Exception as e:
         logger.error(f"Request processing failed: {e}")
@@ -643,6 +843,7 @@ async def analyze_uploaded_files(
 @mcp_router.get("/analytics/user", response_model=Dict[str, Any])
 async def get_user_analytics(
     days: int = 30,
+    bucket: str = "day",
     current_user: dict = Depends(get_current_user),
     service: MCPService = Depends(get_mcp_service)
 ):
@@ -650,12 +851,15 @@ async def get_user_analytics(
     Get analytics data for the current user.
     
     Includes usage statistics, success rates, and performance metrics
-    for the specified time period.
+    for the specified time period, with a per-minute/hour/day timeline.
     """
+    if bucket not in ("minute", "hour", "day"):
+        raise HTTPException(status_code=400, detail="bucket must be minute, hour or day")
     try:
         analytics = await service.get_user_analytics(
             user_id=current_user["id"],
-            days=days
+            days=days,
+            bucket=bucket
         )
         return analytics
     except Exception as e:
@@ -676,6 +880,7 @@ async def get_mcp_status(
         status = {
             "status": "operational",
             "active_sessions": len(service.sessions),
+            "session_store": service.sessions.stats(),
             "active_requests": len(service.active_requests),
             "features": {
                 "voice_enabled": service.config.enable_voice,
@@ -742,15 +947,6 @@ async def validate_mcp_config(
 # Helper Functions
 # ============================================================================
 
-async def _process_analytics(request_data: dict, response_data: dict, user_id: str):
-    """Background task for processing analytics data"""
-    try:
-        # Process analytics in background
-        logger.info(f"Processing analytics for user {user_id}")
-        # Could send to external analytics service, update databases, etc.
-    except Exception as e:
-        logger.error(f"Analytics processing failed: {e}")
-
 def _get_config_recommendations(validation_results: dict) -> List[str]:
     """Get configuration improvement recommendations"""
     recommendations = []
@@ -772,7 +968,7 @@ def _get_config_recommendations(validation_results: dict) -> List[str]:
 
 @mcp_router.websocket("/ws/{session_id}")
 async def websocket_endpoint(
-    websocket,  # WebSocket type would be imported from fastapi
+    websocket: WebSocket,
     session_id: str,
     service: MCPService = Depends(get_mcp_service)
 ):
@@ -780,10 +976,14 @@ async def websocket_endpoint(
     WebSocket endpoint for real-time MCP communication.
     
     Enables real-time AI assistance, live code generation,
-    and interactive development sessions.
+    and interactive development sessions. Requests are multiplexed: several
+    can be in flight at once, correlated by ``request_id`` and cancellable by
+    id (see ``ws_connection`` for the frame protocol). Clients offering the
+    ``mcp.msgpack.v1`` subprotocol get compact binary frames; JSON otherwise.
     """
     try:
-        await websocket.accept()
+        codec = negotiate_codec(websocket.scope.get("subprotocols", []))
+        await websocket.accept(subprotocol=codec.subprotocol)
         
         # Get session
         session = await service.get_session(session_id)
@@ -793,31 +993,52 @@ async def websocket_endpoint(
         
         logger.info(f"WebSocket connected for session {session_id}")
         
-        while True:
-            # Receive message from client
-            data = await websocket.receive_json()
-            
-            # Process MCP request
-            request = MCPRequest(**data)
-            request.user_id = session.user_id
-            
-            # Send processing status
-            await websocket.send_json({
-                "type": "status",
-                "message": "Processing request...",
-                "request_id": request.id
-            })
-            
-            # Process request
-            response = await service.process_request(request)
-            
-            # Send response
-            await websocket.send_json({
-                "type": "response",
-                "data": response.dict(),
-                "request_id": request.id
-            })
-            
+        connection = MCPWebSocketConnection(
+            websocket, service, session, max_in_flight=service.config.ws_max_in_flight, codec=codec
+        )
+        with ACTIVE_CONNECTIONS.labels("websocket").track_inprogress():
+            await connection.serve()
+        
     except Exception as e:
         logger.error(f"WebSocket error for session {session_id}: {e}")
         await websocket.close(code=4000, reason="Internal server error")
+
+@mcp_router.websocket("/ws/{session_id}/asr")
+async def streaming_asr_endpoint(
+    websocket: WebSocket,
+    session_id: str,
+    language: Optional[str] = None,
+    sample_rate: int = 16000,
+    process: bool = True,
+    service: MCPService = Depends(get_mcp_service)
+):
+    """
+    Streaming speech recognition for hands-free development.
+    
+    Binary frames carry 16-bit mono PCM at ``sample_rate``; partial and final
+    transcripts are sent back as they are recognized, and each final transcript
+    is processed as a voice command immediately unless ``process`` is false
+    (see ``asr_stream`` for the frame protocol).
+    """
+    try:
+        await websocket.accept()
+        
+        session = await service.get_session(session_id)
+        if not session:
+            await websocket.close(code=4004, reason="Session not found")
+            return
+        if not service.riva_service:
+            await websocket.close(code=4003, reason="Voice processing not available")
+            return
+        
+        connection = StreamingASRConnection(
+            websocket, service, session, language=language, sample_rate=sample_rate, process=process
+        )
+        with ACTIVE_CONNECTIONS.labels("asr").track_inprogress():
+            await connection.serve()
+        if not connection.disconnected:
+            await websocket.close()
+        
+    except Exception as e:
+        logger.error(f"Streaming ASR error for session {session_id}: {e}")
+        await websocket.close(code=4000, reason="Internal server error")
@@ -23,6 +23,7 @@ from .models import (
 from .integrations.gemini_enhanced import EnhancedGeminiService
 from .integrations.langchain_enhanced import EnhancedLangChainService
 from .integrations.riva_enhanced import EnhancedRivaService
+from .voice_intent import VoiceIntentRouter, derive_request
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +42,7 @@ class EnhancedMCPService:
         self.sessions: Dict[str, MCPSession] = {}
         self.active_requests: Dict[str, MCPRequest] = {}
         self.analytics: List[MCPAnalytics] = []
+        self.voice_intents = VoiceIntentRouter(config.voice_intent_model)
         
         # Initialize AI services
         self._initialize_ai_services()
@@ -713,12 +715,10 @@ class EnhancedMCPService:
             # Process voice input (placeholder - would integrate with speech-to-text)
             transcribed_text = await self._transcribe_audio(audio_data)
             
-            # Process the transcribed command
-            processed_request = MCPRequest(
-                task_type=MCPTaskType.CODE_GENERATION,  # Default fallback
-                user_id=request.user_id,
-                prompt=transcribed_text,
-                context=request.context
+            # Route the transcribed command locally; code generation when nothing matches
+            intent = self.voice_intents.classify(transcribed_text)
+            processed_request = derive_request(
+                transcribed_text, request, intent, intent.task_type or MCPTaskType.CODE_GENERATION
             )
             
             # Process as regular request
@@ -732,7 +732,7 @@ class EnhancedMCPService:
             return MCPResponse(
                 request_id=request.id,
                 status="success",
-                result={"transcription": transcribed_text, "response": result.dict()},
+                result={"transcription": transcribed_text, "intent": intent.as_dict(), "response": result.dict()},
                 voice_output=voice_output
             )
             
@@ -8,7 +8,8 @@ comprehensive AI development assistance capabilities.
 
 import asyncio
 import logging
-from typing import Dict, List, Optional, Any, Union
+from contextlib import aclosing
+from typing import AsyncGenerator, Dict, List, Optional, Any, Tuple, Union
 from datetime import datetime, timedelta
 import json
 import uuid
@@ -20,6 +21,15 @@ from .models import (
     VoiceCommandRequest, MCPSession, MCPProject, MCPAnalytics,
     GeminiConfig, LangChainConfig, RivaConfig, MCPConfig
 )
+from .analytics import AnalyticsEngine
+from .analytics_log import AnalyticsEventLog, AnalyticsRollup, run_rollups_periodically
+from .session_backend import create_session_backend
+from .session_store import SessionStore
+from .audio_codecs import encode_audio_async
+from .timing import request_timer
+from .voice_intent import VoiceIntentRouter, derive_request
+from ..metrics import MCP_IN_FLIGHT, MCP_QUEUE_DEPTH, record_mcp_request
+from ..tracing import get_tracer, run_in_thread
 
 logger = logging.getLogger(__name__)
 
@@ -35,9 +45,43 @@ class EnhancedMCPService:
     def __init__(self, config: MCPConfig):
         """Initialize the enhanced MCP service with all AI integrations"""
         self.config = config
-        self.sessions: Dict[str, MCPSession] = {}
+        
+        # Sessions are persisted in a backend shared by all workers; each worker keeps
+        # hot sessions in a bounded local store (idle TTL, per-user cap, memory LRU).
+        # Conversation memory dominates, so LangChain sessions get most of the budget.
+        self._session_memory_limit = config.session_memory_limit_mb * 1024 * 1024
+        self.session_backend = create_session_backend(
+            config.session_backend, memory_max_bytes=self._session_memory_limit // 2
+        )
+        self.sessions: SessionStore[MCPSession] = SessionStore(
+            "mcp",
+            idle_ttl=config.session_idle_ttl,
+            max_per_user=config.max_sessions_per_user,
+            max_bytes=self._session_memory_limit // 8,
+            on_evict=self._on_session_evicted
+        )
+        self._sweep_task: Optional[asyncio.Task] = None
+        self._warmup_task: Optional[asyncio.Task] = None
         self.active_requests: Dict[str, MCPRequest] = {}
-        self.analytics: List[MCPAnalytics] = []
+        self.analytics = AnalyticsEngine(
+            config.analytics_max_events,
+            config.analytics_max_keys,
+            config.analytics_store_max_rows
+        )
+        
+        # Durable event log; dashboards read its rollups so history survives restarts
+        self.event_log: Optional[AnalyticsEventLog] = None
+        self.rollup: Optional[AnalyticsRollup] = None
+        self._rollup_task: Optional[asyncio.Task] = None
+        if config.enable_analytics and config.analytics_log_dir:
+            self.event_log = AnalyticsEventLog(config.analytics_log_dir)
+            self.rollup = AnalyticsRollup(config.analytics_log_dir)
+        
+        # Admission control; time spent waiting here is reported as queue_wait
+        self._admission = asyncio.Semaphore(config.max_concurrent_requests)
+        
+        # Voice commands are routed to task handlers locally, without an LLM call
+        self.voice_intents = VoiceIntentRouter(config.voice_intent_model)
         
         # Initialize AI services
         self._initialize_ai_services()
@@ -63,7 +107,7 @@ class EnhancedMCPService:
         try:
             # Import AI services here to avoid circular imports
             from .integrations.gemini_enhanced import EnhancedGeminiService
-            from .integrations.langchain_enhanced import EnhancedLangChainService
+            from .integrations.langchain_enhanced import EnhancedLangChainService, conversation_size
             
             # Initialize Enhanced Gemini Service
             self.gemini_service = EnhancedGeminiService(self.config.gemini)
@@ -72,7 +116,16 @@ class EnhancedMCPService:
             # Initialize Enhanced LangChain Service
             self.langchain_service = EnhancedLangChainService(
                 self.config.langchain,
-                self.config.gemini.api_key
+                self.config.gemini.api_key,
+                sessions=SessionStore(
+                    "langchain",
+                    idle_ttl=self.config.session_idle_ttl,
+                    max_per_user=self.config.max_sessions_per_user,
+                    max_bytes=self._session_memory_limit - self._session_memory_limit // 8,
+                    size_of=conversation_size
+                ),
+                backend=self.session_backend,
+                session_ttl=self.config.session_idle_ttl
             )
             logger.info("Enhanced LangChain service initialized")
             
@@ -96,42 +149,74 @@ class EnhancedMCPService:
         """
         Process an MCP request using the appropriate AI service combination
         """
+        with request_timer(request.id) as timer, get_tracer().span(
+            "mcp.process_request",
+            **{"mcp.request_id": request.id, "mcp.task_type": request.task_type.value, "mcp.user_id": request.user_id}
+        ) as span:
+            try:
+                if request.task_type == MCPTaskType.VOICE_COMMAND:
+                    # The command's real work is the request it derives, which is admitted
+                    # itself; holding a slot here too would deadlock once every slot is a
+                    # voice command waiting for its derived request
+                    response = await self._dispatch(request)
+                else:
+                    # Wait for an admission slot (bounded by max_concurrent_requests)
+                    with timer.stage("queue_wait"), MCP_QUEUE_DEPTH.track_inprogress():
+                        await self._admission.acquire()
+                    try:
+                        with MCP_IN_FLIGHT.track_inprogress():
+                            response = await self._dispatch(request)
+                    finally:
+                        self._admission.release()
+            
+            except Exception as e:
+                logger.error(f"Error processing MCP request {request.id}: {e}")
+                response = MCPResponse(
+                    request_id=request.id,
+                    status="error",
+                    error_message=str(e),
+                    completed_at=datetime.utcnow()
+                )
+                span.record_exception(e)
+            
+            # Handlers often return the inner Gemini timing; report end-to-end time
+            response.execution_time = timer.elapsed()
+            response.timing = timer.summary()
+            record_mcp_request(request.task_type.value, response.status, response.execution_time)
+            
+            # Update analytics
+            await self._record_analytics(request, response)
+            
+            return response
+    
+    async def _dispatch(self, request: MCPRequest) -> MCPResponse:
+        """Route an admitted request to its handler and post-process the response"""
         try:
             # Store active request
             self.active_requests[request.id] = request
             
             # Route to appropriate handler
-            if request.task_type in self.task_routes:
-                handler = self.task_routes[request.task_type]
+            handler = self.task_routes.get(request.task_type, self._handle_generic_request)
+            with get_tracer().span(f"mcp.handler.{request.task_type.value}"):
                 response = await handler(request)
-            else:
-                response = await self._handle_generic_request(request)
             
             # Add voice output if requested
             if request.metadata and request.metadata.get("include_voice", False):
                 if response.explanation and not response.voice_output and self.riva_service:
+                    audio_format = self.riva_service.output_format(request.metadata.get("audio_format"))
                     response.voice_output = await self.riva_service.create_audio_response(
-                        response.explanation, 
-                        str(request.task_type.value)
+                        response.explanation,
+                        str(request.task_type.value),
+                        audio_format.name
                     )
-            
-            # Update analytics
-            await self._record_analytics(request, response)
-            
-            # Clean up
-            if request.id in self.active_requests:
-                del self.active_requests[request.id]
+                    if response.voice_output:
+                        response.voice_format = audio_format.name
             
             return response
-            
-        except Exception as e:
-            logger.error(f"Error processing MCP request {request.id}: {e}")
-            return MCPResponse(
-                request_id=request.id,
-                status="error",
-                error_message=str(e),
-                completed_at=datetime.utcnow()
-            )
+        
+        finally:
+            # Clean up
+            self.active_requests.pop(request.id, None)
     
     async def _handle_code_generation(self, request: CodeGenerationRequest) -> MCPResponse:
         """Handle code generation requests with enhanced capabilities"""
@@ -297,7 +382,29 @@ class EnhancedMCPService:
                 error_message="Voice processing not available (Riva service not initialized)",
                 completed_at=datetime.utcnow()
             )
-        return await self.riva_service.process_voice_command(request)
+        return await self.riva_service.process_voice_command(request, respond=self.respond_to_voice)
+    
+    async def respond_to_voice(self, command_text: str, request: MCPRequest) -> Optional[MCPResponse]:
+        """
+        Run a recognized voice command as the MCP task it asks for
+        
+        The intent comes from the local keyword/model classifier; the derived
+        request then goes through ``process_request`` like a typed one. Returns
+        None for help and for commands that match no task.
+        """
+        intent = self.voice_intents.classify(command_text)
+        logger.info(
+            f"Voice command for request {request.id} routed to "
+            f"{intent.task_type.value if intent.task_type else 'none'} "
+            f"({intent.source}, confidence {intent.confidence:.2f})"
+        )
+        if intent.task_type is None or intent.is_help:
+            return None
+        
+        derived = derive_request(command_text, request, intent)
+        response = await self.process_request(derived)
+        response.result = {**(response.result or {}), "intent": intent.as_dict()}
+        return response
     
     async def _handle_multi_modal(self, request: MCPRequest) -> MCPResponse:
         """Handle multi-modal requests (text + image/voice)"""
@@ -307,11 +414,15 @@ class EnhancedMCPService:
             
             # Add voice output if requested
             if response.explanation and self.riva_service:
+                audio_format = self.riva_service.output_format((request.metadata or {}).get("audio_format"))
                 voice_output = await self.riva_service.create_audio_response(
                     response.explanation,
-                    "explanation"
+                    "explanation",
+                    audio_format.name
                 )
                 response.voice_output = voice_output
+                if voice_output:
+                    response.voice_format = audio_format.name
             
             return response
             
@@ -367,7 +478,10 @@ class EnhancedMCPService:
             )
             session.langchain_session_id = langchain_session_id
             
-            self.sessions[session.id] = session
+            self.sessions.put(session.id, user_id, session)
+            await self._save_session(session)
+            await self._enforce_session_limit(user_id)
+            self._ensure_session_sweeper()
             
             logger.info(f"Created enhanced MCP session {session.id} for user {user_id}")
             return session
@@ -376,13 +490,75 @@ class EnhancedMCPService:
             logger.error(f"Error creating session: {e}")
             raise
     
+    async def _save_session(self, session: MCPSession):
+        """Write a session through to the shared backend (also extends its idle TTL)"""
+        await self.session_backend.save(
+            "mcp", session.id, session.user_id, session.dict(), self.config.session_idle_ttl
+        )
+    
+    async def _load_session(self, session_id: str) -> Optional[MCPSession]:
+        """Read a session from the shared backend and refresh the local copy"""
+        record = await self.session_backend.load("mcp", session_id)
+        if record is None:
+            self.sessions.remove(session_id)
+            return None
+        session = MCPSession(**record)
+        self.sessions.put(session_id, session.user_id, session)
+        return session
+    
+    async def _enforce_session_limit(self, user_id: str):
+        """Delete a user's least recently used sessions past max_sessions_per_user"""
+        session_ids = await self.session_backend.user_session_ids("mcp", user_id)
+        excess = session_ids[:max(0, len(session_ids) - self.config.max_sessions_per_user)]
+        if not excess:
+            return
+        for session in await self.session_backend.load_many("mcp", excess):
+            if session.get("langchain_session_id") and self.langchain_service:
+                await self.langchain_service.clear_session(session["langchain_session_id"], user_id)
+        for session_id in excess:
+            self.sessions.remove(session_id)
+            await self.session_backend.delete("mcp", session_id, user_id)
+        logger.info(f"Removed {len(excess)} sessions over the per-user limit for user {user_id}")
+    
+    async def get_session(self, session_id: str) -> Optional[MCPSession]:
+        """Retrieve an existing MCP session (from the local cache when hot)"""
+        session = self.sessions.get(session_id) or await self._load_session(session_id)
+        if session:
+            session.last_activity = datetime.utcnow()
+        return session
+    
+    async def list_user_sessions(self, user_id: str) -> List[MCPSession]:
+        """Active sessions for one user, via the backend's per-user index"""
+        session_ids = await self.session_backend.user_session_ids("mcp", user_id)
+        sessions = [MCPSession(**record) for record in await self.session_backend.load_many("mcp", session_ids)]
+        return [session for session in sessions if session.is_active]
+    
+    def _on_session_evicted(self, session_id: str, session: MCPSession, reason: str):
+        """Drop the locally cached conversation behind a session evicted from this worker"""
+        if session.langchain_session_id and getattr(self, "langchain_service", None):
+            self.langchain_service.sessions.remove(session.langchain_session_id)
+    
+    async def _conversation_session(self, session_id: str) -> MCPSession:
+        """Session for a conversation turn, with a live LangChain conversation behind it"""
+        # Always read through: another worker may have replaced the conversation
+        session = await self._load_session(session_id)
+        if session is None:
+            raise ValueError(f"Session {session_id} not found")
+        session.last_activity = datetime.utcnow()
+        
+        # The conversation may have expired on its own; start a fresh one
+        # rather than failing the session
+        if (self.langchain_service and session.langchain_session_id
+                and not await self.langchain_service.has_session(session.langchain_session_id)):
+            session.langchain_session_id = await self.langchain_service.create_conversation_session(
+                session.user_id, session.project_id
+            )
+        return session
+    
     async def continue_conversation(self, session_id: str, message: str) -> str:
         """Continue a conversation in an existing session"""
         try:
-            if session_id not in self.sessions:
-                raise ValueError(f"Session {session_id} not found")
-            
-            session = self.sessions[session_id]
+            session = await self._conversation_session(session_id)
             
             # Use LangChain for conversation continuity
             if hasattr(session, 'langchain_session_id') and session.langchain_session_id:
@@ -394,44 +570,145 @@ class EnhancedMCPService:
                 request = MCPRequest(
                     task_type=MCPTaskType.CODE_GENERATION,
                     user_id=session.user_id,
-                    prompt=message
+                    prompt=message,
+                    metadata={"session_id": session_id}
                 )
                 mcp_response = await self.gemini_service.process_request(request)
                 response = mcp_response.explanation or "I'm here to help with your development needs."
             
+            await self._save_session(session)
             return response
             
         except Exception as e:
             logger.error(f"Error continuing conversation: {e}")
             raise
     
+    async def stream_conversation(self, session_id: str, message: str) -> AsyncGenerator[str, None]:
+        """
+        Continue a conversation, yielding the reply as it is generated.
+        
+        The turn is committed to session memory only when the reply completes;
+        closing the generator early discards it.
+        """
+        session = await self._conversation_session(session_id)
+        
+        if session.langchain_session_id:
+            stream = self.langchain_service.stream_conversation(session.langchain_session_id, message)
+        else:
+            # Fallback to direct streaming (no conversation memory)
+            request = MCPRequest(
+                task_type=MCPTaskType.CODE_GENERATION,
+                user_id=session.user_id,
+                prompt=message,
+                metadata={"session_id": session_id}
+            )
+            stream = self.gemini_service.stream_response(request)
+        
+        async with aclosing(stream):
+            async for chunk in stream:
+                yield chunk
+        
+        await self._save_session(session)
+    
+    async def stream_conversation_speech(self, session_id: str, message: str,
+                                         voice_type: str = "explanation",
+                                         audio_format: str = "pcm") -> AsyncGenerator[Tuple[str, Any], None]:
+        """
+        Continue a conversation with a spoken reply.
+        
+        Yields ``("chunk", text)`` as the reply is generated and ``("audio", data)``
+        for each synthesized sentence (encoded as ``audio_format``, each sentence a
+        complete clip), in the order they become available. The text stream is not
+        held back by synthesis; audio for a sentence follows it by roughly one
+        sentence's TTS time.
+        """
+        if not self.riva_service:
+            raise RuntimeError("Voice processing not available (Riva service not initialized)")
+        
+        events: asyncio.Queue = asyncio.Queue()
+        text: asyncio.Queue = asyncio.Queue()
+        
+        async def generate():
+            try:
+                async with aclosing(self.stream_conversation(session_id, message)) as stream:
+                    async for chunk in stream:
+                        text.put_nowait(chunk)
+                        events.put_nowait(("chunk", chunk))
+            finally:
+                text.put_nowait(None)
+        
+        async def reply_text():
+            while (chunk := await text.get()) is not None:
+                yield chunk
+        
+        async def speak():
+            async with aclosing(self.riva_service.stream_speech(reply_text(), voice_type)) as audio:
+                sample_rate = self.riva_service.sample_rate_for(voice_type)
+                async for pcm in audio:
+                    if audio_format != "pcm":
+                        pcm, _ = await encode_audio_async(pcm, sample_rate, audio_format)
+                    events.put_nowait(("audio", pcm))
+        
+        tasks = [asyncio.create_task(generate()), asyncio.create_task(speak())]
+        for task in tasks:
+            task.add_done_callback(lambda done: events.put_nowait((None, done)))
+        try:
+            running = len(tasks)
+            while running:
+                kind, value = await events.get()
+                if kind is None:
+                    running -= 1
+                    if not value.cancelled() and value.exception():
+                        raise value.exception()
+                    continue
+                yield kind, value
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
     async def get_session_analytics(self, session_id: str) -> Dict[str, Any]:
         """Get analytics for a specific session"""
         try:
-            if session_id not in self.sessions:
+            session = await self.get_session(session_id)
+            if session is None:
                 return {}
             
-            session = self.sessions[session_id]
-            session_analytics = [a for a in self.analytics if a.session_id == session_id]
-            
             return {
                 "session_id": session_id,
                 "user_id": session.user_id,
-                "total_requests": len(session_analytics),
-                "task_distribution": self._calculate_task_distribution(session_analytics),
-                "avg_response_time": self._calculate_avg_response_time(session_analytics),
-                "success_rate": self._calculate_success_rate(session_analytics)
+                **self.analytics.session_summary(session_id)
             }
             
         except Exception as e:
             logger.error(f"Error getting session analytics: {e}")
             return {}
     
+    async def get_user_analytics(self, user_id: str, days: int = 30,
+                                 bucket: str = "day") -> Dict[str, Any]:
+        """Get analytics for a user over the last ``days`` days, bucketed by minute/hour/day"""
+        if self.rollup and bucket != "minute":
+            # Precomputed hourly/daily aggregates, including history from before a restart
+            return await run_in_thread(
+                "analytics.rollup_report",
+                self.rollup.user_report, user_id, days, bucket
+            )
+        # Rollups are hourly at the finest, so minute buckets come from this worker's
+        # in-memory store. Vectorized, but can touch millions of rows; keep it off the event loop
+        return await run_in_thread(
+            "analytics.user_report",
+            self.analytics.store.user_report, user_id, days, bucket
+        )
+    
     async def _record_analytics(self, request: MCPRequest, response: MCPResponse):
         """Record analytics for request/response pair"""
+        if not self.config.enable_analytics:
+            return
         try:
             analytics = MCPAnalytics(
-                session_id=request.user_id,  # Using user_id as session identifier
+                # Requests made within a session carry its id; fall back to the user
+                session_id=(request.metadata or {}).get("session_id") or request.user_id,
+                user_id=request.user_id,
                 request_id=request.id,
                 task_type=request.task_type,
                 language=request.language,
@@ -441,34 +718,58 @@ class EnhancedMCPService:
                 created_at=datetime.utcnow()
             )
             
-            self.analytics.append(analytics)
+            self.analytics.record(analytics)
+            if self.event_log:
+                self.event_log.enqueue(analytics)
+                self._ensure_rollup_task()
             
         except Exception as e:
             logger.error(f"Error recording analytics: {e}")
     
-    def _calculate_task_distribution(self, analytics: List[MCPAnalytics]) -> Dict[str, int]:
-        """Calculate task type distribution"""
-        distribution = {}
-        for analytic in analytics:
-            task_type = analytic.task_type.value
-            distribution[task_type] = distribution.get(task_type, 0) + 1
-        return distribution
-    
-    def _calculate_avg_response_time(self, analytics: List[MCPAnalytics]) -> float:
-        """Calculate average response time"""
-        if not analytics:
-            return 0.0
-        
-        total_time = sum(a.response_time for a in analytics)
-        return total_time / len(analytics)
+    def _ensure_rollup_task(self):
+        """Start the periodic rollup job on first use (needs a running event loop)"""
+        if self.config.analytics_rollup_interval <= 0:
+            return
+        if self._rollup_task is None or self._rollup_task.done():
+            self._rollup_task = asyncio.create_task(
+                run_rollups_periodically(self.rollup, self.config.analytics_rollup_interval)
+            )
     
-    def _calculate_success_rate(self, analytics: List[MCPAnalytics]) -> float:
-        """Calculate success rate"""
-        if not analytics:
-            return 0.0
-        
-        successful = sum(1 for a in analytics if a.success)
-        return successful / len(analytics) * 100
+    def _ensure_session_sweeper(self):
+        """Periodically reap idle sessions so memory is released without new traffic"""
+        if self._sweep_task is None or self._sweep_task.done():
+            self._sweep_task = asyncio.create_task(self._sweep_sessions())
+    
+    async def _sweep_sessions(self):
+        interval = max(1.0, min(60.0, self.config.session_idle_ttl / 4))
+        while True:
+            await asyncio.sleep(interval)
+            self.sessions.sweep()
+            if self.langchain_service:
+                self.langchain_service.sessions.sweep()
+            try:
+                await self.session_backend.purge_expired()
+            except Exception as e:
+                logger.warning(f"Session backend purge failed: {e}")
+    
+    def start(self):
+        """Begin startup work that needs a running event loop; Riva warms up in the background"""
+        if self.riva_service and self._warmup_task is None:
+            self._warmup_task = asyncio.create_task(self.riva_service.warm_up())
+    
+    async def close(self):
+        """Flush queued analytics events and stop background jobs and worker processes"""
+        for task in (self._rollup_task, self._sweep_task, self._warmup_task):
+            if task is not None:
+                task.cancel()
+        self._rollup_task = None
+        self._sweep_task = None
+        self._warmup_task = None
+        if self.event_log:
+            await self.event_log.close()
+        await self.session_backend.close()
+        if self.riva_service:
+            self.riva_service.close()
     
     async def health_check(self) -> Dict[str, Any]:
         """Comprehensive health check for all services"""
@@ -480,20 +781,9 @@ class EnhancedMCPService:
                 "components": {}
             }
             
-            # Check Gemini service
+            # Check Gemini service (metadata lookup, no generation)
             try:
-                # Simple test request
-                test_request = MCPRequest(
-                    task_type=MCPTaskType.CODE_GENERATION,
-                    user_id="health_check",
-                    prompt="print('hello')",
-                    language=ProgrammingLanguage.PYTHON
-                )
-                response = await self.gemini_service.process_request(test_request)
-                health_status["components"]["gemini"] = {
-                    "status": "healthy" if response.status == "success" else "degraded",
-                    "response_time": response.execution_time
-                }
+                health_status["components"]["gemini"] = await self.gemini_service.health_check()
             except Exception as e:
                 health_status["components"]["gemini"] = {
                     "status": "unhealthy",
@@ -513,7 +803,8 @@ class EnhancedMCPService:
             # Check LangChain service
             health_status["components"]["langchain"] = {
                 "status": "healthy" if self.langchain_service else "unhealthy",
-                "active_sessions": len(self.langchain_service.sessions) if self.langchain_service else 0
+                "active_sessions": len(self.langchain_service.sessions) if self.langchain_service else 0,
+                "session_store": self.sessions.stats()
             }
             
             # Overall status
@@ -0,0 +1,331 @@
+"""
+Session Persistence Backends for Universal MCP
+
+Sessions and conversation memory are persisted as compact records (JSON,
+zlib-compressed once they grow) in a backend shared by all workers, so a
+session created in one uvicorn worker can be continued in any other. Each
+worker keeps hot sessions in its local SessionStore and only rehydrates
+LangChain objects from a record when its cached copy is missing or stale.
+
+Records that change turn by turn carry a version token in ``"v"``;
+``compare_and_save`` replaces such a record only if it is still at the version
+the caller read, so concurrent writers from different workers cannot silently
+overwrite each other.
+
+Backends: ``memory`` (in-process, single worker), ``sqlite`` (workers on one
+host) and ``redis`` (any Redis-compatible server).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from .session_store import SessionStore
+from ..tracing import run_in_thread
+
+logger = logging.getLogger(__name__)
+
+# Records at least this large are stored zlib-compressed
+COMPRESS_THRESHOLD = 512
+
+
+def encode_record(record: Dict[str, Any]) -> bytes:
+    data = json.dumps(record, separators=(",", ":"), default=str).encode("utf-8")
+    if len(data) >= COMPRESS_THRESHOLD:
+        return b"z" + zlib.compress(data, 6)
+    return b"j" + data
+
+
+def decode_record(data: bytes) -> Dict[str, Any]:
+    if data[:1] == b"z":
+        return json.loads(zlib.decompress(data[1:]))
+    return json.loads(data[1:])
+
+
+class SessionConflictError(Exception):
+    """A record changed since it was read (another worker or request wrote it first)"""
+
+
+class SessionBackend:
+    """
+    Shared session persistence interface.
+
+    Records are grouped by ``kind`` ("mcp" sessions, "conversation" memory) and
+    indexed by user. ``ttl`` is an idle timeout: every save extends it.
+    """
+
+    name = "base"
+
+    async def load(self, kind: str, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def save(self, kind: str, session_id: str, user_id: str,
+                   record: Dict[str, Any], ttl: float):
+        raise NotImplementedError
+
+    async def compare_and_save(self, kind: str, session_id: str, user_id: str,
+                               record: Dict[str, Any], ttl: float, expected_version: str) -> bool:
+        """
+        Save ``record`` only if the stored record's ``"v"`` is still
+        ``expected_version``; False (nothing written) if it changed or expired
+        """
+        raise NotImplementedError
+
+    async def delete(self, kind: str, session_id: str, user_id: str):
+        """Remove a record and its entry in the user's index"""
+        raise NotImplementedError
+
+    async def user_session_ids(self, kind: str, user_id: str) -> List[str]:
+        """Live session ids for a user, least recently saved first"""
+        raise NotImplementedError
+
+    async def load_many(self, kind: str, session_ids: List[str]) -> List[Dict[str, Any]]:
+        records = await asyncio.gather(*(self.load(kind, session_id) for session_id in session_ids))
+        return [record for record in records if record is not None]
+
+    async def purge_expired(self):
+        """Drop expired records (backends without native expiry)"""
+
+    async def close(self):
+        pass
+
+
+class MemorySessionBackend(SessionBackend):
+    """In-process backend; only suitable for a single worker"""
+
+    name = "memory"
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        # The idle TTL is applied per record (it varies by save), so the stores never expire entries
+        self._stores: Dict[str, SessionStore] = {}
+        self._max_bytes = max_bytes
+
+    def _store(self, kind: str) -> SessionStore:
+        store = self._stores.get(kind)
+        if store is None:
+            store = self._stores[kind] = SessionStore(
+                f"backend_{kind}", idle_ttl=float("inf"), max_per_user=1_000_000,
+                max_bytes=self._max_bytes, size_of=lambda entry: len(entry[0])
+            )
+        return store
+
+    async def load(self, kind, session_id):
+        entry = self._live_entry(kind, session_id)
+        return decode_record(entry[0]) if entry else None
+
+    def _live_entry(self, kind, session_id):
+        entry = self._store(kind).get(session_id)
+        if entry is not None and entry[1] < time.time():
+            self._store(kind).remove(session_id)
+            return None
+        return entry
+
+    async def save(self, kind, session_id, user_id, record, ttl):
+        self._store(kind).put(session_id, user_id, (encode_record(record), time.time() + ttl, record.get("v")))
+
+    async def compare_and_save(self, kind, session_id, user_id, record, ttl, expected_version):
+        # No await between the check and the write, so this is atomic on the event loop
+        entry = self._live_entry(kind, session_id)
+        if entry is None or entry[2] != expected_version:
+            return False
+        self._store(kind).put(session_id, user_id, (encode_record(record), time.time() + ttl, record.get("v")))
+        return True
+
+    async def delete(self, kind, session_id, user_id):
+        self._store(kind).remove(session_id)
+
+    async def user_session_ids(self, kind, user_id):
+        store = self._store(kind)
+        now = time.time()
+        return [session_id for session_id, (_, expires_at, _) in store.list_user_items(user_id)
+                if expires_at >= now]
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """SQLite file shared by the workers on one host (WAL mode)"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " kind TEXT NOT NULL, id TEXT NOT NULL, user_id TEXT NOT NULL,"
+                " data BLOB NOT NULL, expires_at REAL NOT NULL, updated_at REAL NOT NULL,"
+                " version TEXT, PRIMARY KEY (kind, id))"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+            if "version" not in columns:  # databases created before records were versioned
+                conn.execute("ALTER TABLE sessions ADD COLUMN version TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_user ON sessions (kind, user_id, updated_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per executor thread; sqlite3 connections are not thread-safe
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _load(self, kind, session_id):
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE kind = ? AND id = ? AND expires_at >= ?",
+            (kind, session_id, time.time())
+        ).fetchone()
+        return decode_record(row[0]) if row else None
+
+    def _save(self, kind, session_id, user_id, data, ttl, version):
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sessions (kind, id, user_id, data, expires_at, updated_at, version)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, session_id, user_id, data, now + ttl, now, version)
+        )
+
+    def _compare_and_save(self, kind, session_id, user_id, data, ttl, version, expected_version):
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE sessions SET user_id = ?, data = ?, expires_at = ?, updated_at = ?, version = ?"
+            " WHERE kind = ? AND id = ? AND version = ? AND expires_at >= ?",
+            (user_id, data, now + ttl, now, version, kind, session_id, expected_version, now)
+        )
+        return cursor.rowcount == 1
+
+    def _user_session_ids(self, kind, user_id):
+        rows = self._connection().execute(
+            "SELECT id FROM sessions WHERE kind = ? AND user_id = ? AND expires_at >= ? ORDER BY updated_at",
+            (kind, user_id, time.time())
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    async def load(self, kind, session_id):
+        return await run_in_thread("sessions.sqlite.load", self._load, kind, session_id)
+
+    async def save(self, kind, session_id, user_id, record, ttl):
+        await run_in_thread("sessions.sqlite.save", self._save, kind, session_id, user_id,
+                            encode_record(record), ttl, record.get("v"))
+
+    async def compare_and_save(self, kind, session_id, user_id, record, ttl, expected_version):
+        return await run_in_thread(
+            "sessions.sqlite.compare_and_save", self._compare_and_save, kind, session_id, user_id,
+            encode_record(record), ttl, record.get("v"), expected_version
+        )
+
+    async def delete(self, kind, session_id, user_id):
+        await run_in_thread(
+            "sessions.sqlite.delete", lambda: self._connection().execute(
+                "DELETE FROM sessions WHERE kind = ? AND id = ?", (kind, session_id)
+            )
+        )
+
+    async def user_session_ids(self, kind, user_id):
+        return await run_in_thread("sessions.sqlite.list", self._user_session_ids, kind, user_id)
+
+    async def purge_expired(self):
+        await run_in_thread(
+            "sessions.sqlite.purge", lambda: self._connection().execute(
+                "DELETE FROM sessions WHERE expires_at < ?", (time.time(),)
+            )
+        )
+
+
+class RedisSessionBackend(SessionBackend):
+    """Redis-compatible backend; records expire natively, users are indexed in sorted sets"""
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "luna:sessions:"):
+        import redis.asyncio as aioredis
+        self.client = aioredis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, kind: str, session_id: str) -> str:
+        return f"{self.prefix}{kind}:{session_id}"
+
+    def _user_key(self, kind: str, user_id: str) -> str:
+        return f"{self.prefix}{kind}:user:{user_id}"
+
+    async def load(self, kind, session_id):
+        data = await self.client.get(self._key(kind, session_id))
+        return decode_record(data) if data else None
+
+    async def load_many(self, kind, session_ids):
+        if not session_ids:
+            return []
+        values = await self.client.mget([self._key(kind, session_id) for session_id in session_ids])
+        return [decode_record(data) for data in values if data]
+
+    def _queue_save(self, pipe, kind, session_id, user_id, record, ttl):
+        now = time.time()
+        user_key = self._user_key(kind, user_id)
+        pipe.set(self._key(kind, session_id), encode_record(record), ex=max(1, int(ttl)))
+        # Score is the update time; entries older than the TTL are stale
+        pipe.zadd(user_key, {session_id: now})
+        pipe.zremrangebyscore(user_key, 0, now - ttl)
+        pipe.expire(user_key, max(1, int(ttl)))
+
+    async def save(self, kind, session_id, user_id, record, ttl):
+        async with self.client.pipeline(transaction=False) as pipe:
+            self._queue_save(pipe, kind, session_id, user_id, record, ttl)
+            await pipe.execute()
+
+    async def compare_and_save(self, kind, session_id, user_id, record, ttl, expected_version):
+        from redis.exceptions import WatchError
+        key = self._key(kind, session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            try:
+                # WATCH aborts the MULTI below if anyone writes the key after this read
+                await pipe.watch(key)
+                data = await pipe.get(key)
+                if not data or decode_record(data).get("v") != expected_version:
+                    return False
+                pipe.multi()
+                self._queue_save(pipe, kind, session_id, user_id, record, ttl)
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    async def delete(self, kind, session_id, user_id):
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.delete(self._key(kind, session_id))
+            pipe.zrem(self._user_key(kind, user_id), session_id)
+            await pipe.execute()
+
+    async def user_session_ids(self, kind, user_id):
+        session_ids = await self.client.zrange(self._user_key(kind, user_id), 0, -1)
+        return [session_id.decode() if isinstance(session_id, bytes) else session_id
+                for session_id in session_ids]
+
+    async def close(self):
+        await self.client.close()
+
+
+def create_session_backend(kind: Optional[str] = None,
+                           memory_max_bytes: int = 64 * 1024 * 1024) -> SessionBackend:
+    """Backend selected by MCP_SESSION_BACKEND (memory, sqlite, redis)"""
+    kind = (kind or os.getenv("MCP_SESSION_BACKEND", "memory")).lower()
+    if kind == "sqlite":
+        return SQLiteSessionBackend(os.getenv("MCP_SESSION_SQLITE_PATH", "data/sessions.db"))
+    if kind == "redis":
+        url = os.getenv("MCP_SESSION_REDIS_URL") or os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        try:
+            return RedisSessionBackend(url)
+        except ImportError:
+            logger.warning("redis client not installed; falling back to in-process sessions")
+    elif kind != "memory":
+        logger.warning(f"Unknown session backend {kind!r}; using in-process sessions")
+    return MemorySessionBackend(max_bytes=memory_max_bytes)
@@ -0,0 +1,200 @@
+"""
+Session Store for Universal MCP
+
+Bounded in-process store for MCP sessions and LangChain conversation state.
+Sessions expire after an idle TTL, each user may hold at most
+``max_per_user`` sessions (oldest evicted first), and the store as a whole is
+capped by approximate memory with least-recently-used eviction. A per-user
+index makes listing one user's sessions independent of the total number of
+sessions in the process. Session counts, approximate bytes and evictions are
+exported as Prometheus metrics.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from ..metrics import SESSION_BYTES, SESSION_COUNT, SESSION_EVICTIONS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def estimate_model_size(value: Any) -> int:
+    """Approximate footprint of a pydantic model from its JSON size"""
+    try:
+        return len(json.dumps(value.dict(), default=str)) + 512
+    except Exception:
+        return 1024
+
+
+class _Entry(Generic[T]):
+    __slots__ = ("value", "user_id", "size", "last_access")
+
+    def __init__(self, value: T, user_id: str, size: int):
+        self.value = value
+        self.user_id = user_id
+        self.size = size
+        self.last_access = time.monotonic()
+
+
+class SessionStore(Generic[T]):
+    """
+    Session container with idle TTL, per-user limit, memory-based LRU eviction
+    and a per-user index.
+
+    Entries are kept in least-recently-used order, so expired entries are always
+    at the front and are reaped in amortized O(1) on every access.
+    """
+
+    def __init__(self, name: str, idle_ttl: float = 3600.0, max_per_user: int = 20,
+                 max_bytes: int = 256 * 1024 * 1024,
+                 size_of: Callable[[T], int] = estimate_model_size,
+                 on_evict: Optional[Callable[[str, T, str], None]] = None):
+        if max_per_user < 1:
+            raise ValueError(f"max_per_user must be at least 1, got {max_per_user}")
+        self.name = name
+        self.idle_ttl = idle_ttl
+        self.max_per_user = max_per_user
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.on_evict = on_evict
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, _Entry[T]]" = OrderedDict()
+        self._by_user: Dict[str, "OrderedDict[str, None]"] = {}
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------ internals
+
+    def _unlink(self, session_id: str) -> Optional[_Entry[T]]:
+        entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return None
+        self.total_bytes -= entry.size
+        user_sessions = self._by_user.get(entry.user_id)
+        if user_sessions is not None:
+            user_sessions.pop(session_id, None)
+            if not user_sessions:
+                del self._by_user[entry.user_id]
+        return entry
+
+    def _evict(self, session_id: str, reason: str):
+        entry = self._unlink(session_id)
+        if entry is None:
+            return
+        SESSION_EVICTIONS.labels(self.name, reason).inc()
+        logger.info(f"Evicted {self.name} session {session_id} ({reason})")
+        if self.on_evict is not None:
+            try:
+                self.on_evict(session_id, entry.value, reason)
+            except Exception as e:
+                logger.error(f"Session eviction hook failed for {session_id}: {e}")
+
+    def _reap_expired(self):
+        deadline = time.monotonic() - self.idle_ttl
+        while self._entries:
+            session_id, entry = next(iter(self._entries.items()))
+            if entry.last_access >= deadline:
+                break
+            self._evict(session_id, "idle_ttl")
+
+    def _enforce_memory_limit(self, keep: Optional[str] = None):
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            session_id = next(iter(self._entries))
+            if session_id == keep:
+                # The entry being written is the only recent one; move past it
+                self._entries.move_to_end(session_id)
+                session_id = next(iter(self._entries))
+            self._evict(session_id, "memory")
+
+    def _update_metrics(self):
+        SESSION_COUNT.labels(self.name).set(len(self._entries))
+        SESSION_BYTES.labels(self.name).set(self.total_bytes)
+
+    # ------------------------------------------------------------------ public API
+
+    def put(self, session_id: str, user_id: str, value: T):
+        """Insert or replace a session, enforcing the per-user and memory limits"""
+        with self._lock:
+            self._reap_expired()
+            self._unlink(session_id)
+
+            user_sessions = self._by_user.setdefault(user_id, OrderedDict())
+            while len(user_sessions) >= self.max_per_user:
+                self._evict(next(iter(user_sessions)), "per_user_limit")
+                user_sessions = self._by_user.setdefault(user_id, OrderedDict())
+
+            entry = _Entry(value, user_id, self.size_of(value))
+            self._entries[session_id] = entry
+            user_sessions[session_id] = None
+            self.total_bytes += entry.size
+            self._enforce_memory_limit(keep=session_id)
+            self._update_metrics()
+
+    def get(self, session_id: str) -> Optional[T]:
+        """Get a live session and mark it as recently used"""
+        with self._lock:
+            self._reap_expired()
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            entry.last_access = time.monotonic()
+            self._entries.move_to_end(session_id)
+            return entry.value
+
+    def resize(self, session_id: str):
+        """Re-estimate a session's size after it grew (e.g. a conversation turn)"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            size = self.size_of(entry.value)
+            self.total_bytes += size - entry.size
+            entry.size = size
+            self._enforce_memory_limit(keep=session_id)
+            self._update_metrics()
+
+    def remove(self, session_id: str) -> Optional[T]:
+        with self._lock:
+            entry = self._unlink(session_id)
+            self._update_metrics()
+            return entry.value if entry else None
+
+    def list_user_items(self, user_id: str) -> List[Tuple[str, T]]:
+        """A user's live (session_id, session) pairs, oldest first; cost depends only on that user's sessions"""
+        with self._lock:
+            self._reap_expired()
+            user_sessions = self._by_user.get(user_id)
+            if not user_sessions:
+                return []
+            return [(session_id, self._entries[session_id].value) for session_id in user_sessions]
+
+    def list_user(self, user_id: str) -> List[T]:
+        return [value for _, value in self.list_user_items(user_id)]
+
+    def sweep(self):
+        """Reap expired sessions (for periodic background calls)"""
+        with self._lock:
+            self._reap_expired()
+            self._update_metrics()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._entries),
+                "users": len(self._by_user),
+                "approx_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "idle_ttl": self.idle_ttl,
+                "max_per_user": self.max_per_user,
+            }
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,236 @@
+"""
+Speech Text Handling for Universal MCP
+
+Text destined for TTS is cut into sentences as it streams in, so synthesis of
+the first sentence can start while the model is still generating the rest.
+Sentences end at terminal punctuation followed by whitespace, or at a line
+break; common abbreviations don't end a sentence, and runs without any
+boundary are cut at a word break once they exceed ``max_chars``.
+
+Each sentence is then rewritten for the ear: fenced code blocks and markdown
+tables become one-line summaries, markdown markup and URLs are dropped,
+identifiers are split into words and operators are spoken. The spoken text is
+capped at roughly ``max_seconds``; the rest is left to the written answer.
+"""
+
+import re
+from typing import List, Optional
+
+_BOUNDARY = re.compile(r"[.!?]+[\"')\]]*\s+|\n+")
+_ABBREVIATIONS = {"e.g.", "i.e.", "etc.", "vs.", "mr.", "mrs.", "ms.", "dr.", "approx.", "no."}
+
+
+class SentenceSplitter:
+    """Incremental sentence splitter: ``feed`` text chunks, then ``flush`` the tail"""
+
+    def __init__(self, max_chars: int = 400):
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add a chunk and return the sentences it completed"""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _BOUNDARY.finditer(self._buffer):
+            candidate = self._buffer[start:match.end()]
+            last_word = candidate.rstrip().rsplit(None, 1)[-1].lower() if candidate.strip() else ""
+            if last_word in _ABBREVIATIONS:
+                continue
+            sentences.extend(self._cut(candidate))
+            start = match.end()
+        self._buffer = self._buffer[start:]
+
+        if len(self._buffer) > self.max_chars:
+            pieces = self._cut(self._buffer)
+            # The last piece may still grow
+            self._buffer = pieces.pop() if pieces else ""
+            sentences.extend(pieces)
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Return whatever is left once the text is complete"""
+        tail, self._buffer = self._buffer, ""
+        return self._cut(tail)
+
+    def _cut(self, text: str) -> List[str]:
+        """Split text longer than ``max_chars`` at word breaks"""
+        pieces = []
+        while len(text) > self.max_chars:
+            cut = text.rfind(" ", 0, self.max_chars)
+            if cut <= 0:
+                cut = self.max_chars
+            pieces.extend(self._emit(text[:cut]))
+            text = text[cut:]
+        return pieces + self._emit(text)
+
+    @staticmethod
+    def _emit(text: str) -> List[str]:
+        text = text.strip()
+        return [text] if text else []
+
+
+def split_sentences(text: str, max_chars: int = 400) -> List[str]:
+    splitter = SentenceSplitter(max_chars)
+    return splitter.feed(text) + splitter.flush()
+
+
+# Spoken forms for operators that appear between operands
+_OPERATORS = [
+    ("->", "returns"), ("=>", "maps to"), ("===", "equals"), ("==", "equals"),
+    ("!=", "is not equal to"), ("<=", "is at most"), (">=", "is at least"),
+    ("&&", "and"), ("||", "or"), ("+=", "plus equals"), ("=", "equals"),
+    ("+", "plus"), ("<", "is less than"), (">", "is greater than"),
+]
+_OPERATOR_PATTERN = re.compile(
+    r"(?<=[\w)\s])\s*(" + "|".join(re.escape(op) for op, _ in _OPERATORS) + r")\s*(?=[\w(\s])"
+)
+_SPOKEN_OPERATORS = dict(_OPERATORS)
+
+_LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+_URL = re.compile(r"https?://\S+")
+_INLINE_CODE = re.compile(r"`([^`]+)`")
+_EMPHASIS = re.compile(r"(\*\*|__|\*|~~)(?=\S)(.+?)(?<=\S)\1")
+_LIST_MARKER = re.compile(r"^\s*(?:#{1,6}|>|[-*+]|\d+[.)])\s+")
+_SNAKE_CASE = re.compile(r"\b[A-Za-z][A-Za-z0-9]*(?:_[A-Za-z0-9]+)+\b")
+_CAMEL_CASE = re.compile(r"\b[a-z]+(?:[A-Z][a-z0-9]*)+\b")
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_IDENTIFIER = re.compile(r"^[A-Za-z_][\w.]*(?:\(\))?;?$")
+_LEFTOVER_SYMBOLS = re.compile(r"[`*_#|{}\[\]<>\\^~]+")
+
+# Identifiers longer than this are not worth spelling out
+MAX_SPOKEN_IDENTIFIER = 40
+WORDS_PER_MINUTE = 160
+
+
+def speak_identifier(identifier: str) -> str:
+    """``parse_http_response`` -> "parse http response", ``getUserName()`` -> "get user name\""""
+    identifier = identifier.strip().rstrip("();")
+    if len(identifier) > MAX_SPOKEN_IDENTIFIER or not identifier:
+        return "a code snippet"
+    words = _CAMEL_BOUNDARY.sub(" ", identifier)
+    return re.sub(r"[_.]+", " ", words).lower()
+
+
+def _speak_inline_code(code: str) -> str:
+    # Identifiers are spelled out; short expressions go through the operator rules with the prose
+    if _IDENTIFIER.match(code.strip()):
+        return speak_identifier(code)
+    return code if len(code) <= MAX_SPOKEN_IDENTIFIER else "a code snippet"
+
+
+class SpeechNormalizer:
+    """
+    Rewrites markdown sentences (as produced by SentenceSplitter) into speakable
+    text, tracking code fences and tables across sentences and stopping once
+    ``max_seconds`` of speech has been produced
+    """
+
+    def __init__(self, max_seconds: Optional[float] = None, words_per_minute: int = WORDS_PER_MINUTE):
+        self.max_words = int(max_seconds * words_per_minute / 60) if max_seconds else None
+        self.words = 0
+        self.truncated = False
+        self._fence_language: Optional[str] = None
+        self._fence_lines = 0
+        self._table_rows = 0
+        self._table_header = False
+
+    def push(self, sentence: str) -> List[str]:
+        """Spoken sentences for one split sentence (usually zero or one)"""
+        spoken = []
+        stripped = sentence.strip()
+
+        if self._fence_language is not None:
+            if stripped.startswith("```"):
+                spoken.append(self._code_summary())
+                self._fence_language = None
+            else:
+                self._fence_lines += stripped.count("\n") + 1
+            return self._budget(spoken)
+
+        if stripped.startswith("|"):
+            # The row above a separator row (|---|---|) is the header
+            if set(stripped) <= set("|-: "):
+                self._table_header = True
+            else:
+                self._table_rows += 1
+            return []
+        if self._table_rows:
+            spoken.append(self._table_summary())
+
+        if stripped.startswith("```"):
+            self._fence_language = stripped[3:].strip().split(" ")[0]
+            self._fence_lines = 0
+            return self._budget(spoken)
+
+        text = self._normalize_prose(stripped)
+        if text:
+            spoken.append(text)
+        return self._budget(spoken)
+
+    def flush(self) -> List[str]:
+        """Summaries for a code block or table still open when the text ends"""
+        spoken = []
+        if self._fence_language is not None:
+            spoken.append(self._code_summary())
+            self._fence_language = None
+        if self._table_rows:
+            spoken.append(self._table_summary())
+        return self._budget(spoken)
+
+    def _code_summary(self) -> str:
+        language = f"{self._fence_language.capitalize()} " if self._fence_language else ""
+        lines = self._fence_lines
+        self._fence_lines = 0
+        return f"There is a {language}code block of {lines} line{'s' if lines != 1 else ''} in the written answer."
+
+    def _table_summary(self) -> str:
+        rows = self._table_rows - 1 if self._table_header else self._table_rows
+        self._table_rows = 0
+        self._table_header = False
+        return f"There is a table with {rows} row{'s' if rows != 1 else ''} in the written answer."
+
+    @staticmethod
+    def _normalize_prose(text: str) -> str:
+        text = _LIST_MARKER.sub("", text)
+        text = _LINK.sub(r"\1", text)
+        text = _URL.sub("a link", text)
+        text = _INLINE_CODE.sub(lambda match: _speak_inline_code(match.group(1)), text)
+        text = _EMPHASIS.sub(r"\2", text)
+        text = _SNAKE_CASE.sub(lambda match: speak_identifier(match.group(0)), text)
+        text = _CAMEL_CASE.sub(lambda match: speak_identifier(match.group(0)), text)
+        text = text.replace("()", "")
+        text = _OPERATOR_PATTERN.sub(lambda match: f" {_SPOKEN_OPERATORS[match.group(1)]} ", text)
+        text = re.sub(r"(?<=\d)\s*%", " percent", text)
+        text = _LEFTOVER_SYMBOLS.sub(" ", text)
+        text = " ".join(text.split())
+        # Headings and list items have no closing punctuation; give them a sentence's pause
+        if text and text[-1].isalnum():
+            text += "."
+        return text
+
+    def _budget(self, spoken: List[str]) -> List[str]:
+        if self.max_words is None:
+            return spoken
+        if self.truncated:
+            return []
+        kept = []
+        for sentence in spoken:
+            words = len(sentence.split())
+            if self.words + words > self.max_words and self.words:
+                self.truncated = True
+                kept.append("The rest of the answer is in the written response.")
+                break
+            self.words += words
+            kept.append(sentence)
+        return kept
+
+
+def normalize_for_speech(text: str, max_seconds: Optional[float] = None) -> str:
+    """Speakable form of a complete markdown text"""
+    normalizer = SpeechNormalizer(max_seconds)
+    spoken = []
+    for sentence in split_sentences(text):
+        spoken.extend(normalizer.push(sentence))
+    spoken.extend(normalizer.flush())
+    return " ".join(spoken)
@@ -0,0 +1,230 @@
+"""
+Request Stage Timing for Universal MCP
+
+This module records a structured breakdown of where time goes while an MCP
+request is processed (queue wait, prompt build, each LangChain stage, each
+Gemini call, TTS synthesis, parsing and serialization), together with tokens
+in/out per stage. The breakdown is attached to every MCPResponse and stage
+durations are aggregated process-wide for export as metrics. Every stage is
+also a tracing span, so the same breakdown shows up in exported traces.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .models import RequestTiming, StageTiming
+from ..metrics import observe_stage
+from ..tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+_current_timer: ContextVar[Optional["RequestTimer"]] = ContextVar("mcp_request_timer", default=None)
+
+
+class StageRecord:
+    """Mutable handle for an in-progress stage; set token counts before it closes"""
+
+    __slots__ = ("name", "tokens_in", "tokens_out")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.tokens_in: Optional[int] = None
+        self.tokens_out: Optional[int] = None
+
+
+class StageStats:
+    """Thread-safe process-wide aggregate of stage durations and token counts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._listeners: List[Callable[[str, float, Optional[int], Optional[int]], None]] = []
+
+    def add_listener(self, listener: Callable[[str, float, Optional[int], Optional[int]], None]):
+        """Register a callback invoked for every recorded stage (e.g. a metrics exporter)"""
+        self._listeners.append(listener)
+
+    def observe(self, name: str, duration: float,
+                tokens_in: Optional[int] = None, tokens_out: Optional[int] = None):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {
+                    "count": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+                    "tokens_in": 0, "tokens_out": 0,
+                }
+            stats["count"] += 1
+            stats["total_seconds"] += duration
+            if duration > stats["max_seconds"]:
+                stats["max_seconds"] = duration
+            stats["tokens_in"] += tokens_in or 0
+            stats["tokens_out"] += tokens_out or 0
+        for listener in self._listeners:
+            try:
+                listener(name, duration, tokens_in, tokens_out)
+            except Exception as e:
+                logger.error(f"Stage timing listener failed: {e}")
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {**stats, "avg_seconds": stats["total_seconds"] / stats["count"]}
+                for name, stats in self._stats.items()
+            }
+
+
+stage_stats = StageStats()
+stage_stats.add_listener(observe_stage)
+
+
+class RequestTimer:
+    """Collects the stage breakdown for a single MCP request"""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.stages: List[StageTiming] = []
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def record(self, name: str, start: float, duration: float,
+               tokens_in: Optional[int] = None, tokens_out: Optional[int] = None):
+        """Record a finished stage; ``start`` is a time.perf_counter() value"""
+        timing = StageTiming(
+            name=name,
+            start_offset=max(0.0, start - self.started),
+            duration=duration,
+            tokens_in=tokens_in,
+            tokens_out=tokens_out,
+        )
+        # Stages may be recorded from executor threads (LangChain, Riva)
+        with self._lock:
+            self.stages.append(timing)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageRecord]:
+        with _timed_stage(name, self) as record:
+            yield record
+
+    def summary(self) -> RequestTiming:
+        with self._lock:
+            stages = sorted(self.stages, key=lambda s: s.start_offset)
+        return RequestTiming(
+            total=self.elapsed(),
+            stages=stages,
+            tokens_in=sum(s.tokens_in or 0 for s in stages),
+            tokens_out=sum(s.tokens_out or 0 for s in stages),
+        )
+
+
+def get_current_timer() -> Optional[RequestTimer]:
+    """Get the timer of the request being processed in the current context"""
+    return _current_timer.get()
+
+
+@contextmanager
+def request_timer(request_id: str) -> Iterator[RequestTimer]:
+    """Start timing a request; stages recorded in this context are attributed to it"""
+    timer = RequestTimer(request_id)
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _current_timer.reset(token)
+
+
+@contextmanager
+def _timed_stage(name: str, timer: Optional[RequestTimer]) -> Iterator[StageRecord]:
+    record = StageRecord(name)
+    span = get_tracer().start_span(name)
+    start = time.perf_counter()
+    try:
+        with get_tracer().use_span(span, end_on_exit=False):
+            yield record
+    finally:
+        duration = time.perf_counter() - start
+        if record.tokens_in is not None:
+            span.set_attribute("llm.tokens_in", record.tokens_in)
+        if record.tokens_out is not None:
+            span.set_attribute("llm.tokens_out", record.tokens_out)
+        span.end()
+        if timer is not None:
+            timer.record(name, start, duration, record.tokens_in, record.tokens_out)
+        stage_stats.observe(name, duration, record.tokens_in, record.tokens_out)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[StageRecord]:
+    """
+    Time a processing stage of the current request.
+
+    Works outside a request too (health checks, background jobs); the stage is
+    then only aggregated into the process-wide statistics.
+    """
+    with _timed_stage(name, get_current_timer()) as record:
+        yield record
+
+
+def record_stage(name: str, start: float, duration: float,
+                 tokens_in: Optional[int] = None, tokens_out: Optional[int] = None,
+                 timer: Optional[RequestTimer] = None):
+    """Record a stage measured elsewhere (e.g. inside a LangChain callback)"""
+    timer = timer or get_current_timer()
+    if timer is not None:
+        timer.record(name, start, duration, tokens_in, tokens_out)
+    stage_stats.observe(name, duration, tokens_in, tokens_out)
+
+
+def serialize_response(response: Any, timer: Optional[RequestTimer] = None) -> Dict[str, Any]:
+    """
+    Serialize an MCPResponse to JSON-compatible data, timing the serialization
+    itself and appending it to the response's stage breakdown.
+    """
+    start = time.perf_counter()
+    payload = response.dict()
+    payload = _jsonable(payload)
+    duration = time.perf_counter() - start
+
+    timer = timer or get_current_timer()
+    offset = (start - timer.started) if timer else None
+    stage_stats.observe("serialize", duration)
+    timing = payload.get("timing")
+    if isinstance(timing, dict):
+        timing.setdefault("stages", []).append({
+            "name": "serialize",
+            "start_offset": offset if offset is not None else timing.get("total", 0.0),
+            "duration": duration,
+            "tokens_in": None,
+            "tokens_out": None,
+        })
+    if timer is not None:
+        timer.record("serialize", start, duration)
+    return payload
+
+
+def server_timing_header(timing: Dict[str, Any]) -> str:
+    """Render a serialized RequestTiming as an HTTP Server-Timing header value"""
+    parts = [
+        f"{s['name']};dur={s['duration'] * 1000:.1f}"
+        for s in timing.get("stages", [])
+    ]
+    parts.append(f"total;dur={timing.get('total', 0.0) * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_jsonable(v) for v in value]
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "value") and not isinstance(value, (str, int, float, bool)):
+        return value.value
+    return value
@@ -0,0 +1,173 @@
+"""
+TTS Result Cache for Universal MCP
+
+Synthesized PCM is cached per sentence, keyed by the whitespace-normalized
+text and every voice setting that changes the audio (voice, language, sample
+rate, speaking rate). Repeated help text, canned replies and explanations that
+share sentences with earlier ones skip Riva entirely.
+
+Two tiers, both bounded in bytes: an in-process LRU, and an optional directory
+shared by all workers on the host. Disk entries are written atomically and
+evicted oldest-access first. Lookups are counted per tier as
+``luna_cache_requests_total{cache="tts_memory"|"tts_disk"}``.
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from ..metrics import record_cache_lookup
+from ..tracing import run_in_thread
+
+logger = logging.getLogger(__name__)
+
+
+class TTSCache:
+    """Two-tier (memory LRU + disk) cache of synthesized audio"""
+
+    def __init__(self, memory_max_bytes: int = 32 * 1024 * 1024, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 512 * 1024 * 1024):
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes: Optional[int] = None  # unknown until the directory is first scanned
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def key(text: str, settings: Dict[str, Any]) -> str:
+        payload = json.dumps([
+            " ".join(text.split()),
+            settings.get("voice"),
+            settings.get("language_code"),
+            settings.get("sample_rate"),
+            settings.get("speaking_rate", 1.0),
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+        record_cache_lookup("tts_memory", audio is not None)
+        if audio is not None or not self.disk_dir:
+            return audio
+
+        audio = await run_in_thread("tts_cache.disk_get", self._disk_get, key)
+        record_cache_lookup("tts_disk", audio is not None)
+        if audio is not None:
+            self._remember(key, audio)
+        return audio
+
+    async def put(self, key: str, audio: bytes):
+        if not audio:
+            return
+        self._remember(key, audio)
+        if self.disk_dir:
+            try:
+                await run_in_thread("tts_cache.disk_put", self._disk_put, key, audio)
+            except OSError as e:
+                logger.warning(f"Could not write TTS cache entry {key}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_max_bytes": self.memory_max_bytes,
+                "disk_dir": self.disk_dir,
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes if self.disk_dir else None,
+            }
+
+    # ------------------------------------------------------------------ memory tier
+
+    def _remember(self, key: str, audio: bytes):
+        # A single clip larger than a quarter of the tier would flush everything else
+        if len(audio) > self.memory_max_bytes // 4:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[key] = audio
+            self._memory_bytes += len(audio)
+            while self._memory_bytes > self.memory_max_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    # ------------------------------------------------------------------ disk tier
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pcm")
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            # Access time drives eviction; atime is often disabled, so bump mtime
+            os.utime(path)
+            return audio
+        except FileNotFoundError:
+            return None
+
+    def _disk_put(self, key: str, audio: bytes):
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(audio)
+            over = self._disk_bytes is None or self._disk_bytes > self.disk_max_bytes
+        if over:
+            self._disk_trim()
+
+    def _disk_trim(self):
+        """Rescan the shared directory (other workers write to it too) and drop the oldest entries"""
+        entries = []
+        for shard in os.scandir(self.disk_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".pcm"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        if total > self.disk_max_bytes:
+            # Trim below the limit so the next few writes don't trigger another scan
+            target = self.disk_max_bytes * 9 // 10
+            entries.sort()
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(path)
+                total -= size
+        with self._lock:
+            self._disk_bytes = total
@@ -0,0 +1,332 @@
+"""
+Voice Intent Routing for Universal MCP
+
+Transcribed voice commands are mapped to an MCP task type, a programming
+language and a few slots (frameworks, file names) locally, without spending
+an LLM call on working out what the user wants. The request built from the
+result then goes through the normal pipeline like any typed request.
+
+Keywords and phrases are compiled once into an Aho-Corasick automaton, so a
+transcript is scanned in a single pass however many phrases there are. Each
+matched phrase adds its weight to a task type; the best-scoring task wins.
+When no phrase decides (nothing matched, or two tasks are close), an optional
+local text classifier is consulted: any scikit-learn style pipeline saved
+with joblib whose classes are task type values, e.g. TF-IDF + logistic
+regression, which answers in well under a millisecond.
+"""
+
+import logging
+import re
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .models import MCPRequest, MCPTaskType, ProgrammingLanguage
+
+logger = logging.getLogger(__name__)
+
+# (phrase, weight) per task; multi-word phrases are more specific, so they weigh more
+TASK_PHRASES: Dict[MCPTaskType, List[Tuple[str, float]]] = {
+    MCPTaskType.CODE_GENERATION: [
+        ("generate", 2), ("write", 2), ("create", 1.5), ("implement", 2), ("build", 1.5), ("make", 1),
+        ("code for", 2), ("a function", 1.5), ("a class", 1.5), ("a script", 1.5), ("scaffold", 2),
+        ("generate code", 3), ("write code", 3),
+    ],
+    MCPTaskType.CODE_OPTIMIZATION: [
+        ("optimize", 3), ("optimise", 3), ("speed up", 3), ("faster", 2), ("slow", 1.5),
+        ("performance", 2), ("refactor", 2.5), ("clean up", 2), ("memory usage", 2.5), ("more efficient", 3),
+    ],
+    MCPTaskType.DEBUGGING: [
+        ("debug", 3), ("bug", 2.5), ("error", 2.5), ("exception", 2.5), ("traceback", 3), ("stack trace", 3),
+        ("crash", 2.5), ("crashes", 2.5), ("fix", 2), ("broken", 2), ("not working", 3), ("doesn't work", 3),
+        ("fails", 2), ("failing", 2), ("wrong output", 2.5),
+    ],
+    MCPTaskType.ARCHITECTURE_DESIGN: [
+        ("architecture", 3), ("system design", 3.5), ("design a system", 3.5), ("design pattern", 3),
+        ("microservice", 2.5), ("microservices", 2.5), ("scalable", 2), ("scale", 1), ("database schema", 2.5),
+        ("how should i structure", 3),
+    ],
+    MCPTaskType.API_INTEGRATION: [
+        ("api", 2.5), ("apis", 2.5), ("endpoint", 2.5), ("integrate", 2.5), ("integration", 2.5),
+        ("webhook", 3), ("rest", 1.5), ("graphql", 2.5), ("sdk", 2), ("oauth", 2),
+    ],
+    MCPTaskType.DOCUMENTATION: [
+        ("document", 2.5), ("documentation", 3), ("docstring", 3), ("docstrings", 3), ("readme", 3),
+        ("explain", 2.5), ("comments", 1.5), ("what does", 1.5), ("how does", 1.5), ("what is", 1),
+    ],
+    MCPTaskType.TESTING: [
+        ("test", 2.5), ("tests", 2.5), ("unit test", 3.5), ("unit tests", 3.5), ("test case", 3),
+        ("test cases", 3), ("pytest", 3), ("jest", 3), ("coverage", 2.5), ("mock", 1.5),
+    ],
+    MCPTaskType.WORKFLOW_AUTOMATION: [
+        ("automate", 3), ("automation", 3), ("workflow", 2.5), ("pipeline", 2), ("ci", 2), ("cron", 3),
+        ("schedule", 2), ("github actions", 3.5), ("deploy", 2), ("deployment", 2),
+    ],
+}
+
+HELP_PHRASES = ["help", "what can you do", "what can i say", "how do i use this"]
+
+LANGUAGE_PHRASES: Dict[ProgrammingLanguage, List[str]] = {
+    ProgrammingLanguage.PYTHON: ["python", "django", "flask", "fastapi", "pandas"],
+    ProgrammingLanguage.JAVASCRIPT: ["javascript", "java script", "node", "nodejs", "node js", "react", "express"],
+    ProgrammingLanguage.TYPESCRIPT: ["typescript", "type script", "angular"],
+    ProgrammingLanguage.JAVA: ["java", "spring", "spring boot"],
+    ProgrammingLanguage.CPP: ["c++", "c plus plus", "cpp"],
+    ProgrammingLanguage.CSHARP: ["c#", "c sharp", "csharp", "dotnet", ".net"],
+    ProgrammingLanguage.GO: ["golang", "go lang", "in go"],
+    ProgrammingLanguage.RUST: ["rust", "cargo"],
+    ProgrammingLanguage.PHP: ["php", "laravel"],
+    ProgrammingLanguage.RUBY: ["ruby", "rails"],
+    ProgrammingLanguage.SWIFT: ["swift", "swiftui"],
+    ProgrammingLanguage.KOTLIN: ["kotlin"],
+    ProgrammingLanguage.SCALA: ["scala"],
+    ProgrammingLanguage.R: ["in r", "r language"],
+    ProgrammingLanguage.JULIA: ["julia"],
+    ProgrammingLanguage.HTML: ["html"],
+    ProgrammingLanguage.CSS: ["css", "tailwind"],
+    ProgrammingLanguage.SQL: ["sql", "postgres", "mysql", "sqlite", "query"],
+    ProgrammingLanguage.SHELL: ["shell", "bash", "shell script", "zsh"],
+    ProgrammingLanguage.DOCKERFILE: ["dockerfile", "docker file", "docker"],
+}
+
+# Phrases that name a framework rather than (only) a language
+FRAMEWORKS = {
+    "django", "flask", "fastapi", "pandas", "react", "express", "angular", "spring", "spring boot",
+    "laravel", "rails", "swiftui", "tailwind", "dotnet", ".net",
+}
+
+# Speech recognizers write "main dot py" for main.py
+_SPOKEN_FILE = re.compile(r"\b([\w\-/]+) dot (py|js|ts|tsx|jsx|java|go|rs|rb|php|cs|cpp|sql|sh|md|json|yaml|yml|toml)\b")
+_FILE = re.compile(r"\b[\w\-/]+\.(?:py|js|ts|tsx|jsx|java|go|rs|rb|php|cs|cpp|sql|sh|md|json|yaml|yml|toml)\b")
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over characters; ``find`` reports whole-word
+    matches, keeping the longest of any overlapping matches
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]
+        for phrase, value in patterns:
+            state = 0
+            for char in phrase:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append((len(phrase), value))
+
+        # Breadth-first failure links; outputs of the fallback state are inherited
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, nxt in self._goto[state].items():
+                pending.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> List[Tuple[int, int, Any]]:
+        """``(start, end, value)`` for each whole-word match in ``text``"""
+        matches = []
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, value in self._out[state]:
+                start, end = index - length + 1, index + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    matches.append((start, end, value))
+
+        kept = []
+        covered_until = -1
+        for start, end, value in sorted(matches, key=lambda match: (match[0], -match[1])):
+            if end <= covered_until:
+                continue  # inside a longer match, e.g. "test" within "unit test"
+            kept.append((start, end, value))
+            covered_until = max(covered_until, end)
+        return kept
+
+
+@dataclass
+class VoiceIntent:
+    """Classification of one transcribed voice command"""
+    text: str
+    task_type: Optional[MCPTaskType] = None  # None: not a task (help, or nothing recognized)
+    language: Optional[ProgrammingLanguage] = None
+    slots: Dict[str, Any] = field(default_factory=dict)
+    confidence: float = 0.0
+    source: str = "keywords"  # keywords, model or none
+    is_help: bool = False
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "task_type": self.task_type.value if self.task_type else None,
+            "language": self.language.value if self.language else None,
+            "slots": self.slots,
+            "confidence": round(self.confidence, 3),
+            "source": self.source,
+        }
+
+
+def _default_patterns() -> List[Tuple[str, Any]]:
+    patterns: List[Tuple[str, Any]] = []
+    for task_type, phrases in TASK_PHRASES.items():
+        patterns.extend((phrase, ("task", task_type, weight)) for phrase, weight in phrases)
+    patterns.extend((phrase, ("help", None, 0)) for phrase in HELP_PHRASES)
+    for language, phrases in LANGUAGE_PHRASES.items():
+        patterns.extend((phrase, ("language", language, 0)) for phrase in phrases)
+    return patterns
+
+
+class VoiceIntentRouter:
+    """Keyword classifier for voice commands, with an optional local model for undecided ones"""
+
+    def __init__(self, model_path: Optional[str] = None, min_confidence: float = 0.6,
+                 model_min_probability: float = 0.5):
+        self.automaton = _DEFAULT_AUTOMATON
+        self.model_path = model_path
+        self.min_confidence = min_confidence
+        self.model_min_probability = model_min_probability
+        self._model: Any = None
+        self._model_failed = False
+
+    def classify(self, text: str) -> VoiceIntent:
+        normalized = " ".join(text.lower().split())
+        scores: Dict[MCPTaskType, float] = defaultdict(float)
+        languages: List[ProgrammingLanguage] = []
+        frameworks: List[str] = []
+        is_help = False
+        for start, end, (kind, value, weight) in self.automaton.find(normalized):
+            if kind == "task":
+                scores[value] += weight
+            elif kind == "language":
+                languages.append(value)
+                phrase = normalized[start:end]
+                if phrase in FRAMEWORKS and phrase not in frameworks:
+                    frameworks.append(phrase)
+            else:
+                is_help = True
+
+        slots: Dict[str, Any] = {}
+        if frameworks:
+            slots["frameworks"] = frameworks
+        files = _FILE.findall(_SPOKEN_FILE.sub(r"\1.\2", normalized))
+        if files:
+            slots["files"] = files
+        intent = VoiceIntent(
+            text=text,
+            language=max(languages, key=languages.count) if languages else None,
+            slots=slots,
+            is_help=is_help
+        )
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if ranked:
+            total = sum(scores.values())
+            intent.task_type, best = ranked[0]
+            intent.confidence = best / total
+        if not ranked or intent.confidence < self.min_confidence:
+            self._apply_model(normalized, intent)
+        if intent.task_type is None:
+            intent.source = "none"
+        # "help me debug this" is a debugging request; only a bare "help" asks for help
+        if intent.task_type is not None:
+            intent.is_help = False
+        return intent
+
+    def _apply_model(self, text: str, intent: VoiceIntent):
+        model = self._load_model()
+        if model is None:
+            return
+        try:
+            probabilities = model.predict_proba([text])[0]
+        except Exception as e:
+            logger.warning(f"Voice intent model failed: {e}")
+            return
+        best = max(range(len(probabilities)), key=lambda index: probabilities[index])
+        if probabilities[best] >= max(self.model_min_probability, intent.confidence):
+            try:
+                task_type = MCPTaskType(model.classes_[best])
+            except ValueError:
+                return
+            if task_type == MCPTaskType.VOICE_COMMAND:
+                return  # would route the command straight back here
+            intent.task_type = task_type
+            intent.confidence = float(probabilities[best])
+            intent.source = "model"
+
+    def _load_model(self) -> Any:
+        if self._model is not None or self._model_failed or not self.model_path:
+            return self._model
+        try:
+            import joblib
+            self._model = joblib.load(self.model_path)
+            logger.info(f"Loaded voice intent model from {self.model_path}")
+        except Exception as e:
+            # Keywords alone still work; don't retry on every command
+            self._model_failed = True
+            logger.warning(f"Could not load voice intent model {self.model_path}: {e}")
+        return self._model
+
+
+def derive_request(command_text: str, request: MCPRequest, intent: VoiceIntent,
+                   task_type: Optional[MCPTaskType] = None) -> MCPRequest:
+    """
+    The typed request a voice command stands for: the intent's task (or
+    ``task_type``) with the transcript as prompt and the caller's context,
+    files and priority carried over. Slots are added to the context only when
+    some were found, and voice output options are dropped because the voice
+    handler speaks the reply itself.
+    """
+    context = dict(request.context or {})
+    if intent.slots:
+        context["voice_slots"] = intent.slots
+    metadata = {
+        key: value for key, value in (request.metadata or {}).items()
+        if key not in ("include_voice", "audio_format")
+    }
+    metadata.update(parent_request_id=request.id, voice_intent=intent.as_dict())
+    return MCPRequest(
+        task_type=task_type or intent.task_type,
+        user_id=request.user_id,
+        project_id=request.project_id,
+        language=request.language or intent.language,
+        prompt=command_text,
+        context=context,
+        files=request.files,
+        priority=request.priority,
+        metadata=metadata
+    )
+
+
+def train_intent_model(texts: List[str], task_types: List[str]) -> Any:
+    """
+    Fit the optional local model (TF-IDF over words and character n-grams +
+    logistic regression); save it with ``joblib.dump`` and point
+    ``VOICE_INTENT_MODEL`` at the file
+    """
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline, make_union
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    features = make_union(
+        TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True),
+        TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), sublinear_tf=True),
+    )
+    model = make_pipeline(features, LogisticRegression(max_iter=1000))
+    model.fit([" ".join(text.lower().split()) for text in texts], task_types)
+    return model
+
+
+_DEFAULT_AUTOMATON = KeywordAutomaton(_default_patterns())
@@ -0,0 +1,347 @@
+"""
+Multiplexed WebSocket Connections for Universal MCP
+
+One ``/ws/{session_id}`` connection can carry many MCP requests at once. Each
+request runs in its own task and every frame it produces carries its
+``request_id``, so responses and streamed chunks from different requests
+interleave freely. A connection has a cap on in-flight requests, clients can
+cancel a request by id, and everything still running is cancelled when the
+socket closes.
+
+Client frames:
+    {"type": "request", ...MCPRequest fields}       (also the default type)
+    {"type": "continue", "request_id": ..., "message": ..., "voice": false}
+    {"type": "cancel", "request_id": ...}
+
+Server frames: status, response, chunk, audio, done, error, cancelled. One
+conversation turn runs at a time per connection; a second ``continue`` while
+one is streaming gets an error frame with code ``conversation_busy``. Frames
+that cannot be decoded get an ``invalid_frame`` error and the connection keeps
+serving. A ``continue`` with ``"voice": true`` also gets an ``audio`` frame per
+sentence of the reply, in order, while the text is still streaming: 16-bit mono
+PCM, or the best match for an Accept-style ``"audio_format"`` (opus, flac,
+mulaw, wav).
+
+Framing is negotiated with the ``Sec-WebSocket-Protocol`` header. Clients that
+offer ``mcp.msgpack.v1`` get binary frames: a flags byte (bit 0 = zlib) followed
+by a msgpack envelope in which audio and image fields are raw bytes instead of
+base64. Everyone else gets JSON text frames as before.
+"""
+
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import uuid
+import zlib
+from contextlib import aclosing
+from typing import Any, Dict, List, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from .audio_codecs import output_sample_rate
+from .models import MCPRequest, MCPSession
+from .timing import serialize_response
+from ..tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+SUBPROTOCOL_MSGPACK = "mcp.msgpack.v1"
+SUBPROTOCOL_JSON = "mcp.json.v1"
+
+# Base64 strings in the JSON protocol, raw bytes in the binary one
+BINARY_FIELDS = ("voice_input", "image_input", "audio_data", "voice_output")
+
+FLAG_ZLIB = 0x01
+COMPRESS_MIN_BYTES = 1024
+
+
+class FrameDecodeError(ValueError):
+    """A client frame that is not a valid message for the negotiated framing"""
+
+
+def _base64_default(value: Any) -> str:
+    # Audio produced server-side is raw bytes until it reaches a text frame
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode("ascii")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JSONFrameCodec:
+    """Text frames; the original protocol"""
+
+    subprotocol: Optional[str] = None
+
+    def __init__(self, subprotocol: Optional[str] = None):
+        self.subprotocol = subprotocol
+
+    async def send(self, websocket: WebSocket, frame: Dict[str, Any]):
+        await websocket.send_text(json.dumps(frame, separators=(",", ":"), default=_base64_default))
+
+    async def receive(self, websocket: WebSocket) -> Dict[str, Any]:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        try:
+            text = message.get("text")
+            return json.loads(text if text is not None else message["bytes"].decode("utf-8"))
+        except ValueError as e:
+            raise FrameDecodeError(f"Invalid JSON frame: {e}") from e
+
+
+class MsgpackFrameCodec:
+    """Binary msgpack frames with raw byte payloads and optional zlib per message"""
+
+    subprotocol = SUBPROTOCOL_MSGPACK
+
+    def __init__(self, compress_min_bytes: int = COMPRESS_MIN_BYTES):
+        self.compress_min_bytes = compress_min_bytes
+
+    @staticmethod
+    def _to_wire(fields: Dict[str, Any]) -> int:
+        """Replace base64 fields with raw bytes in place; returns the raw byte count"""
+        raw_bytes = 0
+        for name in BINARY_FIELDS:
+            value = fields.get(name)
+            if isinstance(value, (bytes, bytearray, memoryview)):
+                raw_bytes += len(value)
+            elif isinstance(value, str) and value:
+                try:
+                    fields[name] = base64.b64decode(value, validate=True)
+                    raw_bytes += len(fields[name])
+                except (binascii.Error, ValueError):
+                    pass
+        return raw_bytes
+
+    def encode(self, frame: Dict[str, Any]) -> bytes:
+        frame = dict(frame)
+        raw_bytes = self._to_wire(frame)
+        if isinstance(frame.get("data"), dict):
+            frame["data"] = dict(frame["data"])
+            raw_bytes += self._to_wire(frame["data"])
+        body = msgpack.packb(frame, use_bin_type=True)
+        # Encoded audio and images don't compress; only text-heavy frames are worth it
+        if len(body) - raw_bytes >= self.compress_min_bytes and raw_bytes < len(body) // 2:
+            compressed = zlib.compress(body, 1)
+            if len(compressed) < len(body) * 0.9:
+                return bytes((FLAG_ZLIB,)) + compressed
+        return b"\x00" + body
+
+    @staticmethod
+    def decode(data: bytes) -> Dict[str, Any]:
+        try:
+            body = memoryview(data)[1:]
+            if data[0] & FLAG_ZLIB:
+                body = zlib.decompress(body)
+            frame = msgpack.unpackb(body, raw=False)
+        except (IndexError, ValueError, zlib.error, msgpack.UnpackException) as e:
+            raise FrameDecodeError(f"Invalid msgpack frame: {e}") from e
+        if not isinstance(frame, dict):
+            return frame
+        # Requests are validated as MCPRequest, whose binary fields are base64 strings
+        for name in BINARY_FIELDS:
+            if isinstance(frame.get(name), bytes):
+                frame[name] = base64.b64encode(frame[name]).decode("ascii")
+        return frame
+
+    async def send(self, websocket: WebSocket, frame: Dict[str, Any]):
+        await websocket.send_bytes(self.encode(frame))
+
+    async def receive(self, websocket: WebSocket) -> Dict[str, Any]:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        if message.get("bytes") is not None:
+            return self.decode(message["bytes"])
+        # Text frames stay valid on a binary connection (e.g. hand-typed cancels)
+        try:
+            return json.loads(message["text"])
+        except ValueError as e:
+            raise FrameDecodeError(f"Invalid JSON frame: {e}") from e
+
+
+def negotiate_codec(offered: List[str]):
+    """Pick the frame codec for the subprotocols a client offered, in server preference order"""
+    if SUBPROTOCOL_MSGPACK in offered and msgpack is not None:
+        return MsgpackFrameCodec()
+    if SUBPROTOCOL_JSON in offered:
+        return JSONFrameCodec(SUBPROTOCOL_JSON)
+    return JSONFrameCodec()
+
+
+class MCPWebSocketConnection:
+    """Runs the multiplexed MCP protocol over one accepted WebSocket"""
+
+    def __init__(self, websocket: WebSocket, service: Any, session: MCPSession,
+                 max_in_flight: int = 8, codec=None):
+        self.websocket = websocket
+        self.codec = codec or JSONFrameCodec()
+        self.service = service
+        self.session = session
+        self.max_in_flight = max_in_flight
+        self.tasks: Dict[str, asyncio.Task] = {}
+        # Request id of the conversation turn in flight; turns share one conversation memory
+        self.conversation_turn: Optional[str] = None
+        # Frames from concurrent requests must not interleave mid-message
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, frame: Dict[str, Any]):
+        async with self._send_lock:
+            await self.codec.send(self.websocket, frame)
+
+    async def receive(self) -> Dict[str, Any]:
+        return await self.codec.receive(self.websocket)
+
+    async def serve(self):
+        """Dispatch incoming frames until the client disconnects"""
+        try:
+            while True:
+                try:
+                    data = await self.receive()
+                except FrameDecodeError as e:
+                    # One bad frame must not take down the other requests on this connection
+                    await self.send({"type": "error", "code": "invalid_frame", "message": str(e)})
+                    continue
+                if not isinstance(data, dict):
+                    await self.send({"type": "error", "code": "invalid_frame",
+                                     "message": "Frames must be objects"})
+                    continue
+                frame_type = data.get("type", "request")
+                if frame_type == "cancel":
+                    await self._cancel(data.get("request_id"))
+                elif frame_type == "continue":
+                    await self._start_turn(data)
+                else:
+                    await self._start_request(data)
+        except WebSocketDisconnect:
+            logger.info(f"WebSocket disconnected for session {self.session.id}")
+        finally:
+            await self.close()
+
+    async def close(self):
+        """Cancel every in-flight request (streams discard their partial turns)"""
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _start(self, request_id: str, coro) -> bool:
+        if request_id in self.tasks:
+            coro.close()
+            await self.send({"type": "error", "request_id": request_id,
+                             "message": "A request with this id is already in flight"})
+            return False
+        if len(self.tasks) >= self.max_in_flight:
+            coro.close()
+            await self.send({"type": "error", "request_id": request_id, "code": "too_many_requests",
+                             "message": f"At most {self.max_in_flight} requests may be in flight per connection"})
+            return False
+        task = asyncio.create_task(self._run(request_id, coro))
+        self.tasks[request_id] = task
+        return True
+
+    async def _start_turn(self, data: Dict[str, Any]):
+        request_id = data.get("request_id") or str(uuid.uuid4())
+        if not isinstance(data.get("message"), str):
+            await self.send({"type": "error", "request_id": request_id, "code": "invalid_frame",
+                             "message": "A continue frame needs a 'message' string"})
+            return
+        if self.conversation_turn is not None:
+            await self.send({"type": "error", "request_id": request_id, "code": "conversation_busy",
+                             "message": f"Conversation turn {self.conversation_turn} is still in flight"})
+            return
+        if await self._start(request_id, self._continue_conversation(request_id, data)):
+            self.conversation_turn = request_id
+
+    async def _run(self, request_id: str, coro):
+        try:
+            await coro
+        except asyncio.CancelledError:
+            pass
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            logger.error(f"WebSocket request {request_id} failed for session {self.session.id}: {e}")
+            try:
+                await self.send({"type": "error", "request_id": request_id, "message": str(e)})
+            except Exception:
+                pass
+        finally:
+            self.tasks.pop(request_id, None)
+            if self.conversation_turn == request_id:
+                self.conversation_turn = None
+
+    async def _cancel(self, request_id: Optional[str]):
+        task = self.tasks.get(request_id)
+        if task is None:
+            await self.send({"type": "error", "request_id": request_id, "message": "No such request in flight"})
+            return
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await self.send({"type": "cancelled", "request_id": request_id})
+
+    async def _start_request(self, data: Dict[str, Any]):
+        data = {key: value for key, value in data.items() if key != "type"}
+        try:
+            request = MCPRequest(**{**data, "user_id": self.session.user_id})
+        except Exception as e:
+            await self.send({"type": "error", "request_id": data.get("id"), "message": f"Invalid request: {e}"})
+            return
+        request.metadata = {**(request.metadata or {}), "session_id": self.session.id}
+        await self._start(request.id, self._process(request))
+
+    async def _process(self, request: MCPRequest):
+        await self.send({"type": "status", "message": "Processing request...", "request_id": request.id})
+
+        # WebSocket messages bypass the HTTP tracing middleware, so each one starts a trace
+        with get_tracer().span(
+            "WS /api/mcp/ws/{session_id}", kind="server",
+            **{"mcp.session_id": self.session.id, "mcp.task_type": request.task_type.value}
+        ) as span:
+            response = await self.service.process_request(request)
+
+        await self.send({
+            "type": "response",
+            "data": serialize_response(response),
+            "request_id": request.id,
+            "trace_id": span.trace_id
+        })
+
+    async def _continue_conversation(self, request_id: str, data: Dict[str, Any]):
+        """Stream one conversation turn as chunk frames; cancelling it discards the turn"""
+        if data.get("voice"):
+            await self._continue_with_speech(request_id, data)
+            return
+        chunks = []
+        async with aclosing(self.service.stream_conversation(self.session.id, data["message"])) as stream:
+            async for chunk in stream:
+                chunks.append(chunk)
+                await self.send({"type": "chunk", "request_id": request_id, "data": chunk})
+        await self.send({"type": "done", "request_id": request_id, "response": "".join(chunks)})
+
+    async def _continue_with_speech(self, request_id: str, data: Dict[str, Any]):
+        """Stream one conversation turn as chunk frames interleaved with per-sentence audio frames"""
+        chunks = []
+        seq = 0
+        riva = self.service.riva_service
+        audio_format = riva.output_format(data.get("audio_format")).name if riva else "pcm"
+        sample_rate = output_sample_rate(audio_format, riva.sample_rate_for("explanation")) if riva else None
+        stream = self.service.stream_conversation_speech(self.session.id, data["message"],
+                                                         audio_format=audio_format)
+        async with aclosing(stream):
+            async for kind, value in stream:
+                if kind == "chunk":
+                    chunks.append(value)
+                    await self.send({"type": "chunk", "request_id": request_id, "data": value})
+                else:
+                    await self.send({"type": "audio", "request_id": request_id, "seq": seq,
+                                     "sample_rate": sample_rate, "format": audio_format, "audio_data": value})
+                    seq += 1
+        await self.send({"type": "done", "request_id": request_id, "response": "".join(chunks)})
@@ -0,0 +1,172 @@
+"""
+Prometheus Metrics for Luna Services
+
+Process-wide metric registry served by ``/api/metrics`` in the Prometheus text
+format. Increments are plain prometheus_client operations (a lock and an add),
+so they are cheap enough for the request hot path; anything expensive to
+compute is left to PromQL (e.g. cache hit ratio = hits / (hits + misses)).
+
+When running several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to a shared
+empty directory so every worker's samples are aggregated on scrape.
+"""
+
+import os
+from typing import Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+# Latency buckets spanning fast routes up to long LLM generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# HTTP
+HTTP_REQUESTS = Counter(
+    "luna_http_requests_total", "HTTP requests by route template and status",
+    ["method", "route", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "luna_http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+
+# MCP requests
+MCP_REQUESTS = Counter(
+    "luna_mcp_requests_total", "MCP requests by task type and outcome",
+    ["task_type", "status"],
+)
+MCP_LATENCY = Histogram(
+    "luna_mcp_request_duration_seconds", "End-to-end MCP request latency by task type",
+    ["task_type"], buckets=LATENCY_BUCKETS,
+)
+MCP_STAGE_LATENCY = Histogram(
+    "luna_mcp_stage_duration_seconds", "Duration of MCP processing stages",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+MCP_QUEUE_DEPTH = Gauge(
+    "luna_mcp_queue_depth", "MCP requests waiting for an admission slot",
+    multiprocess_mode="livesum",
+)
+MCP_IN_FLIGHT = Gauge(
+    "luna_mcp_requests_in_flight", "MCP requests currently being processed",
+    multiprocess_mode="livesum",
+)
+
+# LLM tokens (Gemini, directly and through LangChain)
+LLM_TOKENS = Counter(
+    "luna_llm_tokens_total", "LLM tokens by stage and direction",
+    ["stage", "direction"],
+)
+
+# Caches
+CACHE_REQUESTS = Counter(
+    "luna_cache_requests_total", "Cache lookups by cache and result (hit/miss)",
+    ["cache", "result"],
+)
+
+# Streaming connections
+ACTIVE_CONNECTIONS = Gauge(
+    "luna_active_connections", "Open streaming connections by kind (websocket/sse/asr)",
+    ["kind"], multiprocess_mode="livesum",
+)
+
+# Voice
+TTS_FIRST_AUDIO = Histogram(
+    "luna_tts_time_to_first_audio_seconds", "Time from the start of a streamed TTS reply to its first audio",
+    buckets=LATENCY_BUCKETS,
+)
+RIVA_CHANNEL_READY = Gauge(
+    "luna_riva_channel_ready", "1 if the pooled Riva gRPC channel is connected, else 0",
+    ["channel"], multiprocess_mode="liveall",
+)
+RIVA_CHANNEL_IN_FLIGHT = Gauge(
+    "luna_riva_channel_in_flight", "Riva gRPC calls in progress by pooled channel",
+    ["channel"], multiprocess_mode="livesum",
+)
+RIVA_CALL_LATENCY = Histogram(
+    "luna_riva_call_duration_seconds", "Riva gRPC call latency by pooled channel and method",
+    ["channel", "method"], buckets=LATENCY_BUCKETS,
+)
+
+# Session stores
+SESSION_COUNT = Gauge(
+    "luna_sessions", "Live sessions by store",
+    ["store"], multiprocess_mode="livesum",
+)
+SESSION_BYTES = Gauge(
+    "luna_session_bytes", "Approximate memory held by live sessions, by store",
+    ["store"], multiprocess_mode="livesum",
+)
+SESSION_EVICTIONS = Counter(
+    "luna_session_evictions_total", "Evicted sessions by store and reason (idle_ttl/per_user_limit/memory)",
+    ["store", "reason"],
+)
+
+# Executor pools
+EXECUTOR_IN_FLIGHT = Gauge(
+    "luna_executor_tasks_in_flight", "Blocking calls submitted to the executor and not yet finished",
+    ["task"], multiprocess_mode="livesum",
+)
+EXECUTOR_MAX_WORKERS = Gauge(
+    "luna_executor_max_workers", "Worker threads available in the default executor",
+    multiprocess_mode="liveall",
+)
+EXECUTOR_QUEUE_WAIT = Histogram(
+    "luna_executor_queue_wait_seconds", "Time blocking calls waited for a free executor worker",
+    ["task"], buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+
+# Automation jobs
+AUTOMATION_JOBS = Counter(
+    "luna_automation_job_events_total", "Automation job events by job type and outcome",
+    ["job_type", "outcome"],
+)
+
+# Dependency health (updated by the background health monitor)
+HEALTH_PROBE_UP = Gauge(
+    "luna_health_probe_up", "1 if the last dependency probe passed, else 0",
+    ["probe"], multiprocess_mode="liveall",
+)
+HEALTH_PROBE_LATENCY = Gauge(
+    "luna_health_probe_latency_seconds", "Duration of the last dependency probe",
+    ["probe"], multiprocess_mode="liveall",
+)
+
+# Default ThreadPoolExecutor sizing (Python 3.8+)
+EXECUTOR_MAX_WORKERS.set(min(32, (os.cpu_count() or 1) + 4))
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """Count a cache lookup; hit ratios are derived at query time"""
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_mcp_request(task_type: str, status: str, duration: float):
+    MCP_REQUESTS.labels(task_type, status).inc()
+    MCP_LATENCY.labels(task_type).observe(duration)
+
+
+def observe_stage(name: str, duration: float,
+                  tokens_in: Optional[int], tokens_out: Optional[int]):
+    """Stage timing listener (see mcp.timing.stage_stats)"""
+    MCP_STAGE_LATENCY.labels(name).observe(duration)
+    if tokens_in:
+        LLM_TOKENS.labels(name, "in").inc(tokens_in)
+    if tokens_out:
+        LLM_TOKENS.labels(name, "out").inc(tokens_out)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Render all metrics in the Prometheus text format, aggregating workers if configured"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,296 @@
+"""
+Traffic Capture Middleware for Luna Services
+
+Opt-in ASGI middleware that samples real requests to the MCP and automation
+APIs into a JSON Lines capture file. Captures preserve the original arrival
+time, headers and raw body (including multipart voice uploads and large
+``files`` payloads) so that scripts/replay-traffic.py can re-issue them with
+production-shaped timing for capacity planning.
+
+Enable with TRAFFIC_CAPTURE_ENABLED=true. Sensitive data is removed by
+redaction hooks that run on the writer thread, off the request path.
+
+Memory is bounded twice: bodies past TRAFFIC_CAPTURE_MAX_BODY_BYTES keep only
+their first bytes and are marked ``truncated``, and records waiting for the
+writer may hold at most TRAFFIC_CAPTURE_MAX_QUEUED_BYTES of body between them;
+anything more is dropped rather than queued.
+"""
+
+import atexit
+import base64
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A redactor receives a capture record and returns the (possibly modified)
+# record, or None to drop the record entirely.
+Redactor = Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+SENSITIVE_HEADERS = {"authorization", "cookie", "set-cookie", "x-api-key", "proxy-authorization"}
+SENSITIVE_FIELDS = {"password", "api_key", "apikey", "token", "access_token", "refresh_token", "secret"}
+TEXT_CONTENT_TYPES = ("application/json", "text/", "application/x-www-form-urlencoded")
+
+
+@dataclass
+class CaptureConfig:
+    """Configuration for traffic capture"""
+    enabled: bool = False
+    path: str = "captures/traffic.jsonl"
+    sample_rate: float = 0.1
+    path_prefixes: Tuple[str, ...] = ("/api/mcp/", "/api/automation/")
+    max_body_bytes: int = 4 * 1024 * 1024
+    queue_size: int = 1000
+    max_queued_bytes: int = 64 * 1024 * 1024  # body bytes waiting for the writer, across all records
+    redactors: List[Redactor] = field(default_factory=list)
+
+
+def get_capture_config() -> CaptureConfig:
+    """Get traffic capture configuration from environment variables"""
+    prefixes = os.getenv("TRAFFIC_CAPTURE_PATHS", "/api/mcp/,/api/automation/")
+    return CaptureConfig(
+        enabled=os.getenv("TRAFFIC_CAPTURE_ENABLED", "false").lower() == "true",
+        path=os.getenv("TRAFFIC_CAPTURE_PATH", "captures/traffic.jsonl"),
+        sample_rate=float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "0.1")),
+        path_prefixes=tuple(p.strip() for p in prefixes.split(",") if p.strip()),
+        max_body_bytes=int(os.getenv("TRAFFIC_CAPTURE_MAX_BODY_BYTES", str(4 * 1024 * 1024))),
+        max_queued_bytes=int(os.getenv("TRAFFIC_CAPTURE_MAX_QUEUED_BYTES", str(64 * 1024 * 1024))),
+    )
+
+
+# ============================================================================
+# Redaction hooks
+# ============================================================================
+
+_redactors: List[Redactor] = []
+
+
+def register_redactor(redactor: Redactor) -> Redactor:
+    """Register a redaction hook applied to every captured record (usable as a decorator)"""
+    _redactors.append(redactor)
+    return redactor
+
+
+def redact_sensitive_headers(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace credentials in request headers with a placeholder"""
+    record["headers"] = [
+        [name, "[REDACTED]" if name in SENSITIVE_HEADERS else value]
+        for name, value in record["headers"]
+    ]
+    return record
+
+
+def redact_json_fields(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace values of well-known secret fields inside JSON request bodies"""
+    if record.get("body_encoding") != "utf-8" or "json" not in record.get("content_type", ""):
+        return record
+
+    def scrub(value):
+        if isinstance(value, dict):
+            return {
+                k: "[REDACTED]" if k.lower() in SENSITIVE_FIELDS else scrub(v)
+                for k, v in value.items()
+            }
+        if isinstance(value, list):
+            return [scrub(v) for v in value]
+        return value
+
+    try:
+        record["body"] = json.dumps(scrub(json.loads(record["body"])))
+    except ValueError:
+        pass
+    return record
+
+
+register_redactor(redact_sensitive_headers)
+register_redactor(redact_json_fields)
+
+
+# ============================================================================
+# Capture writer
+# ============================================================================
+
+class CaptureWriter:
+    """Serializes, redacts and appends capture records on a background thread"""
+
+    def __init__(self, path: str, queue_size: int = 1000,
+                 redactors: Optional[List[Redactor]] = None,
+                 max_queued_bytes: int = 64 * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.redactors = redactors
+        self.max_queued_bytes = max_queued_bytes
+        self.queued_bytes = 0
+        self.dropped = 0
+        self.written = 0
+        # submit() runs on the event loop, the writer thread releases the bytes
+        self._bytes_lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="traffic-capture-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, record: Dict[str, Any]):
+        """Queue a record without blocking the request; drops when the writer falls behind"""
+        size = len(record.get("raw_body", b""))
+        with self._bytes_lock:
+            if self.queued_bytes + size > self.max_queued_bytes:
+                self.dropped += 1
+                return
+            self.queued_bytes += size
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._release(size)
+            self.dropped += 1
+
+    def _release(self, size: int):
+        with self._bytes_lock:
+            self.queued_bytes -= size
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                self._write(f, record)
+                # Drain whatever else is queued before flushing
+                while not self._queue.empty():
+                    record = self._queue.get_nowait()
+                    if record is None:
+                        f.flush()
+                        return
+                    self._write(f, record)
+                f.flush()
+
+    def _write(self, f, record: Dict[str, Any]):
+        size = len(record.get("raw_body", b""))
+        try:
+            record = self._encode_body(record)
+            for redactor in (self.redactors if self.redactors is not None else _redactors):
+                record = redactor(record)
+                if record is None:
+                    return
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self.written += 1
+        except Exception as e:
+            logger.error(f"Failed to write traffic capture record: {e}")
+        finally:
+            self._release(size)
+
+    @staticmethod
+    def _encode_body(record: Dict[str, Any]) -> Dict[str, Any]:
+        body: bytes = record.pop("raw_body", b"")
+        record["body_size"] = len(body)
+        content_type = record.get("content_type", "")
+        if content_type.startswith(TEXT_CONTENT_TYPES):
+            try:
+                record["body"] = body.decode("utf-8")
+                record["body_encoding"] = "utf-8"
+                return record
+            except UnicodeDecodeError:
+                pass
+        # Multipart uploads (voice, workflow files) and binary payloads
+        record["body"] = base64.b64encode(body).decode("ascii")
+        record["body_encoding"] = "base64"
+        return record
+
+
+# ============================================================================
+# ASGI middleware
+# ============================================================================
+
+class TrafficCaptureMiddleware:
+    """
+    Samples HTTP requests under the configured path prefixes into a capture file.
+
+    Implemented as a plain ASGI middleware so request bodies are observed as
+    they stream through, without buffering responses or breaking SSE.
+    """
+
+    def __init__(self, app, config: Optional[CaptureConfig] = None,
+                 writer: Optional[CaptureWriter] = None):
+        self.app = app
+        self.config = config or get_capture_config()
+        self.writer = writer or CaptureWriter(
+            self.config.path,
+            self.config.queue_size,
+            self.config.redactors or None,
+            self.config.max_queued_bytes,
+        )
+        logger.info(
+            f"Traffic capture enabled: {self.config.sample_rate:.0%} of "
+            f"{', '.join(self.config.path_prefixes)} -> {self.config.path}"
+        )
+
+    def _should_capture(self, scope) -> bool:
+        if scope["type"] != "http":
+            return False
+        if not scope["path"].startswith(self.config.path_prefixes):
+            return False
+        return random.random() < self.config.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if not self._should_capture(scope):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.time()
+        start_perf = time.perf_counter()
+        chunks: List[bytes] = []
+        size = 0
+        truncated = False
+        status = {"code": 0}
+
+        async def capture_receive():
+            nonlocal size, truncated
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                if body and not truncated:
+                    if size + len(body) > self.config.max_body_bytes:
+                        truncated = True
+                    else:
+                        chunks.append(body)
+                        size += len(body)
+            return message
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            headers = [
+                [name.decode("latin-1").lower(), value.decode("latin-1")]
+                for name, value in scope.get("headers", [])
+            ]
+            content_type = next((v for n, v in headers if n == "content-type"), "")
+            self.writer.submit({
+                "ts": started,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query_string": scope.get("query_string", b"").decode("latin-1"),
+                "headers": headers,
+                "content_type": content_type,
+                "raw_body": b"".join(chunks),
+                "truncated": truncated,
+                "status": status["code"],
+                "duration_ms": (time.perf_counter() - start_perf) * 1000,
+            })
@@ -0,0 +1,40 @@
+"""
+Metrics Middleware for Luna Services
+
+Pure ASGI middleware counting HTTP requests and observing their latency per
+route template. Labels use the matched route (``/api/mcp/session/{session_id}``)
+rather than the raw path so label cardinality stays bounded.
+"""
+
+import time
+
+from ..metrics import HTTP_LATENCY, HTTP_REQUESTS
+
+
+class MetricsMiddleware:
+    """Records request count and latency (until the last body chunk) per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS.labels(scope["method"], template, str(status)).inc()
+            HTTP_LATENCY.labels(scope["method"], template).observe(time.perf_counter() - start)
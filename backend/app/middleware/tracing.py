@@ -0,0 +1,58 @@
+"""
+Tracing Middleware for Luna Services
+
+Pure ASGI middleware that opens the root server span for every HTTP request,
+continues traces arriving with a W3C ``traceparent`` header (e.g. from nginx
+or another worker) and echoes the trace id back in ``X-Trace-Id`` and
+``traceparent`` response headers so clients can quote it in bug reports.
+"""
+
+import logging
+
+from ..tracing import extract_context, get_tracer
+
+logger = logging.getLogger(__name__)
+
+
+class TracingMiddleware:
+    """Starts a server span per HTTP request and echoes trace headers"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tracer = get_tracer()
+        path = scope.get("path", "")
+        span = tracer.start_span(
+            f"{scope['method']} {path}",
+            kind="server",
+            attributes={"http.method": scope["method"], "http.target": path},
+            parent=extract_context(scope.get("headers", [])),
+            sample_rate=tracer.sample_rate_for(path),
+        )
+        trace_headers = [
+            (b"x-trace-id", span.context.trace_id.encode("latin-1")),
+            (b"traceparent", span.context.to_traceparent().encode("latin-1")),
+        ]
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + trace_headers
+                span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.set_status("ERROR", f"HTTP {message['status']}")
+            await send(message)
+
+        with tracer.use_span(span):
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                # Name the span after the matched route template once routing has run
+                route = scope.get("route")
+                if route is not None and getattr(route, "path", None):
+                    span.name = f"{scope['method']} {route.path}"
+                    span.set_attribute("http.route", route.path)
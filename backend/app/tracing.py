@@ -0,0 +1,473 @@
+"""
+Distributed Tracing for Luna Services
+
+Lightweight OpenTelemetry-style span tracing that follows a request from the
+HTTP router through EnhancedMCPService handlers, the Gemini/LangChain/Riva
+integrations and the executor threads they run on. Trace context is
+propagated with W3C ``traceparent`` headers so spans from several uvicorn
+workers behind nginx can be correlated, and finished spans are exported in
+batches to a local JSON Lines file or an OTLP/HTTP collector. Exporting is
+opt-in and begins when the application starts (``Tracer.start``); importing
+the package never starts threads or writes files.
+
+Configuration (environment variables):
+    TRACING_ENABLED            true/false (default true)
+    TRACING_SAMPLE_RATE        head sampling ratio for new traces (default 0.1)
+    TRACING_SAMPLE_OVERRIDES   per-path ratios, e.g. "/api/mcp/process=1.0,/health=0"
+    TRACING_EXPORTER           file, otlp or none (default none)
+    TRACING_FILE_PATH          span file for the file exporter
+    TRACING_OTLP_ENDPOINT      OTLP/HTTP JSON endpoint (default http://localhost:4318/v1/traces)
+    TRACING_SERVICE_NAME       service.name resource attribute
+"""
+
+import asyncio
+import atexit
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .metrics import EXECUTOR_IN_FLIGHT, EXECUTOR_QUEUE_WAIT
+
+logger = logging.getLogger(__name__)
+
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+
+
+@dataclass
+class TracingConfig:
+    """Configuration for span tracing"""
+    enabled: bool = True
+    sample_rate: float = 0.1
+    sample_overrides: Dict[str, float] = field(default_factory=dict)
+    exporter: str = "none"
+    file_path: str = "traces/spans.jsonl"
+    otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    service_name: str = "luna-services-api"
+    batch_size: int = 512
+    flush_interval: float = 2.0
+    queue_size: int = 10000
+
+
+def get_tracing_config() -> TracingConfig:
+    """Get tracing configuration from environment variables"""
+    overrides = {}
+    for part in os.getenv("TRACING_SAMPLE_OVERRIDES", "").split(","):
+        prefix, _, rate = part.partition("=")
+        if prefix.strip() and rate.strip():
+            overrides[prefix.strip()] = float(rate)
+
+    return TracingConfig(
+        enabled=os.getenv("TRACING_ENABLED", "true").lower() == "true",
+        sample_rate=float(os.getenv("TRACING_SAMPLE_RATE", "0.1")),
+        sample_overrides=overrides,
+        exporter=os.getenv("TRACING_EXPORTER", "none"),
+        file_path=os.getenv("TRACING_FILE_PATH", "traces/spans.jsonl"),
+        otlp_endpoint=os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"),
+        service_name=os.getenv("TRACING_SERVICE_NAME", "luna-services-api"),
+    )
+
+
+# ============================================================================
+# Span model
+# ============================================================================
+
+@dataclass(frozen=True)
+class SpanContext:
+    """Identifiers propagated between spans, threads and processes"""
+    trace_id: str  # 32 hex chars
+    span_id: str  # 16 hex chars
+    sampled: bool = True
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def from_traceparent(cls, header: Optional[str]) -> Optional["SpanContext"]:
+        """Parse a W3C traceparent header, returning None if it is malformed"""
+        if not header:
+            return None
+        parts = header.strip().split("-")
+        if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        try:
+            flags = int(parts[3][:2], 16)
+            int(parts[1], 16)
+            int(parts[2], 16)
+        except ValueError:
+            return None
+        if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+            return None
+        return cls(trace_id=parts[1], span_id=parts[2], sampled=bool(flags & 1))
+
+
+def _new_trace_id() -> str:
+    return f"{random.getrandbits(128):032x}"
+
+
+def _new_span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+class Span:
+    """A timed operation within a trace. Unsampled spans propagate ids but are never exported"""
+
+    def __init__(self, tracer: "Tracer", name: str, context: SpanContext,
+                 parent_span_id: Optional[str] = None, kind: str = "internal",
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.events: List[Dict[str, Any]] = []
+        self.status_code = "UNSET"
+        self.status_message = ""
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns: Optional[int] = None
+
+    @property
+    def is_recording(self) -> bool:
+        return self.context.sampled and self.end_time_ns is None
+
+    @property
+    def trace_id(self) -> str:
+        return self.context.trace_id
+
+    def set_attribute(self, key: str, value: Any):
+        if self.is_recording:
+            self.attributes[key] = value
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        if self.is_recording:
+            self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes or {}})
+
+    def record_exception(self, exc: BaseException):
+        self.add_event("exception", {"exception.type": type(exc).__name__, "exception.message": str(exc)})
+        self.set_status("ERROR", str(exc))
+
+    def set_status(self, code: str, message: str = ""):
+        self.status_code = code
+        self.status_message = message
+
+    def end(self):
+        if self.end_time_ns is not None:
+            return
+        self.end_time_ns = time.time_ns()
+        if self.context.sampled:
+            self.tracer.processor.on_end(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "service": self.tracer.config.service_name,
+            "start_time_ns": self.start_time_ns,
+            "end_time_ns": self.end_time_ns,
+            "duration_ms": ((self.end_time_ns or self.start_time_ns) - self.start_time_ns) / 1e6,
+            "attributes": self.attributes,
+            "events": self.events,
+            "status": {"code": self.status_code, "message": self.status_message},
+        }
+
+
+# ============================================================================
+# Exporters and batch processor
+# ============================================================================
+
+class FileSpanExporter:
+    """Appends finished spans to a JSON Lines file, one span per line"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str, separators=(",", ":")) + "\n")
+
+
+class OTLPHttpSpanExporter:
+    """Posts spans as OTLP/HTTP JSON to a collector (or any stand-in accepting that format)"""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5.0):
+        import httpx
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.client = httpx.Client(timeout=timeout)
+
+    @staticmethod
+    def _attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+        encoded = []
+        for key, value in attributes.items():
+            if isinstance(value, bool):
+                encoded.append({"key": key, "value": {"boolValue": value}})
+            elif isinstance(value, int):
+                encoded.append({"key": key, "value": {"intValue": str(value)}})
+            elif isinstance(value, float):
+                encoded.append({"key": key, "value": {"doubleValue": value}})
+            else:
+                encoded.append({"key": key, "value": {"stringValue": str(value)}})
+        return encoded
+
+    def _encode_span(self, span: Span) -> Dict[str, Any]:
+        encoded = {
+            "traceId": span.context.trace_id,
+            "spanId": span.context.span_id,
+            "name": span.name,
+            "kind": SPAN_KINDS.get(span.kind, 1),
+            "startTimeUnixNano": str(span.start_time_ns),
+            "endTimeUnixNano": str(span.end_time_ns),
+            "attributes": self._attributes(span.attributes),
+            "events": [
+                {"name": e["name"], "timeUnixNano": str(e["time_ns"]), "attributes": self._attributes(e["attributes"])}
+                for e in span.events
+            ],
+            "status": {"code": {"UNSET": 0, "OK": 1, "ERROR": 2}[span.status_code], "message": span.status_message},
+        }
+        if span.parent_span_id:
+            encoded["parentSpanId"] = span.parent_span_id
+        return encoded
+
+    def export(self, spans: List[Span]):
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": self._attributes({
+                    "service.name": self.service_name,
+                    "process.pid": os.getpid(),
+                })},
+                "scopeSpans": [{
+                    "scope": {"name": "luna-services"},
+                    "spans": [self._encode_span(s) for s in spans],
+                }],
+            }]
+        }
+        response = self.client.post(self.endpoint, json=payload)
+        response.raise_for_status()
+
+
+class BatchSpanProcessor:
+    """Buffers finished spans and exports them in batches on a background thread"""
+
+    def __init__(self, exporter, batch_size: int = 512, flush_interval: float = 2.0,
+                 queue_size: int = 10000):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def on_end(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def shutdown(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        batch: List[Span] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                span = False
+            if span is None:
+                self._export(batch)
+                return
+            if span:
+                batch.append(span)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._export(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _export(self, batch: List[Span]):
+        if not batch:
+            return
+        try:
+            self.exporter.export(batch)
+        except Exception as e:
+            logger.warning(f"Failed to export {len(batch)} spans: {e}")
+
+
+class _NoopProcessor:
+    def on_end(self, span: Span):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+# ============================================================================
+# Tracer
+# ============================================================================
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("luna_current_span", default=None)
+
+
+class Tracer:
+    """Creates spans, applies sampling and tracks the current span per context"""
+
+    def __init__(self, config: TracingConfig):
+        self.config = config
+        # Spans are dropped until start(); the exporter thread only runs in the app
+        self.processor = _NoopProcessor()
+
+    def start(self):
+        """Start exporting finished spans (application startup)"""
+        if isinstance(self.processor, _NoopProcessor):
+            self.processor = self._create_processor(self.config)
+
+    @staticmethod
+    def _create_processor(config: TracingConfig):
+        if not config.enabled or config.exporter == "none":
+            return _NoopProcessor()
+        try:
+            if config.exporter == "otlp":
+                exporter = OTLPHttpSpanExporter(config.otlp_endpoint, config.service_name)
+            else:
+                exporter = FileSpanExporter(config.file_path)
+        except Exception as e:
+            logger.warning(f"Tracing exporter '{config.exporter}' unavailable, spans will not be exported: {e}")
+            return _NoopProcessor()
+        return BatchSpanProcessor(exporter, config.batch_size, config.flush_interval, config.queue_size)
+
+    def sample_rate_for(self, path: Optional[str]) -> float:
+        """Resolve the sampling ratio for a request path (longest matching override wins)"""
+        if path:
+            matches = [p for p in self.config.sample_overrides if path.startswith(p)]
+            if matches:
+                return self.config.sample_overrides[max(matches, key=len)]
+        return self.config.sample_rate
+
+    def start_span(self, name: str, kind: str = "internal",
+                   attributes: Optional[Dict[str, Any]] = None,
+                   parent: Optional[SpanContext] = None,
+                   sample_rate: Optional[float] = None) -> Span:
+        """
+        Start a span without making it current. The parent defaults to the current
+        span; root spans are head-sampled, children follow their parent's decision.
+        """
+        if parent is None:
+            current = _current_span.get()
+            parent = current.context if current else None
+
+        if parent is not None:
+            context = SpanContext(parent.trace_id, _new_span_id(), parent.sampled)
+            parent_span_id = parent.span_id
+        else:
+            rate = self.config.sample_rate if sample_rate is None else sample_rate
+            sampled = self.config.enabled and random.random() < rate
+            context = SpanContext(_new_trace_id(), _new_span_id(), sampled)
+            parent_span_id = None
+
+        return Span(self, name, context, parent_span_id, kind, attributes)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes: Any) -> Iterator[Span]:
+        """Start a span, make it current for the block, and end it afterwards"""
+        span = self.start_span(name, kind, attributes)
+        with self.use_span(span):
+            yield span
+
+    @contextmanager
+    def use_span(self, span: Span, end_on_exit: bool = True) -> Iterator[Span]:
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            if not isinstance(e, (GeneratorExit, asyncio.CancelledError)):
+                span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            if end_on_exit:
+                span.end()
+
+    def shutdown(self):
+        self.processor.shutdown()
+        self.processor = _NoopProcessor()
+
+
+def current_span() -> Optional[Span]:
+    """Get the span active in the current context"""
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+tracer = Tracer(get_tracing_config())
+
+
+def configure_tracing(config: Optional[TracingConfig] = None) -> Tracer:
+    """Replace the global tracer and start its exporter (e.g. in tests)"""
+    global tracer
+    tracer.shutdown()
+    tracer = Tracer(config or get_tracing_config())
+    tracer.start()
+    return tracer
+
+
+def get_tracer() -> Tracer:
+    return tracer
+
+
+async def run_in_thread(name: str, func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking call on the default executor inside an ``executor.<name>`` span.
+
+    Like asyncio.to_thread, the caller's context (current span, request timer)
+    is copied into the worker thread. The span and executor metrics record how
+    long the call waited for a free worker before it started running.
+    """
+    loop = asyncio.get_running_loop()
+    span = get_tracer().start_span(f"executor.{name}")
+    in_flight = EXECUTOR_IN_FLIGHT.labels(name)
+    submitted = time.perf_counter()
+
+    def call():
+        waited = time.perf_counter() - submitted
+        EXECUTOR_QUEUE_WAIT.labels(name).observe(waited)
+        span.set_attribute("executor.queue_wait_ms", waited * 1000)
+        with get_tracer().use_span(span):
+            return func(*args, **kwargs)
+
+    context = copy_context()
+    in_flight.inc()
+    try:
+        return await loop.run_in_executor(None, functools.partial(context.run, call))
+    finally:
+        in_flight.dec()
+
+
+def extract_context(headers: List[Tuple[bytes, bytes]]) -> Optional[SpanContext]:
+    """Extract the remote parent span context from raw ASGI headers"""
+    for name, value in headers:
+        if name == b"traceparent":
+            return SpanContext.from_traceparent(value.decode("latin-1"))
+    return None
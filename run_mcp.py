@@ -299,7 +299,8 @@ async def luna_mcp_processor(
             "suggestions": response.suggestions or [],
             "confidence_score": response.confidence_score,
             "execution_time": response.execution_time,
-            "tokens_used": response.tokens_used
+            "tokens_used": response.tokens_used,
+            "timing": response.timing.dict() if response.timing else None
         }
         
         # Add additional result data if available
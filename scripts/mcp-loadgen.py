@@ -0,0 +1,620 @@
+#!/usr/bin/env python3
+"""
+MCP Load Generator for Luna Services
+
+Spawns N simulated IDE clients (Cursor, VS Code, Claude Desktop) that speak the
+real MCP JSON-RPC protocol against the ``luna_mcp_processor`` tool exposed by
+run_mcp.py, over either the STDIO or the SSE transport.
+
+- stdio: every simulated client launches its own server process, exactly like
+  an IDE does, so the report shows per-process and aggregate RSS/CPU.
+- sse:   all clients share one server process (started with --spawn-server or
+  identified with --server-pid), which is how many IDEs a single process can
+  carry is measured.
+
+Usage:
+    python scripts/mcp-loadgen.py --transport stdio --clients 4 --duration 60
+    python scripts/mcp-loadgen.py --transport sse --spawn-server --clients 50 \\
+        --mix code_generation=6,debugging=3,documentation=1 --think-time 2
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urljoin
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+project_root = Path(__file__).parent.parent
+
+MCP_PROTOCOL_VERSION = "2024-11-05"
+TOOL_NAME = "luna_mcp_processor"
+IDE_CLIENTS = ["cursor", "vscode", "claude-desktop"]
+
+# Representative prompts per task type, roughly matching what IDEs send
+DEFAULT_PROMPTS: Dict[str, List[Dict[str, Any]]] = {
+    "code_generation": [
+        {"prompt": "Create a Python function that parses ISO-8601 durations", "language": "python"},
+        {"prompt": "Write a React hook that debounces a value", "language": "typescript"},
+        {"prompt": "Implement an LRU cache with O(1) get and put", "language": "go"},
+    ],
+    "code_optimization": [
+        {"prompt": "Optimize this loop that builds a list of squares",
+         "language": "python",
+         "context": {"code": "out = []\nfor i in range(n):\n    out.append(i * i)"}},
+    ],
+    "debugging": [
+        {"prompt": "KeyError when reading the config file",
+         "language": "python",
+         "context": {"error_message": "KeyError: 'database'",
+                     "code_snippet": "cfg = load()\nurl = cfg['database']['url']"}},
+    ],
+    "architecture_design": [
+        {"prompt": "Design a notification service for a multi-tenant SaaS",
+         "language": "python",
+         "context": {"system_requirements": ["email", "push", "webhooks"]}},
+    ],
+    "documentation": [
+        {"prompt": "Document this function",
+         "language": "python",
+         "context": {"code": "def add(a, b):\n    return a + b"}},
+    ],
+    "testing": [
+        {"prompt": "Write pytest tests for a slugify helper", "language": "python"},
+    ],
+    "api_integration": [
+        {"prompt": "Call the GitHub REST API to list open pull requests", "language": "javascript"},
+    ],
+}
+
+DEFAULT_MIX = "code_generation=5,debugging=2,code_optimization=1,documentation=1,testing=1"
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse a task mix such as 'code_generation=5,debugging=2' into weights"""
+    mix = {}
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_PROMPTS:
+            raise ValueError(f"Unknown task type in mix: {name}")
+        mix[name] = float(weight) if weight else 1.0
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("Task mix must contain at least one positive weight")
+    return mix
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+# ============================================================================
+# Transports
+# ============================================================================
+
+class MCPTransportError(Exception):
+    """Raised when the MCP server connection fails or closes unexpectedly"""
+
+
+class StdioTransport:
+    """Newline-delimited JSON-RPC over a spawned server's stdin/stdout"""
+
+    def __init__(self, command: List[str], cwd: Path):
+        self.command = command
+        self.cwd = cwd
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.on_message = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            cwd=str(self.cwd),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            limit=16 * 1024 * 1024,
+        )
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self):
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                break
+            try:
+                message = json.loads(line)
+            except ValueError:
+                # run_mcp.py prints banner lines on stdout; skip anything that isn't JSON-RPC
+                continue
+            if isinstance(message, dict) and self.on_message:
+                self.on_message(message)
+        if self.on_message:
+            self.on_message(None)
+
+    async def send(self, message: Dict[str, Any]):
+        if not self.process or self.process.returncode is not None:
+            raise MCPTransportError("Server process is not running")
+        self.process.stdin.write(json.dumps(message).encode("utf-8") + b"\n")
+        await self.process.stdin.drain()
+
+    async def close(self):
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+        if getattr(self, "_reader", None):
+            self._reader.cancel()
+
+
+class SSETransport:
+    """MCP SSE transport: GET /sse for server events, POST to the announced endpoint"""
+
+    def __init__(self, url: str, client: "httpx.AsyncClient"):
+        self.url = url
+        self.client = client
+        self.post_url: Optional[str] = None
+        self.on_message = None
+        self._endpoint_ready = asyncio.Event()
+
+    async def start(self):
+        self._reader = asyncio.create_task(self._read_loop())
+        await asyncio.wait_for(self._endpoint_ready.wait(), timeout=30)
+        if not self.post_url:
+            raise MCPTransportError("SSE stream closed before announcing an endpoint")
+
+    async def _read_loop(self):
+        try:
+            async with self.client.stream("GET", self.url, headers={"Accept": "text/event-stream"}) as response:
+                response.raise_for_status()
+                event, data = "message", []
+                async for line in response.aiter_lines():
+                    if line == "":
+                        if data:
+                            self._dispatch(event, "\n".join(data))
+                        event, data = "message", []
+                    elif line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:"):
+                        data.append(line[5:].lstrip())
+        except (httpx.HTTPError, asyncio.CancelledError):
+            pass
+        finally:
+            self._endpoint_ready.set()
+            if self.on_message:
+                self.on_message(None)
+
+    def _dispatch(self, event: str, data: str):
+        if event == "endpoint":
+            self.post_url = urljoin(self.url, data)
+            self._endpoint_ready.set()
+            return
+        try:
+            message = json.loads(data)
+        except ValueError:
+            return
+        if isinstance(message, dict) and self.on_message:
+            self.on_message(message)
+
+    async def send(self, message: Dict[str, Any]):
+        try:
+            response = await self.client.post(self.post_url, json=message)
+        except httpx.HTTPError as e:
+            raise MCPTransportError(str(e)) from e
+        if response.status_code >= 400:
+            raise MCPTransportError(f"POST {self.post_url} returned {response.status_code}")
+
+    async def close(self):
+        self._reader.cancel()
+
+
+class MCPClientSession:
+    """Minimal MCP client: initialize handshake and tools/call with id correlation"""
+
+    def __init__(self, transport, client_name: str, request_timeout: float):
+        self.transport = transport
+        self.client_name = client_name
+        self.request_timeout = request_timeout
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        transport.on_message = self._on_message
+
+    def _on_message(self, message: Optional[Dict[str, Any]]):
+        if message is None:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(MCPTransportError("Connection closed"))
+            self._pending.clear()
+            return
+        future = self._pending.pop(message.get("id"), None)
+        if future and not future.done():
+            future.set_result(message)
+
+    async def request(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        await self.transport.send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+        try:
+            return await asyncio.wait_for(future, timeout=self.request_timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def initialize(self):
+        response = await self.request("initialize", {
+            "protocolVersion": MCP_PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": {"name": self.client_name, "version": "loadgen"},
+        })
+        if "error" in response:
+            raise MCPTransportError(f"initialize failed: {response['error']}")
+        await self.transport.send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+
+    async def call_tool(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.request("tools/call", {"name": TOOL_NAME, "arguments": arguments})
+
+
+# ============================================================================
+# Measurement
+# ============================================================================
+
+@dataclass
+class CallRecord:
+    task_type: str
+    latency: float
+    ok: bool
+    tool_status: str
+
+
+@dataclass
+class LoadStats:
+    records: List[CallRecord] = field(default_factory=list)
+    transport_errors: int = 0
+    connect_failures: int = 0
+
+    def summarize(self, records: List[CallRecord], elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(r.latency for r in records)
+        statuses: Dict[str, int] = {}
+        for r in records:
+            statuses[r.tool_status] = statuses.get(r.tool_status, 0) + 1
+        return {
+            "requests": len(records),
+            "ok": sum(1 for r in records if r.ok),
+            "throughput_rps": len(records) / elapsed if elapsed > 0 else 0.0,
+            "latency_ms": {
+                "mean": (sum(latencies) / len(latencies) * 1000) if latencies else 0.0,
+                "p50": percentile(latencies, 50) * 1000,
+                "p90": percentile(latencies, 90) * 1000,
+                "p95": percentile(latencies, 95) * 1000,
+                "p99": percentile(latencies, 99) * 1000,
+                "max": (latencies[-1] * 1000) if latencies else 0.0,
+            },
+            "tool_status": statuses,
+        }
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        by_task: Dict[str, List[CallRecord]] = {}
+        for r in self.records:
+            by_task.setdefault(r.task_type, []).append(r)
+        return {
+            "elapsed_s": elapsed,
+            "transport_errors": self.transport_errors,
+            "connect_failures": self.connect_failures,
+            "overall": self.summarize(self.records, elapsed),
+            "per_task_type": {task: self.summarize(recs, elapsed) for task, recs in sorted(by_task.items())},
+        }
+
+
+class ResourceSampler:
+    """Samples RSS and CPU of the server process(es) at a fixed interval"""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self.pids: List[int] = []
+        self.samples: List[Dict[str, float]] = []
+        self._last_cpu: Dict[int, float] = {}
+        self._last_time: Optional[float] = None
+        self._clk_tck = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def _read_proc(self, pid: int):
+        if psutil:
+            proc = psutil.Process(pid)
+            times = proc.cpu_times()
+            return proc.memory_info().rss, times.user + times.system
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / self._clk_tck
+        rss = 0
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) * 1024
+                    break
+        return rss, cpu_seconds
+
+    def sample(self):
+        now = time.monotonic()
+        total_rss, total_cpu_pct, max_rss = 0, 0.0, 0
+        for pid in list(self.pids):
+            try:
+                rss, cpu = self._read_proc(pid)
+            except (OSError, ValueError, IndexError):
+                continue
+            except Exception:
+                # psutil.NoSuchProcess and friends
+                continue
+            total_rss += rss
+            max_rss = max(max_rss, rss)
+            previous = self._last_cpu.get(pid)
+            if previous is not None and self._last_time is not None and now > self._last_time:
+                total_cpu_pct += (cpu - previous) / (now - self._last_time) * 100
+            self._last_cpu[pid] = cpu
+        if self._last_time is not None:
+            self.samples.append({
+                "rss_total_mb": total_rss / 1e6,
+                "rss_max_process_mb": max_rss / 1e6,
+                "cpu_percent": total_cpu_pct,
+                "processes": len(self.pids),
+            })
+        self._last_time = now
+
+    async def run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def report(self) -> Dict[str, Any]:
+        if not self.samples:
+            return {"available": False}
+        rss = [s["rss_total_mb"] for s in self.samples]
+        cpu = [s["cpu_percent"] for s in self.samples]
+        return {
+            "available": True,
+            "samples": len(self.samples),
+            "rss_total_mb": {"mean": sum(rss) / len(rss), "max": max(rss)},
+            "rss_max_process_mb": max(s["rss_max_process_mb"] for s in self.samples),
+            "cpu_percent": {"mean": sum(cpu) / len(cpu), "max": max(cpu)},
+            "max_processes": max(s["processes"] for s in self.samples),
+        }
+
+
+# ============================================================================
+# Load generation
+# ============================================================================
+
+def build_arguments(task_type: str, rng: random.Random, client_idx: int) -> Dict[str, Any]:
+    template = rng.choice(DEFAULT_PROMPTS[task_type])
+    return {
+        "task_type": task_type,
+        "prompt": template["prompt"],
+        "language": template.get("language", "python"),
+        "context": template.get("context", {}),
+        "user_id": f"loadgen-{client_idx}",
+    }
+
+
+async def run_client(idx: int, args, stats: LoadStats, sampler: ResourceSampler,
+                     http_client, deadline: float, mix: Dict[str, float]):
+    rng = random.Random(args.seed + idx)
+    client_name = IDE_CLIENTS[idx % len(IDE_CLIENTS)]
+
+    if args.transport == "stdio":
+        transport = StdioTransport(args.server_cmd, project_root)
+    else:
+        transport = SSETransport(args.url, http_client)
+
+    session = MCPClientSession(transport, client_name, args.request_timeout)
+    try:
+        await transport.start()
+        if args.transport == "stdio":
+            sampler.pids.append(transport.pid)
+        await session.initialize()
+    except Exception as e:
+        stats.connect_failures += 1
+        print(f"❌ Client {idx} ({client_name}) failed to connect: {e}", file=sys.stderr)
+        await transport.close()
+        return
+
+    task_types, weights = list(mix), list(mix.values())
+    # Stagger start so clients don't arrive in lockstep
+    await asyncio.sleep(rng.uniform(0, args.ramp_up))
+
+    sent = 0
+    try:
+        while time.monotonic() < deadline and (args.requests <= 0 or sent < args.requests):
+            task_type = rng.choices(task_types, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await session.call_tool(build_arguments(task_type, rng, idx))
+            except (MCPTransportError, asyncio.TimeoutError) as e:
+                stats.transport_errors += 1
+                stats.records.append(CallRecord(task_type, time.perf_counter() - start, False, "transport_error"))
+                if isinstance(e, MCPTransportError):
+                    break
+                continue
+            latency = time.perf_counter() - start
+            sent += 1
+
+            result = response.get("result") or {}
+            tool_status = "rpc_error" if "error" in response else "unknown"
+            for item in result.get("content", []):
+                if item.get("type") == "text":
+                    try:
+                        tool_status = json.loads(item["text"]).get("status", tool_status)
+                    except (ValueError, AttributeError):
+                        pass
+                    break
+            ok = "error" not in response and not result.get("isError", False)
+            stats.records.append(CallRecord(task_type, latency, ok, tool_status))
+
+            if args.think_time > 0:
+                await asyncio.sleep(rng.expovariate(1.0 / args.think_time))
+    finally:
+        await transport.close()
+
+
+async def wait_for_sse_server(url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            try:
+                async with client.stream("GET", url) as response:
+                    if response.status_code == 200:
+                        return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"SSE server at {url} did not become ready within {timeout}s")
+
+
+async def run_load(args) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+    stats = LoadStats()
+    sampler = ResourceSampler(args.sample_interval)
+    server_process = None
+    http_client = None
+
+    if args.transport == "sse":
+        if httpx is None:
+            raise RuntimeError("The SSE transport requires httpx (pip install httpx)")
+        if args.spawn_server:
+            server_process = subprocess.Popen(
+                args.server_cmd + ["sse"], cwd=project_root,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            sampler.pids.append(server_process.pid)
+            await wait_for_sse_server(args.url, args.startup_timeout)
+        elif args.server_pid:
+            sampler.pids.append(args.server_pid)
+        http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(args.request_timeout, read=None),
+            limits=httpx.Limits(max_connections=args.clients * 2 + 10),
+        )
+
+    sampler_task = asyncio.create_task(sampler.run())
+    start = time.monotonic()
+    deadline = start + args.duration
+    try:
+        await asyncio.gather(*[
+            run_client(i, args, stats, sampler, http_client, deadline, mix)
+            for i in range(args.clients)
+        ])
+    finally:
+        elapsed = time.monotonic() - start
+        sampler_task.cancel()
+        if http_client:
+            await http_client.aclose()
+        if server_process:
+            server_process.terminate()
+            try:
+                server_process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                server_process.kill()
+
+    report = stats.report(elapsed)
+    report["config"] = {
+        "transport": args.transport,
+        "clients": args.clients,
+        "duration_s": args.duration,
+        "think_time_s": args.think_time,
+        "mix": mix,
+    }
+    report["server"] = sampler.report()
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    config = report["config"]
+    print("\n🚀 Luna MCP Load Test Results")
+    print("=" * 78)
+    print(f"Transport: {config['transport']}  Clients: {config['clients']}  "
+          f"Elapsed: {report['elapsed_s']:.1f}s  Think time: {config['think_time_s']}s")
+    print(f"Connect failures: {report['connect_failures']}  Transport errors: {report['transport_errors']}")
+    print("-" * 78)
+    header = f"{'task type':<22}{'reqs':>7}{'ok':>7}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+    print(header)
+    rows = list(report["per_task_type"].items()) + [("OVERALL", report["overall"])]
+    for name, summary in rows:
+        lat = summary["latency_ms"]
+        print(f"{name:<22}{summary['requests']:>7}{summary['ok']:>7}{summary['throughput_rps']:>8.2f}"
+              f"{lat['p50']:>9.0f}{lat['p95']:>9.0f}{lat['p99']:>9.0f}{lat['max']:>9.0f}")
+    print("-" * 78)
+    statuses = report["overall"]["tool_status"]
+    print("Tool status: " + ", ".join(f"{k}={v}" for k, v in sorted(statuses.items())))
+    server = report["server"]
+    if server.get("available"):
+        print(f"Server RSS: mean {server['rss_total_mb']['mean']:.1f} MB, max {server['rss_total_mb']['max']:.1f} MB "
+              f"(largest process {server['rss_max_process_mb']:.1f} MB, {server['max_processes']} process(es))")
+        print(f"Server CPU: mean {server['cpu_percent']['mean']:.1f}%, max {server['cpu_percent']['max']:.1f}%")
+    else:
+        print("Server RSS/CPU: not sampled (use --spawn-server or --server-pid with sse)")
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent IDE clients against the Luna MCP server")
+    parser.add_argument("--transport", choices=["stdio", "sse"], default="stdio")
+    parser.add_argument("--clients", type=int, default=4, help="Number of concurrent simulated clients")
+    parser.add_argument("--duration", type=float, default=60.0, help="Test duration in seconds")
+    parser.add_argument("--requests", type=int, default=0, help="Max requests per client (0 = until duration)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted task mix, e.g. code_generation=5,debugging=2")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean think time between calls (exponential)")
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="Spread client start over this many seconds")
+    parser.add_argument("--request-timeout", type=float, default=300.0)
+    parser.add_argument("--url", default="http://localhost:8000/sse", help="SSE endpoint of the MCP server")
+    parser.add_argument("--spawn-server", action="store_true", help="Start 'run_mcp.py sse' for the sse transport")
+    parser.add_argument("--server-pid", type=int, default=None, help="PID of an already running SSE server to sample")
+    parser.add_argument("--server-cmd", nargs="+", default=[sys.executable, "run_mcp.py"],
+                        help="Command used to launch the server")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="RSS/CPU sampling interval")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json-out", default=None, help="Write the full report as JSON to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        report = asyncio.run(run_load(args))
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    print_report(report)
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(report, indent=2))
+        print(f"\n📊 Report written to {args.json_out}")
+    return 0 if report["overall"]["requests"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Traffic Replay Tool for Luna Services
+
+Re-issues requests recorded by the traffic capture middleware
+(backend/app/middleware/capture.py) against a target backend, preserving the
+original inter-arrival timing. Use --speed to compress time (2 = twice as fast).
+
+Usage:
+    python scripts/replay-traffic.py captures/traffic.jsonl --target http://localhost:8000
+    python scripts/replay-traffic.py captures/*.jsonl --speed 5 --token "$TOKEN" --json-out replay.json
+
+Captured credentials are redacted, so pass --token (or --header) to authenticate.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import httpx
+except ImportError:
+    print("❌ httpx is required: pip install httpx")
+    sys.exit(1)
+
+# Hop-by-hop and length headers are recomputed by the client
+SKIP_HEADERS = {"host", "content-length", "connection", "transfer-encoding", "keep-alive", "upgrade"}
+
+
+def load_records(paths: List[str], path_prefix: Optional[str], include_truncated: bool) -> List[Dict[str, Any]]:
+    """Load capture records from one or more JSON Lines files, ordered by arrival time"""
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    print(f"⚠️  Skipping malformed line {line_number} in {path}", file=sys.stderr)
+                    continue
+                if path_prefix and not record["path"].startswith(path_prefix):
+                    continue
+                if record.get("truncated") and not include_truncated:
+                    continue
+                records.append(record)
+    records.sort(key=lambda r: r["ts"])
+    return records
+
+
+def route_key(record: Dict[str, Any]) -> str:
+    """Group by method and the first three path segments to keep ids out of the key"""
+    segments = record["path"].strip("/").split("/")
+    return f"{record['method']} /{'/'.join(segments[:3])}"
+
+
+def decode_body(record: Dict[str, Any]) -> bytes:
+    if record.get("body_encoding") == "base64":
+        return base64.b64decode(record.get("body", ""))
+    return record.get("body", "").encode("utf-8")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class ReplayStats:
+    """Collects per-route latency, status codes and scheduling lag"""
+
+    def __init__(self):
+        self.results: List[Dict[str, Any]] = []
+
+    def add(self, record: Dict[str, Any], status: int, latency: float, lag: float, error: Optional[str] = None):
+        self.results.append({
+            "route": route_key(record),
+            "status": status,
+            "original_status": record.get("status"),
+            "latency": latency,
+            "lag": lag,
+            "error": error,
+        })
+
+    def summarize(self, results: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(r["latency"] for r in results)
+        statuses: Dict[str, int] = {}
+        for r in results:
+            key = str(r["status"]) if r["status"] else "error"
+            statuses[key] = statuses.get(key, 0) + 1
+        return {
+            "requests": len(results),
+            "throughput_rps": len(results) / elapsed if elapsed > 0 else 0.0,
+            "status": statuses,
+            "status_mismatches": sum(1 for r in results if r["original_status"] and r["status"] != r["original_status"]),
+            "latency_ms": {
+                "p50": percentile(latencies, 50) * 1000,
+                "p95": percentile(latencies, 95) * 1000,
+                "p99": percentile(latencies, 99) * 1000,
+                "max": (latencies[-1] * 1000) if latencies else 0.0,
+            },
+        }
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        by_route: Dict[str, List[Dict[str, Any]]] = {}
+        for r in self.results:
+            by_route.setdefault(r["route"], []).append(r)
+        lags = sorted(r["lag"] for r in self.results)
+        return {
+            "elapsed_s": elapsed,
+            "schedule_lag_ms": {"p50": percentile(lags, 50) * 1000, "p99": percentile(lags, 99) * 1000},
+            "overall": self.summarize(self.results, elapsed),
+            "per_route": {route: self.summarize(rs, elapsed) for route, rs in sorted(by_route.items())},
+        }
+
+
+async def replay(records: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    stats = ReplayStats()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    extra_headers = dict(h.split(":", 1) for h in args.header)
+    if args.token:
+        extra_headers["authorization"] = f"Bearer {args.token}"
+
+    async def fire(client: httpx.AsyncClient, record: Dict[str, Any], scheduled: float):
+        async with semaphore:
+            lag = time.monotonic() - scheduled
+            headers = {
+                name: value for name, value in record["headers"]
+                if name not in SKIP_HEADERS and value != "[REDACTED]"
+            }
+            headers.update({k.strip().lower(): v.strip() for k, v in extra_headers.items()})
+            url = record["path"] + (f"?{record['query_string']}" if record.get("query_string") else "")
+            start = time.perf_counter()
+            try:
+                response = await client.request(record["method"], url, headers=headers, content=decode_body(record))
+                # Drain streamed (SSE) responses so latency covers the full body
+                await response.aread()
+                stats.add(record, response.status_code, time.perf_counter() - start, lag)
+            except httpx.HTTPError as e:
+                stats.add(record, 0, time.perf_counter() - start, lag, error=str(e))
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.target, timeout=args.timeout, limits=limits) as client:
+        tasks = []
+        start = time.monotonic()
+        offset = 0.0
+        for iteration in range(args.loop):
+            first_ts = records[0]["ts"]
+            for record in records:
+                scheduled = start + offset + (record["ts"] - first_ts) / args.speed
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(fire(client, record, scheduled)))
+            offset += (records[-1]["ts"] - first_ts) / args.speed
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - start
+
+    return stats.report(elapsed)
+
+
+def print_report(report: Dict[str, Any], args):
+    print(f"\n🔁 Replay against {args.target} at {args.speed}x")
+    print("=" * 78)
+    overall = report["overall"]
+    print(f"Requests: {overall['requests']}  Elapsed: {report['elapsed_s']:.1f}s  "
+          f"Throughput: {overall['throughput_rps']:.2f} rps")
+    print(f"Schedule lag: p50 {report['schedule_lag_ms']['p50']:.1f} ms, p99 {report['schedule_lag_ms']['p99']:.1f} ms")
+    print("-" * 78)
+    print(f"{'route':<40}{'reqs':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'mismatch':>9}")
+    for route, summary in report["per_route"].items():
+        lat = summary["latency_ms"]
+        print(f"{route[:39]:<40}{summary['requests']:>6}{lat['p50']:>9.0f}{lat['p95']:>9.0f}"
+              f"{lat['p99']:>9.0f}{summary['status_mismatches']:>9}")
+    print("-" * 78)
+    print("Status: " + ", ".join(f"{k}={v}" for k, v in sorted(overall["status"].items())))
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Replay captured Luna Services traffic against a target")
+    parser.add_argument("captures", nargs="+", help="Capture files written by TrafficCaptureMiddleware")
+    parser.add_argument("--target", default="http://localhost:8000", help="Base URL of the backend to replay against")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time compression factor (1 = original timing)")
+    parser.add_argument("--concurrency", type=int, default=256, help="Maximum requests in flight")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--token", default=None, help="Bearer token to use in place of redacted credentials")
+    parser.add_argument("--header", action="append", default=[], help="Extra header 'Name: value' (repeatable)")
+    parser.add_argument("--path-prefix", default=None, help="Only replay requests under this path")
+    parser.add_argument("--limit", type=int, default=0, help="Replay at most this many requests")
+    parser.add_argument("--loop", type=int, default=1, help="Replay the capture this many times back to back")
+    parser.add_argument("--include-truncated", action="store_true", help="Also replay requests whose body was truncated")
+    parser.add_argument("--json-out", default=None, help="Write the full report as JSON to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.speed <= 0:
+        print("❌ --speed must be positive", file=sys.stderr)
+        return 1
+
+    records = load_records(args.captures, args.path_prefix, args.include_truncated)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print("❌ No replayable requests found in capture", file=sys.stderr)
+        return 1
+
+    span = records[-1]["ts"] - records[0]["ts"]
+    print(f"📼 Loaded {len(records)} requests spanning {span:.1f}s "
+          f"(~{span / args.speed * args.loop:.1f}s at {args.speed}x)")
+
+    report = asyncio.run(replay(records, args))
+    print_report(report, args)
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(report, indent=2))
+        print(f"\n📊 Report written to {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,9 @@
+"""Shared pytest configuration for the backend test suite"""
+
+import sys
+from pathlib import Path
+
+# Make ``backend.app`` importable however pytest is invoked
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
@@ -0,0 +1,119 @@
+"""Tests for the incremental analytics engine and its latency sketch"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app.mcp.analytics import AnalyticsEngine, LatencySketch
+from backend.app.mcp.models import MCPAnalytics, MCPTaskType
+
+
+def make_event(session_id="s1", user_id="u1", task_type=MCPTaskType.CODE_GENERATION,
+               success=True, response_time=0.5, tokens_used=10, created_at=None):
+    return MCPAnalytics(
+        session_id=session_id,
+        user_id=user_id,
+        request_id=f"req-{session_id}",
+        task_type=task_type,
+        success=success,
+        response_time=response_time,
+        tokens_used=tokens_used,
+        created_at=created_at or datetime.utcnow(),
+    )
+
+
+class TestLatencySketch:
+    def test_empty_sketch_reports_zero(self):
+        assert LatencySketch().quantile(0.5) == 0.0
+
+    @pytest.mark.parametrize("q", [0.5, 0.9, 0.99])
+    def test_quantiles_within_relative_error(self, q):
+        sketch = LatencySketch(gamma=1.05)
+        values = [0.01 * i for i in range(1, 1001)]
+        for value in values:
+            sketch.add(value)
+        exact = values[int(q * (len(values) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.05)
+
+    def test_values_below_minimum_share_first_bucket(self):
+        sketch = LatencySketch(min_value=0.001)
+        sketch.add(0.0)
+        sketch.add(0.0005)
+        assert sketch.counts[0] == 2
+        assert sketch.quantile(0.5) == 0.001
+
+    def test_quantile_never_exceeds_max_seen(self):
+        sketch = LatencySketch()
+        sketch.add(0.2)
+        assert sketch.quantile(1.0) <= 0.2
+
+    def test_values_past_range_clamp_to_last_bucket(self):
+        sketch = LatencySketch(max_value=10.0)
+        sketch.add(1e6)
+        assert sketch.counts[-1] == 1
+        assert sketch.max_value == 1e6
+        assert 10.0 <= sketch.quantile(0.5) < 1e6
+
+
+class TestAnalyticsEngine:
+    def test_summaries_aggregate_recorded_events(self):
+        engine = AnalyticsEngine()
+        engine.record(make_event(response_time=1.0, tokens_used=10))
+        engine.record(make_event(response_time=3.0, tokens_used=30, success=False,
+                                 task_type=MCPTaskType.DEBUGGING))
+
+        session = engine.session_summary("s1")
+        assert session["total_requests"] == 2
+        assert session["avg_response_time"] == pytest.approx(2.0)
+        assert session["success_rate"] == pytest.approx(50.0)
+        assert session["total_tokens"] == 40
+        assert session["task_distribution"] == {"code_generation": 1, "debugging": 1}
+
+        assert engine.user_summary("u1")["total_requests"] == 2
+        tasks = engine.task_summary()
+        assert tasks["debugging"]["success_rate"] == 0.0
+        assert tasks["code_generation"]["total_tokens"] == 10
+
+    def test_unknown_keys_return_empty_summary(self):
+        engine = AnalyticsEngine()
+        summary = engine.session_summary("missing")
+        assert summary["total_requests"] == 0
+        assert summary["first_request"] is None
+
+    def test_anonymous_events_skip_user_aggregates(self):
+        engine = AnalyticsEngine()
+        engine.record(make_event(user_id=None))
+        assert engine.overall_summary()["tracked_users"] == 0
+        assert engine.session_summary("s1")["total_requests"] == 1
+
+    def test_first_and_last_request_timestamps(self):
+        engine = AnalyticsEngine()
+        start = datetime(2024, 1, 1, 12, 0, 0)
+        engine.record(make_event(created_at=start))
+        engine.record(make_event(created_at=start + timedelta(minutes=5)))
+        summary = engine.session_summary("s1")
+        assert summary["first_request"] == start.isoformat()
+        assert summary["last_request"] == (start + timedelta(minutes=5)).isoformat()
+
+    def test_event_buffer_is_bounded(self):
+        engine = AnalyticsEngine(max_events=3)
+        for i in range(10):
+            engine.record(make_event(session_id=f"s{i}"))
+        assert [event.session_id for event in engine.recent_events()] == ["s7", "s8", "s9"]
+        overall = engine.overall_summary()
+        assert overall["buffered_events"] == 3
+        assert overall["total_requests"] == 10
+        assert len(engine.store) == 10
+
+    def test_least_recently_updated_keys_are_evicted(self):
+        engine = AnalyticsEngine(max_keys=2)
+        engine.record(make_event(session_id="a", user_id="ua"))
+        engine.record(make_event(session_id="b", user_id="ub"))
+        engine.record(make_event(session_id="a", user_id="ua"))
+        engine.record(make_event(session_id="c", user_id="uc"))
+
+        assert engine.session_summary("b")["total_requests"] == 0
+        assert engine.session_summary("a")["total_requests"] == 2
+        assert engine.session_summary("c")["total_requests"] == 1
+        assert engine.overall_summary()["tracked_sessions"] == 2
+        assert engine.user_summary("ub")["total_requests"] == 0
@@ -0,0 +1,107 @@
+"""Tests for the durable analytics event log and its rollups"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app.mcp.analytics_log import AnalyticsEventLog, AnalyticsRollup, event_to_row
+from backend.app.mcp.analytics_store import ColumnarAnalyticsStore
+from backend.app.mcp.models import MCPAnalytics, MCPTaskType
+
+
+def make_event(i=0, user_id="u1", task_type=MCPTaskType.CODE_GENERATION, success=True,
+               created_at=None):
+    return MCPAnalytics(
+        session_id="s1",
+        user_id=user_id,
+        request_id=f"r{i}",
+        task_type=task_type,
+        success=success,
+        response_time=0.1 * (i % 10 + 1),
+        tokens_used=i,
+        created_at=created_at or datetime.utcnow(),
+    )
+
+
+def segment_rows(directory):
+    rows = []
+    for path in sorted((directory / "segments").glob("events-*.log")):
+        rows.extend(json.loads(line) for line in path.read_text().splitlines())
+    return rows
+
+
+async def test_close_writes_every_queued_event(tmp_path):
+    log = AnalyticsEventLog(str(tmp_path), batch_size=100, flush_interval=30.0)
+    for i in range(250):
+        log.enqueue(make_event(i))
+    await log.close()
+
+    rows = segment_rows(tmp_path)
+    assert sorted(row[1] for row in rows) == sorted(f"r{i}" for i in range(250))
+    assert log._task is None
+
+
+async def test_close_without_events(tmp_path):
+    log = AnalyticsEventLog(str(tmp_path))
+    await log.close()
+    assert segment_rows(tmp_path) == []
+
+
+async def test_full_queue_drops_instead_of_blocking(tmp_path):
+    log = AnalyticsEventLog(str(tmp_path), max_queue=5, flush_interval=30.0)
+    for i in range(20):
+        log.enqueue(make_event(i))
+    assert log.dropped > 0
+    await log.close()
+    assert len(segment_rows(tmp_path)) == 20 - log.dropped
+
+
+@pytest.fixture
+def rolled_up(tmp_path):
+    """A rollup over events written both to segments and to an in-memory store"""
+    now = datetime.utcnow().replace(minute=30, second=0, microsecond=0)
+    events = [
+        make_event(0, created_at=now - timedelta(hours=2)),
+        make_event(1, created_at=now - timedelta(hours=2), success=False),
+        make_event(2, created_at=now - timedelta(hours=1), task_type=MCPTaskType.DEBUGGING),
+        make_event(3, created_at=now - timedelta(hours=1), user_id="u2"),
+    ]
+    log = AnalyticsEventLog(str(tmp_path))
+    log.writer.write([event_to_row(event) for event in events])
+    log.writer.close()
+    store = ColumnarAnalyticsStore()
+    for event in events:
+        store.append(event)
+    return AnalyticsRollup(str(tmp_path)), store
+
+
+def test_rollup_is_incremental(rolled_up):
+    rollup, _ = rolled_up
+    assert rollup.run() == 4
+    assert rollup.run() == 0
+
+
+def test_rollup_report_matches_memory_report(rolled_up):
+    rollup, store = rolled_up
+    rollup.run()
+    for bucket in ("hour", "day"):
+        from_rollups = rollup.user_report("u1", days=2, bucket=bucket)
+        from_memory = store.user_report("u1", days=2, bucket=bucket)
+        assert set(from_rollups) == set(from_memory)
+        assert from_rollups["source"] == "rollups"
+        for key in ("total_requests", "successful_requests", "total_tokens_used",
+                    "task_type_breakdown", "tokens_by_task_type"):
+            assert from_rollups[key] == from_memory[key]
+        assert ([(p["bucket_start"], p["requests"], p["errors"], p["tokens"])
+                 for p in from_rollups["timeline"]] ==
+                [(p["bucket_start"], p["requests"], p["errors"], p["tokens"])
+                 for p in from_memory["timeline"]])
+        for point in from_rollups["timeline"]:
+            assert set(point) == set(from_memory["timeline"][0])
+
+
+def test_rollup_report_rejects_minute_buckets(rolled_up):
+    rollup, _ = rolled_up
+    with pytest.raises(ValueError):
+        rollup.user_report("u1", bucket="minute")
@@ -0,0 +1,123 @@
+"""Tests for the columnar analytics store"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app.mcp.analytics_store import ColumnarAnalyticsStore
+from backend.app.mcp.models import MCPAnalytics, MCPTaskType
+
+BASE = datetime(2024, 3, 1, 10, 0, 0)
+
+
+def make_event(user_id="u1", task_type=MCPTaskType.CODE_GENERATION, success=True,
+               response_time=1.0, tokens_used=10, created_at=BASE):
+    return MCPAnalytics(
+        session_id="s1",
+        user_id=user_id,
+        request_id="r1",
+        task_type=task_type,
+        success=success,
+        response_time=response_time,
+        tokens_used=tokens_used,
+        created_at=created_at,
+    )
+
+
+@pytest.fixture
+def store():
+    store = ColumnarAnalyticsStore(segment_size=4)
+    for i in range(10):
+        store.append(make_event(
+            user_id="u1" if i % 2 == 0 else "u2",
+            task_type=MCPTaskType.DEBUGGING if i < 3 else MCPTaskType.CODE_GENERATION,
+            success=i != 0,
+            response_time=float(i + 1),
+            tokens_used=i * 10,
+            created_at=BASE + timedelta(minutes=30 * i),
+        ))
+    return store
+
+
+def test_rows_span_segments(store):
+    assert len(store) == 10
+    assert len(store.segments) == 3
+
+
+def test_summary_over_all_rows(store):
+    summary = store.summary()
+    assert summary["total_requests"] == 10
+    assert summary["successful_requests"] == 9
+    assert summary["success_rate"] == pytest.approx(0.9)
+    assert summary["avg_execution_time"] == pytest.approx(5.5)
+    assert summary["total_tokens_used"] == 450
+    assert summary["task_type_breakdown"] == {"code_generation": 7, "debugging": 3}
+    assert summary["tokens_by_task_type"] == {"code_generation": 420, "debugging": 30}
+    assert summary["latency_percentiles"]["p50"] == pytest.approx(5.5)
+
+
+def test_summary_filters(store):
+    assert store.summary(user_id="u1")["total_requests"] == 5
+    assert store.summary(task_type=MCPTaskType.DEBUGGING)["total_requests"] == 3
+    window = store.summary(since=BASE + timedelta(hours=1), until=BASE + timedelta(hours=2))
+    assert window["total_requests"] == 2
+    assert window["avg_execution_time"] == pytest.approx(3.5)
+
+
+def test_summary_without_matches(store):
+    empty = store.summary(user_id="nobody")
+    assert empty["total_requests"] == 0
+    assert empty["latency_percentiles"] == {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    assert store.summary(since=BASE + timedelta(days=1))["total_requests"] == 0
+
+
+def test_time_buckets_by_hour(store):
+    buckets = store.time_buckets("hour")
+    assert [b["bucket_start"] for b in buckets] == [
+        (BASE + timedelta(hours=h)).isoformat() for h in range(5)
+    ]
+    first = buckets[0]
+    assert first["requests"] == 2
+    assert first["errors"] == 1
+    assert first["tokens"] == 10
+    assert first["p50_latency"] == pytest.approx(1.0)
+    assert first["p95_latency"] == pytest.approx(1.0)
+    assert sum(b["requests"] for b in buckets) == 10
+
+
+def test_time_buckets_by_day_and_user(store):
+    buckets = store.time_buckets("day", user_id="u2")
+    assert len(buckets) == 1
+    assert buckets[0]["bucket_start"] == datetime(2024, 3, 1).isoformat()
+    assert buckets[0]["requests"] == 5
+
+
+def test_time_buckets_reject_unknown_width(store):
+    with pytest.raises(KeyError):
+        store.time_buckets("week")
+
+
+def test_oldest_segments_are_dropped():
+    store = ColumnarAnalyticsStore(segment_size=4, max_rows=8)
+    for i in range(12):
+        store.append(make_event(created_at=BASE + timedelta(seconds=i), tokens_used=i))
+    assert len(store) == 8
+    assert store.summary()["total_tokens_used"] == sum(range(4, 12))
+
+
+def test_top_users_by_tokens(store):
+    assert store.top_users_by_tokens() == [("u2", 250), ("u1", 200)]
+    assert store.top_users_by_tokens(limit=1) == [("u2", 250)]
+
+
+def test_user_report_shape():
+    store = ColumnarAnalyticsStore()
+    now = datetime.utcnow()
+    store.append(make_event(created_at=now - timedelta(days=40)))
+    store.append(make_event(created_at=now - timedelta(hours=1), tokens_used=5))
+    report = store.user_report("u1", days=30)
+    assert report["total_requests"] == 1
+    assert report["total_tokens_used"] == 5
+    assert report["period_days"] == 30
+    assert report["source"] == "memory"
+    assert len(report["timeline"]) == 1
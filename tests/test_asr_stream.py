@@ -0,0 +1,104 @@
+"""Tests for streaming speech recognition over WebSocket"""
+
+import asyncio
+import json
+
+from backend.app.mcp.asr_stream import StreamingASRConnection
+from backend.app.mcp.models import MCPResponse, MCPSession
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = []
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    def audio(self, text):
+        self.incoming.put_nowait({"type": "websocket.receive", "bytes": text.encode()})
+
+
+class FakeRiva:
+    """Each audio chunk is recognized as its own text: a partial, then a final"""
+
+    async def stream_recognition(self, audio, language, sample_rate):
+        async for chunk in audio:
+            yield chunk.decode()[:4], False
+            yield chunk.decode(), True
+        # A late result from the recognizer after the audio ended
+        yield "late result", True
+
+
+class FakeService:
+    riva_service = FakeRiva()
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.started = []
+        self.cancelled = []
+
+    async def process_request(self, request):
+        self.started.append(request.prompt)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(request.prompt)
+            raise
+        return MCPResponse(request_id=request.id, status="success", explanation=request.prompt)
+
+
+async def test_finals_are_processed_and_answered_before_done():
+    websocket, service = FakeWebSocket(), FakeService(delay=0.05)
+    connection = StreamingASRConnection(websocket, service, MCPSession(user_id="u1"))
+    websocket.audio("write a function")
+    websocket.incoming.put_nowait({"type": "websocket.receive", "text": '{"type": "end"}'})
+    await connection.serve()
+
+    types = [frame["type"] for frame in websocket.sent]
+    assert types[:2] == ["partial", "final"]
+    assert types[-1] == "done"
+    assert types.count("response") == 2
+    assert service.started == ["write a function", "late result"]
+    assert not connection.tasks
+
+
+async def test_disconnect_cancels_running_commands_and_stops_recognition():
+    websocket, service = FakeWebSocket(), FakeService(delay=30)
+    connection = StreamingASRConnection(websocket, service, MCPSession(user_id="u1"))
+    serving = asyncio.create_task(connection.serve())
+    websocket.audio("write a function")
+    await asyncio.sleep(0.05)
+    websocket.incoming.put_nowait({"type": "websocket.disconnect", "code": 1001})
+
+    await asyncio.wait_for(serving, timeout=2)
+    assert service.started == ["write a function"]
+    assert service.cancelled == ["write a function"]
+    assert "done" not in [frame["type"] for frame in websocket.sent]
+    assert not connection.tasks
+
+
+async def test_recognition_errors_are_reported():
+    class FailingRiva:
+        async def stream_recognition(self, audio, language, sample_rate):
+            raise RuntimeError("recognizer unavailable")
+            yield
+
+    service = FakeService()
+    service.riva_service = FailingRiva()
+    websocket = FakeWebSocket()
+    await StreamingASRConnection(websocket, service, MCPSession(user_id="u1")).serve()
+    assert websocket.sent == [{"type": "error", "message": "recognizer unavailable"}]
+
+
+async def test_transcribe_only():
+    websocket, service = FakeWebSocket(), FakeService()
+    connection = StreamingASRConnection(websocket, service, MCPSession(user_id="u1"), process=False)
+    websocket.audio("hello")
+    websocket.incoming.put_nowait({"type": "websocket.receive", "text": '{"type": "end"}'})
+    await connection.serve()
+    assert service.started == []
+    assert [frame["type"] for frame in websocket.sent] == ["partial", "final", "final", "done"]
@@ -0,0 +1,125 @@
+"""Tests for voice output format negotiation and encoding"""
+
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from backend.app.mcp import audio_codecs
+from backend.app.mcp.audio_codecs import (
+    MULAW_SAMPLE_RATE,
+    _mulaw,
+    encode_audio,
+    encode_audio_async,
+    negotiate_audio_format,
+    output_sample_rate,
+    resample_pcm,
+)
+
+
+@pytest.fixture
+def all_formats(monkeypatch):
+    monkeypatch.setattr(audio_codecs, "_AVAILABLE", {"opus", "flac", "mulaw", "wav", "pcm"})
+
+
+def tone_pcm(seconds=0.1, rate=22050):
+    t = np.arange(int(seconds * rate)) / rate
+    return (0.3 * np.sin(2 * np.pi * 440 * t) * 32767).astype("<i2").tobytes()
+
+
+@pytest.mark.parametrize("accept,expected", [
+    (None, "pcm"),
+    ("", "pcm"),
+    ("opus", "opus"),
+    ("audio/ogg; codecs=opus, audio/flac;q=0.5", "opus"),
+    ("audio/flac;q=0.5, audio/ogg; codecs=opus", "opus"),
+    ("audio/flac;q=0.9, audio/ogg;codecs=opus;q=0.5", "flac"),
+    ("audio/ogg; codecs=vorbis, audio/basic", "mulaw"),
+    ("ULAW", "mulaw"),
+    ("audio/x-wav", "wav"),
+    ("audio/mpeg", "pcm"),
+    ("opus;q=0, wav", "wav"),
+    ("opus;q=abc, wav;q=0.1", "wav"),
+    ("audio/*", "pcm"),
+])
+def test_negotiate_audio_format(all_formats, accept, expected):
+    assert negotiate_audio_format(accept).name == expected
+
+
+def test_unavailable_formats_are_skipped(monkeypatch):
+    monkeypatch.setattr(audio_codecs, "_AVAILABLE", {"mulaw", "wav", "pcm"})
+    assert negotiate_audio_format("opus, flac, audio/basic;q=0.1").name == "mulaw"
+    assert negotiate_audio_format("opus", default="wav").name == "wav"
+
+
+def test_mulaw_reference_points():
+    assert _mulaw(np.array([0.0, 1.0, -1.0], dtype=np.float32)) == b"\xff\x80\x00"
+
+
+def test_mulaw_round_trips_within_one_quantization_step():
+    pcm = np.arange(-32768, 32768, dtype=np.int32)
+    codes = np.frombuffer(_mulaw(pcm.astype(np.float32) / 32768.0), dtype=np.uint8).astype(np.int32)
+    # Standard G.711 decoder
+    u = ~codes & 0xFF
+    exponent = (u >> 4) & 0x07
+    magnitude = ((((u & 0x0F) << 3) + 0x84) << exponent) - 0x84
+    decoded = np.where(u & 0x80, -magnitude, magnitude)
+    assert (np.abs(decoded - pcm) <= (8 << exponent)).all()
+
+
+@pytest.mark.parametrize("audio_format,rate,expected", [
+    ("mulaw", 22050, MULAW_SAMPLE_RATE),
+    ("opus", 22050, 24000),
+    ("opus", 16000, 16000),
+    ("opus", 96000, 48000),
+    ("flac", 22050, 22050),
+    ("pcm", 22050, 22050),
+])
+def test_output_sample_rate(audio_format, rate, expected):
+    assert output_sample_rate(audio_format, rate) == expected
+
+
+def test_encode_pcm_and_wav():
+    pcm = tone_pcm()
+    assert encode_audio(pcm, 22050, "pcm") == (pcm, 22050)
+    data, rate = encode_audio(pcm, 22050, "wav")
+    assert rate == 22050
+    with wave.open(io.BytesIO(data)) as wav:
+        assert wav.getframerate() == 22050
+        assert wav.getnchannels() == 1
+        assert wav.readframes(wav.getnframes()) == pcm
+
+
+def test_encode_mulaw_resamples_to_8khz():
+    data, rate = encode_audio(tone_pcm(seconds=1.0), 22050, "mulaw")
+    assert rate == MULAW_SAMPLE_RATE
+    assert abs(len(data) - MULAW_SAMPLE_RATE) <= 1
+
+
+def test_resample_pcm_keeps_duration():
+    assert abs(len(resample_pcm(tone_pcm(seconds=1.0), 22050, 16000)) - 32000) <= 2
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        encode_audio(tone_pcm(), 22050, "mp3")
+
+
+async def test_encode_audio_async():
+    pcm = tone_pcm()
+    assert await encode_audio_async(pcm, 22050, "pcm") == (pcm, 22050)
+    data, rate = await encode_audio_async(pcm, 22050, "mulaw")
+    assert rate == MULAW_SAMPLE_RATE
+    assert data
+
+
+@pytest.mark.parametrize("audio_format", ["flac", "opus"])
+def test_compressed_formats_decode(audio_format):
+    sf = pytest.importorskip("soundfile")
+    if audio_format not in audio_codecs.available_formats():
+        pytest.skip(f"libsndfile has no {audio_format} support")
+    data, rate = encode_audio(tone_pcm(seconds=0.5), 22050, audio_format)
+    samples, decoded_rate = sf.read(io.BytesIO(data))
+    assert decoded_rate == rate
+    assert abs(len(samples) - rate // 2) < rate // 20
@@ -0,0 +1,108 @@
+"""Tests for ASR audio preprocessing"""
+
+import io
+
+import numpy as np
+import pytest
+
+from backend.app.mcp.audio_preprocess import (
+    SPEECH_PAD_SECONDS,
+    TARGET_RMS_DB,
+    AudioPreprocessor,
+    preprocess_audio,
+    voiced_region,
+)
+
+RATE = 16000
+
+
+def tone(seconds, amplitude=0.1, rate=RATE, frequency=440.0):
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def silence(seconds, rate=RATE):
+    return np.zeros(int(seconds * rate), dtype=np.float32)
+
+
+def to_pcm(samples):
+    return (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+
+def rms_db(pcm):
+    samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+    return 10.0 * np.log10(float(np.square(samples).mean()))
+
+
+def test_voiced_region_finds_speech_with_padding():
+    samples = np.concatenate([silence(1.0), tone(0.5), silence(1.0)])
+    start, end = voiced_region(samples, RATE)
+    pad = int(RATE * SPEECH_PAD_SECONDS)
+    assert start == RATE - pad
+    assert end == int(1.5 * RATE) + pad
+
+
+def test_voiced_region_ignores_background_far_below_the_peak():
+    noise = np.random.default_rng(0).normal(0, 1e-3, RATE).astype(np.float32)
+    samples = noise + np.concatenate([silence(0.5), tone(0.25, amplitude=0.5), silence(0.25)])
+    start, end = voiced_region(samples, RATE)
+    assert 0.3 * RATE < start < 0.5 * RATE
+    assert 0.75 * RATE < end < 0.95 * RATE
+
+
+@pytest.mark.parametrize("samples", [silence(1.0), tone(1.0, amplitude=1e-4), np.zeros(10, dtype=np.float32)])
+def test_voiced_region_without_speech(samples):
+    assert voiced_region(samples, RATE) is None
+
+
+def test_preprocess_trims_and_normalizes_raw_pcm():
+    clip = np.concatenate([silence(1.0), tone(0.5, amplitude=0.01), silence(1.0)])
+    pcm, info = preprocess_audio(to_pcm(clip), target_rate=RATE, source_rate=RATE)
+    assert info["speech"]
+    assert info["channels"] == 1
+    assert info["input_seconds"] == pytest.approx(2.5)
+    assert info["output_seconds"] == pytest.approx(0.5 + 2 * SPEECH_PAD_SECONDS, abs=0.02)
+    assert info["gain_db"] > 0
+    assert len(pcm) == int(info["output_seconds"] * RATE) * 2
+    # The padding is silent, so the level lands a little under the target
+    assert TARGET_RMS_DB - 3 < rms_db(pcm) <= TARGET_RMS_DB + 0.5
+
+
+def test_preprocess_never_clips_loud_input():
+    pcm, info = preprocess_audio(to_pcm(tone(0.5, amplitude=0.99)), target_rate=RATE, source_rate=RATE)
+    assert info["gain_db"] < 0
+    samples = np.frombuffer(pcm, dtype="<i2")
+    assert np.abs(samples).max() < 32767
+
+
+def test_preprocess_silence_yields_no_audio():
+    pcm, info = preprocess_audio(to_pcm(silence(1.0)), target_rate=RATE, source_rate=RATE)
+    assert pcm == b""
+    assert not info["speech"]
+    assert info["output_seconds"] == 0.0
+
+
+def test_preprocess_tolerates_odd_byte_counts_and_empty_input():
+    pcm, info = preprocess_audio(to_pcm(tone(0.5)) + b"\x01", target_rate=RATE, source_rate=RATE)
+    assert info["speech"]
+    assert preprocess_audio(b"", target_rate=RATE, source_rate=RATE)[0] == b""
+
+
+def test_preprocess_downmixes_and_resamples_containers():
+    sf = pytest.importorskip("soundfile")
+    pytest.importorskip("librosa")
+    left = tone(0.5, rate=44100)
+    buffer = io.BytesIO()
+    sf.write(buffer, np.stack([left, left], axis=1), 44100, format="WAV")
+    pcm, info = preprocess_audio(buffer.getvalue(), target_rate=RATE)
+    assert info["channels"] == 2
+    assert info["source_sample_rate"] == 44100
+    assert info["output_seconds"] == pytest.approx(len(pcm) / 2 / RATE, abs=1e-3)
+
+
+async def test_preprocessor_without_workers_runs_in_a_thread():
+    preprocessor = AudioPreprocessor(max_workers=0)
+    pcm, info = await preprocessor.process(to_pcm(tone(0.5)), RATE, RATE)
+    assert info["speech"]
+    assert pcm
+    preprocessor.shutdown()
@@ -0,0 +1,112 @@
+"""Tests for the traffic capture middleware and its writer"""
+
+import json
+import threading
+
+from backend.app.middleware.capture import (
+    CaptureConfig, CaptureWriter, TrafficCaptureMiddleware, get_capture_config
+)
+
+
+def record(body=b"", **fields):
+    return {"headers": [], "content_type": "application/octet-stream", "raw_body": body, **fields}
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_queue_is_bounded_by_body_bytes(tmp_path):
+    release = threading.Event()
+    started = threading.Event()
+
+    def hold_first(captured):
+        started.set()
+        release.wait(5)
+        return captured
+
+    writer = CaptureWriter(str(tmp_path / "traffic.jsonl"), redactors=[hold_first], max_queued_bytes=100)
+    writer.submit(record(b"a" * 60, n=1))
+    assert started.wait(5)
+    # The record being written still counts until it is on disk
+    writer.submit(record(b"b" * 30, n=2))
+    writer.submit(record(b"c" * 20, n=3))
+    writer.submit(record(b"d" * 10, n=4))
+    assert writer.queued_bytes == 100
+    assert writer.dropped == 1
+
+    release.set()
+    writer.close()
+    assert writer.queued_bytes == 0
+    assert writer.written == 3
+    assert [(r["n"], r["body_size"]) for r in read_records(tmp_path / "traffic.jsonl")] == [(1, 60), (2, 30), (4, 10)]
+
+
+def test_full_queue_releases_the_reserved_bytes(tmp_path):
+    writer = CaptureWriter(str(tmp_path / "traffic.jsonl"), queue_size=1, redactors=[lambda r: None])
+    writer.close()  # nothing consumes the queue any more
+    writer.submit(record(b"x" * 10))
+    writer.submit(record(b"y" * 10))
+    assert writer.dropped == 1
+    assert writer.queued_bytes == 10
+
+
+def test_redactors_dropping_records_release_their_bytes(tmp_path):
+    writer = CaptureWriter(str(tmp_path / "traffic.jsonl"), redactors=[lambda r: None])
+    writer.submit(record(b"secret"))
+    writer.close()
+    assert writer.queued_bytes == 0
+    assert writer.written == 0
+
+
+class CollectingWriter:
+    def __init__(self):
+        self.records = []
+
+    def submit(self, captured):
+        self.records.append(captured)
+
+
+async def test_large_bodies_are_truncated():
+    config = CaptureConfig(enabled=True, sample_rate=1.0, max_body_bytes=10)
+    writer = CollectingWriter()
+    received = []
+
+    async def app(scope, receive, send):
+        while True:
+            message = await receive()
+            received.append(message["body"])
+            if not message.get("more_body"):
+                break
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    messages = iter([
+        {"type": "http.request", "body": b"12345", "more_body": True},
+        {"type": "http.request", "body": b"67890", "more_body": True},
+        {"type": "http.request", "body": b"abc", "more_body": False},
+    ])
+
+    async def receive():
+        return next(messages)
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "POST", "path": "/api/mcp/voice/audio", "headers": []}
+    await TrafficCaptureMiddleware(app, config, writer)(scope, receive, send)
+
+    # The app still sees the whole body; only the capture is cut short
+    assert b"".join(received) == b"1234567890abc"
+    (captured,) = writer.records
+    assert captured["raw_body"] == b"1234567890"
+    assert captured["truncated"]
+    assert captured["status"] == 204
+
+
+def test_capture_limits_from_environment(monkeypatch):
+    assert get_capture_config().max_body_bytes == 4 * 1024 * 1024
+    monkeypatch.setenv("TRAFFIC_CAPTURE_MAX_BODY_BYTES", "1024")
+    monkeypatch.setenv("TRAFFIC_CAPTURE_MAX_QUEUED_BYTES", "4096")
+    config = get_capture_config()
+    assert (config.max_body_bytes, config.max_queued_bytes) == (1024, 4096)
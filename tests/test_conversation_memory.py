@@ -0,0 +1,130 @@
+"""Tests for the hybrid buffer/summary conversation memory"""
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+
+from backend.app.mcp.integrations import conversation_memory  # noqa: E402
+from backend.app.mcp.integrations.conversation_memory import create_hybrid_memory  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # One token per word keeps budgets exact and avoids fetching a BPE file
+    monkeypatch.setattr(conversation_memory, "count_tokens", lambda text: len(text.split()))
+
+
+def make_memory(max_token_limit=10, responses=("first summary", "second summary")):
+    return create_hybrid_memory(FakeListChatModel(responses=list(responses)), max_token_limit)
+
+
+def turn(memory, user, ai):
+    memory.save_context({"input": user}, {"response": ai})
+
+
+def test_turns_within_budget_stay_verbatim():
+    memory = make_memory()
+    turn(memory, "hello there", "hi")
+    assert not memory.needs_summary
+    assert memory.load_memory_variables({})["history"] == "Human: hello there\nAI: hi"
+
+
+def test_old_turns_move_to_pending_past_the_budget():
+    memory = make_memory(max_token_limit=5)
+    turn(memory, "one two three", "four five")
+    turn(memory, "six seven", "eight nine")
+    assert memory.needs_summary
+    assert [m.content for m in memory.pending] == ["one two three", "four five"]
+    assert [m.content for m in memory.chat_memory.messages] == ["six seven", "eight nine"]
+
+
+def test_latest_exchange_is_kept_however_large():
+    memory = make_memory(max_token_limit=2)
+    turn(memory, "a b c d e", "f g h i j")
+    assert not memory.pending
+    assert len(memory.chat_memory.messages) == 2
+
+
+def test_summarize_pending_folds_into_summary():
+    memory = make_memory(max_token_limit=4)
+    turn(memory, "one two", "three four")
+    turn(memory, "five six", "seven eight")
+    assert memory.summarize_pending()
+    assert memory.summary == "first summary"
+    assert not memory.needs_summary
+    history = memory.load_memory_variables({})["history"]
+    assert history.startswith("Summary of the earlier conversation: first summary\n")
+    assert history.endswith("Human: five six\nAI: seven eight")
+    assert not memory.summarize_pending()
+
+
+def test_pending_is_bounded_when_summaries_fall_behind():
+    memory = make_memory(max_token_limit=2)
+    memory.max_pending_messages = 3
+    for i in range(4):
+        turn(memory, f"q{i}", f"a{i}")
+    assert [m.content for m in memory.pending] == ["a1", "q2", "a2"]
+
+
+def test_clear_resets_summary_and_pending():
+    memory = make_memory(max_token_limit=2)
+    turn(memory, "one", "two")
+    turn(memory, "three", "four")
+    memory.summarize_pending()
+    memory.clear()
+    assert memory.summary == ""
+    assert memory.pending == []
+    assert memory.load_memory_variables({})["history"] == ""
+
+
+def test_stale_summary_is_not_applied():
+    memory = make_memory(max_token_limit=2)
+    memory.max_pending_messages = 2
+    turn(memory, "one", "two")
+    turn(memory, "three", "four")
+    batch, summary = memory.pending_snapshot()
+    # More turns push the snapshotted messages out of the bounded pending list
+    turn(memory, "five", "six")
+    assert not memory.apply_summary(batch, summary, "stale")
+    assert memory.summary == ""
+
+
+async def test_turns_do_not_wait_for_a_running_summary(monkeypatch):
+    import asyncio
+    import time
+
+    from backend.app.mcp.integrations.conversation_memory import HybridConversationMemory
+    from backend.app.mcp.integrations.langchain_enhanced import EnhancedLangChainService
+    from backend.app.mcp.models import LangChainConfig
+
+    summaries = []
+
+    def slow_summary(self, batch, summary):
+        time.sleep(0.5)
+        summaries.append(len(batch))
+        return f"summary of {len(batch)}"
+
+    monkeypatch.setattr(HybridConversationMemory, "summarize", slow_summary)
+    service = EnhancedLangChainService(LangChainConfig(memory_token_budget=4), "key")
+    service.llm = FakeListChatModel(responses=["a reply of several words"])
+    session_id = await service.create_conversation_session("u1")
+
+    await service.continue_conversation(session_id, "first question here")
+    await service.continue_conversation(session_id, "second question here")
+    assert session_id in service._summary_tasks
+    await asyncio.sleep(0.1)
+
+    started = time.perf_counter()
+    await service.continue_conversation(session_id, "third question here")
+    assert time.perf_counter() - started < 0.3
+
+    while session_id in service._summary_tasks:
+        await service._summary_tasks[session_id]
+    session = service.sessions.get(session_id)
+    assert not session.memory.pending
+    # The first result was overtaken by the third turn and redone with its messages
+    assert summaries[-1] > summaries[0]
+    assert session.memory.summary == f"summary of {summaries[-1]}"
+    assert (await service.backend.load("conversation", session_id))["s"] == session.memory.summary
@@ -0,0 +1,172 @@
+"""Tests for streamed conversation turns and their SSE endpoint"""
+
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("jwt")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+
+from backend.app.auth.router import get_current_user  # noqa: E402
+from backend.app.mcp import router  # noqa: E402
+from backend.app.mcp.integrations.langchain_enhanced import EnhancedLangChainService  # noqa: E402
+from backend.app.mcp.models import LangChainConfig  # noqa: E402
+
+
+class ConversationOnlyService:
+    """Just enough of EnhancedMCPService for the streaming endpoint"""
+
+    riva_service = None
+
+    def __init__(self, langchain_service):
+        self.langchain_service = langchain_service
+
+    async def get_session(self, session_id):
+        return await self.langchain_service.has_session(session_id)
+
+    def stream_conversation(self, session_id, message):
+        return self.langchain_service.stream_conversation(session_id, message)
+
+
+def make_service(reply="hello world", sleep=None):
+    service = EnhancedLangChainService(LangChainConfig(), "key")
+    service.llm = FakeListChatModel(responses=[reply], sleep=sleep)
+    return service
+
+
+async def history(service, session_id):
+    return await service.get_session_history(session_id)
+
+
+def sse_events(body):
+    frames = body.split("\n\n")
+    assert frames[-1] == ""
+    events = []
+    for frame in frames[:-1]:
+        assert frame.startswith("data: ") and "\n" not in frame
+        events.append(json.loads(frame[len("data: "):]))
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch):
+    service = make_service()
+    monkeypatch.setattr(router, "enhanced_mcp_service", ConversationOnlyService(service))
+    app = FastAPI()
+    app.include_router(router.mcp_router)
+    app.dependency_overrides[get_current_user] = lambda: {"user_id": "u1"}
+    with TestClient(app) as client:
+        yield client, service
+
+
+async def test_completed_stream_commits_the_turn():
+    service = make_service()
+    session_id = await service.create_conversation_session("u1")
+
+    chunks = [chunk async for chunk in service.stream_conversation(session_id, "hi")]
+
+    assert "".join(chunks) == "hello world"
+    assert len(chunks) > 1
+    assert await history(service, session_id) == [
+        {"role": "human", "content": "hi"},
+        {"role": "ai", "content": "hello world"},
+    ]
+    assert await service.backend.load("conversation", session_id)
+
+
+async def test_closing_the_stream_early_discards_the_turn():
+    service = make_service()
+    session_id = await service.create_conversation_session("u1")
+    saved = await service.backend.load("conversation", session_id)
+
+    stream = service.stream_conversation(session_id, "hi")
+    assert await stream.__anext__() == "h"
+    await stream.aclose()
+
+    assert await history(service, session_id) == []
+    assert await service.backend.load("conversation", session_id) == saved
+    # The turn lock was released, so the next turn goes through
+    assert "".join([chunk async for chunk in service.stream_conversation(session_id, "again")]) == "hello world"
+    assert [entry["content"] for entry in await history(service, session_id)] == ["again", "hello world"]
+
+
+async def test_cancelling_mid_stream_discards_the_turn():
+    service = make_service(sleep=0.05)
+    session_id = await service.create_conversation_session("u1")
+    received = []
+
+    async def consume():
+        async for chunk in service.stream_conversation(session_id, "hi"):
+            received.append(chunk)
+
+    task = asyncio.create_task(consume())
+    while len(received) < 2:
+        await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert await history(service, session_id) == []
+
+
+async def test_stream_for_unknown_session_fails():
+    service = make_service()
+    with pytest.raises(ValueError):
+        async for _ in service.stream_conversation("missing", "hi"):
+            pass
+
+
+def test_endpoint_frames_chunks_then_done(client):
+    client, service = client
+    session_id = asyncio.run(service.create_conversation_session("u1"))
+
+    response = client.post(f"/session/{session_id}/continue/stream", params={"message": "hi"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    events = sse_events(response.text)
+    assert "".join(event["chunk"] for event in events[:-1]) == "hello world"
+    assert events[-1] == {"done": True, "response": "hello world"}
+    assert len(asyncio.run(history(service, session_id))) == 2
+
+
+def test_endpoint_reports_errors_as_an_event(client, monkeypatch):
+    client, service = client
+    session_id = asyncio.run(service.create_conversation_session("u1"))
+
+    async def failing_stream(*args, **kwargs):
+        raise RuntimeError("model unavailable")
+        yield
+
+    monkeypatch.setattr(service.llm.__class__, "astream", failing_stream)
+    response = client.post(f"/session/{session_id}/continue/stream", params={"message": "hi"})
+
+    assert sse_events(response.text) == [{"error": "model unavailable"}]
+    assert asyncio.run(history(service, session_id)) == []
+
+
+def test_endpoint_rejects_unknown_session(client):
+    client, _ = client
+    response = client.post("/session/missing/continue/stream", params={"message": "hi"})
+    assert response.status_code == 404
+
+
+async def test_endpoint_disconnect_discards_the_partial_turn(monkeypatch):
+    service = make_service()
+    monkeypatch.setattr(router, "enhanced_mcp_service", ConversationOnlyService(service))
+    session_id = await service.create_conversation_session("u1")
+
+    response = await router.stream_conversation(session_id, "hi", current_user={"user_id": "u1"})
+    body = response.body_iterator
+    first = await body.__anext__()
+    assert json.loads(first[len("data: "):]) == {"chunk": "h"}
+    # Starlette closes the body iterator when the client goes away
+    await body.aclose()
+
+    assert await history(service, session_id) == []
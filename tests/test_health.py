@@ -0,0 +1,112 @@
+"""Tests for background health monitoring"""
+
+import asyncio
+import sys
+
+import pytest
+
+from backend.app.health import (
+    DISABLED,
+    HEALTHY,
+    UNHEALTHY,
+    HealthConfig,
+    HealthMonitor,
+    SchedulerProbe,
+)
+
+
+async def healthy():
+    return {"status": HEALTHY, "version": "1"}
+
+
+async def failing():
+    raise RuntimeError("connection refused")
+
+
+async def hanging():
+    await asyncio.sleep(30)
+
+
+class ClosingProbe:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.closed = False
+
+    async def __call__(self):
+        return {"status": HEALTHY}
+
+    async def close(self):
+        self.closed = True
+        if self.fail:
+            raise RuntimeError("already closed")
+
+
+async def test_results_are_cached_per_probe():
+    monitor = HealthMonitor(HealthConfig(timeout=0.05, critical_probes=["database"]))
+    monitor.register("database", healthy)
+    monitor.register("llm", failing)
+    monitor.register("riva", hanging)
+    await monitor.run_once()
+
+    services = monitor.snapshot()["services"]
+    assert services["database"]["status"] == HEALTHY
+    assert services["database"]["version"] == "1"
+    assert services["llm"]["status"] == UNHEALTHY
+    assert services["llm"]["error"] == "connection refused"
+    assert services["riva"]["error"].startswith("timed out")
+    assert monitor.snapshot()["status"] == "degraded"
+    assert monitor.readiness()[0]
+
+
+async def test_failing_critical_probe_is_not_ready():
+    monitor = HealthMonitor(HealthConfig(critical_probes=["database"]))
+    monitor.register("database", failing)
+    assert not monitor.readiness()[0]  # no round yet
+    await monitor.run_once()
+    ready, details = monitor.readiness()
+    assert not ready
+    assert details["failing"] == ["database"]
+    assert monitor.snapshot()["status"] == UNHEALTHY
+
+
+async def test_stop_closes_probes_that_hold_connections():
+    monitor = HealthMonitor(HealthConfig(interval=0.01))
+    probe, broken = ClosingProbe(), ClosingProbe(fail=True)
+    monitor.register("scheduler", probe)
+    monitor.register("broken", broken)
+    monitor.register("plain", healthy)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    assert monitor.liveness()[0]
+
+    await monitor.stop()
+    assert probe.closed and broken.closed
+    assert not monitor.liveness()[0]
+
+
+async def test_scheduler_probe_without_redis_client(monkeypatch):
+    monkeypatch.setitem(sys.modules, "redis.asyncio", None)
+    assert await SchedulerProbe("redis://localhost:6379/0")() == {"status": DISABLED,
+                                                                 "message": "redis client not installed"}
+
+
+async def test_scheduler_probe_reuses_one_client(monkeypatch):
+    aioredis = pytest.importorskip("redis.asyncio")
+    fakeredis = pytest.importorskip("fakeredis")
+    clients = []
+
+    def from_url(url, **kwargs):
+        clients.append(fakeredis.FakeAsyncRedis())
+        return clients[-1]
+
+    monkeypatch.setattr(aioredis, "from_url", from_url)
+    monitor = HealthMonitor(HealthConfig(interval=0.01))
+    probe = SchedulerProbe("redis://localhost:6379/0")
+    monitor.register("scheduler", probe)
+    for _ in range(5):
+        await monitor.run_once()
+    assert monitor.results["scheduler"].status == HEALTHY
+    assert len(clients) == 1
+
+    await monitor.stop()
+    assert probe.client is None
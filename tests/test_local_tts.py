@@ -0,0 +1,151 @@
+"""Tests for the WAV helpers and the local speech fallback"""
+
+import struct
+import sys
+import textwrap
+
+import pytest
+
+from backend.app.mcp import audio
+from backend.app.mcp.audio import silence, wav_header, wav_pcm
+from backend.app.mcp.local_tts import MAX_SILENCE_SECONDS, EspeakSynthesizer, estimated_silence
+
+
+def riff(*chunks):
+    body = b"WAVE" + b"".join(chunks)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def chunk(chunk_id, data, size=None):
+    padding = b"\0" * (len(data) % 2)
+    return chunk_id + struct.pack("<I", len(data) if size is None else size) + data + padding
+
+
+def fmt(sample_rate=16000, channels=1, bits=16):
+    block = channels * bits // 8
+    return chunk(b"fmt ", struct.pack("<HHIIHH", 1, channels, sample_rate, sample_rate * block, block, bits))
+
+
+def test_silence_views_share_one_buffer(monkeypatch):
+    monkeypatch.setattr(audio, "_silence", b"")
+    short = silence(100)
+    long = silence(1000)
+    again = silence(600)
+    assert len(short) == 100 and len(long) == 1000 and len(again) == 600
+    assert not any(long)
+    assert long.readonly
+    assert again.obj is long.obj
+    # Only growing past the buffer allocates a new one
+    assert short.obj is not long.obj
+    assert len(silence(1001)) == 1000
+
+
+def test_silence_is_whole_samples():
+    assert len(silence(7)) == 6
+    assert len(silence(0)) == 0
+
+
+def test_estimated_silence_is_capped(monkeypatch):
+    monkeypatch.setattr(audio, "_silence", b"")
+    sample_rate = 16000
+    assert len(estimated_silence("", sample_rate)) == 0
+    assert 0 < len(estimated_silence("a few words", sample_rate)) < 2 * sample_rate * MAX_SILENCE_SECONDS
+    capped = estimated_silence("word " * 10000, sample_rate)
+    assert len(capped) == int(MAX_SILENCE_SECONDS * sample_rate) * 2
+    assert len(audio._silence) <= 2 * len(capped)
+
+
+def test_wav_pcm_round_trips_wav_header():
+    pcm = bytes(range(200))
+    samples, rate = wav_pcm(wav_header(len(pcm), 22050) + pcm)
+    assert rate == 22050
+    assert samples == pcm
+    assert isinstance(samples, memoryview)
+
+
+def test_wav_pcm_skips_other_chunks_and_odd_padding():
+    wav = riff(fmt(8000), chunk(b"LIST", b"odd"), chunk(b"data", b"\1\2\3\4"))
+    samples, rate = wav_pcm(wav)
+    assert (bytes(samples), rate) == (b"\1\2\3\4", 8000)
+
+
+def test_wav_pcm_drops_a_trailing_half_sample():
+    samples, _ = wav_pcm(riff(fmt(), chunk(b"data", b"\1\2\3")))
+    assert bytes(samples) == b"\1\2"
+
+
+def test_wav_pcm_tolerates_an_oversized_data_length():
+    # Encoders writing to a pipe cannot seek back, so they leave the length at its maximum
+    wav = riff(fmt()) + b"data" + struct.pack("<I", 0xFFFFFFFF) + b"\5\6\7\10\11"
+    samples, _ = wav_pcm(wav)
+    assert bytes(samples) == b"\5\6\7\10"
+
+
+@pytest.mark.parametrize("wav, message", [
+    (b"not a wav file at all", "Not a WAV"),
+    (riff(chunk(b"data", b"\0\0")), "before its fmt"),
+    (riff(fmt()), "no data chunk"),
+    (riff(fmt(channels=2), chunk(b"data", b"\0\0")), "16-bit mono"),
+    (riff(fmt(bits=8), chunk(b"data", b"\0\0")), "16-bit mono"),
+])
+def test_wav_pcm_rejects_malformed_files(wav, message):
+    with pytest.raises(ValueError, match=message):
+        wav_pcm(wav)
+
+
+def fake_espeak(tmp_path, body):
+    script = tmp_path / "espeak-ng"
+    script.write_text(f"#!{sys.executable}\nimport struct, sys\n" + textwrap.dedent(body))
+    script.chmod(0o755)
+    return str(script)
+
+
+async def test_espeak_output_is_read_from_stdout(tmp_path):
+    executable = fake_espeak(tmp_path, """
+        text = sys.stdin.read()
+        with open(sys.argv[0] + ".args", "w") as args:
+            args.write(" ".join(sys.argv[1:]) + "|" + text)
+        pcm = b"\\1\\0" * 50
+        header = struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 0xFFFFFFFF, b"WAVE", b"fmt ", 16, 1, 1,
+                             22050, 44100, 2, 16, b"data", 0xFFFFFFFF)
+        sys.stdout.buffer.write(header + pcm)
+    """)
+    synthesizer = EspeakSynthesizer(executable)
+    assert synthesizer.available
+
+    pcm = await synthesizer.synthesize("-v hello", "en-US", "English-US.Female-1", 22050, speaking_rate=2.0)
+
+    assert bytes(pcm) == b"\1\0" * 50
+    args, text = open(executable + ".args").read().split("|")
+    assert args == "--stdout --stdin -v en-us+f3 -s 350"
+    assert text == "-v hello"
+
+    resampled = await synthesizer.synthesize("hello", "en-US", "English-US.Male-1", 11025)
+    assert abs(len(resampled) - 50) <= 2
+
+
+async def test_espeak_failure_raises_with_its_stderr(tmp_path):
+    executable = fake_espeak(tmp_path, """
+        sys.stderr.write("unknown voice\\n")
+        sys.exit(3)
+    """)
+    with pytest.raises(RuntimeError, match="exited with status 3: unknown voice"):
+        await EspeakSynthesizer(executable).synthesize("hello", "xx", "voice", 22050)
+
+
+async def test_espeak_timeout_kills_the_process(tmp_path):
+    import asyncio
+
+    executable = fake_espeak(tmp_path, """
+        import time
+        time.sleep(30)
+    """)
+    with pytest.raises(asyncio.TimeoutError):
+        await EspeakSynthesizer(executable, timeout=0.2).synthesize("hello", "en", "voice", 22050)
+
+
+def test_missing_espeak_is_unavailable(monkeypatch):
+    from backend.app.mcp import local_tts
+
+    monkeypatch.setattr(local_tts.shutil, "which", lambda name: None)
+    assert not EspeakSynthesizer().available
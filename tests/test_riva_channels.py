@@ -0,0 +1,90 @@
+"""Tests for the pooled Riva gRPC channels"""
+
+import socket
+from concurrent import futures
+
+import pytest
+
+grpc = pytest.importorskip("grpc")
+pytest.importorskip("riva.client")
+
+from backend.app.mcp.integrations import riva_channels  # noqa: E402
+from backend.app.mcp.integrations.riva_channels import RivaChannelPool  # noqa: E402
+
+# grpc's connectivity poller thread can race Channel.close() and log "Channel closed!"
+pytestmark = pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def server():
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    yield f"127.0.0.1:{port}"
+    server.stop(0)
+
+
+@pytest.fixture
+def ready_futures(monkeypatch):
+    """Every channel_ready_future created by the pool"""
+    created = []
+    original = grpc.channel_ready_future
+
+    def tracking(channel):
+        future = original(channel)
+        created.append(future)
+        return future
+
+    monkeypatch.setattr(riva_channels.grpc, "channel_ready_future", tracking)
+    return created
+
+
+async def test_wait_ready_connects_every_channel(server):
+    pool = RivaChannelPool(server, size=3)
+    try:
+        assert await pool.wait_ready(5) == {"channels": 3, "ready_channels": 3}
+        assert all(channel.ready for channel in pool.channels)
+        assert {stat["state"] for stat in pool.stats()} == {"READY"}
+        assert pool.pick().ready
+    finally:
+        pool.close()
+
+
+async def test_wait_ready_skips_channels_already_ready(server, ready_futures):
+    pool = RivaChannelPool(server, size=2)
+    try:
+        await pool.wait_ready(5)
+        ready_futures.clear()
+        await pool.wait_ready(5)
+        assert ready_futures == []
+    finally:
+        pool.close()
+
+
+async def test_timed_out_waits_release_their_futures(ready_futures):
+    pool = RivaChannelPool(f"127.0.0.1:{unused_port()}", size=2)
+    try:
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                await pool.wait_ready(0.1)
+        assert len(ready_futures) == 6
+        assert all(future.cancelled() for future in ready_futures)
+    finally:
+        pool.close()
+
+
+async def test_round_robin_call_tracks_in_flight(server):
+    pool = RivaChannelPool(server, size=2)
+    try:
+        await pool.wait_ready(5)
+        names = [await pool.call("probe", lambda channel: (channel.name, channel.in_flight)) for _ in range(4)]
+        assert sorted(names) == [("0", 1), ("0", 1), ("1", 1), ("1", 1)]
+        assert all(channel.in_flight == 0 for channel in pool.channels)
+    finally:
+        pool.close()
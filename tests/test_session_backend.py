@@ -0,0 +1,146 @@
+"""Tests for the shared session persistence backends"""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from backend.app.mcp.session_backend import (
+    COMPRESS_THRESHOLD,
+    MemorySessionBackend,
+    RedisSessionBackend,
+    SessionConflictError,
+    SQLiteSessionBackend,
+    create_session_backend,
+    decode_record,
+    encode_record,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+async def backend(request, tmp_path):
+    if request.param == "memory":
+        backend = MemorySessionBackend()
+    elif request.param == "sqlite":
+        backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+    else:
+        pytest.importorskip("redis")
+        fakeredis = pytest.importorskip("fakeredis")
+        backend = RedisSessionBackend("redis://localhost:6379/0", prefix="test:")
+        backend.client = fakeredis.FakeAsyncRedis()
+    yield backend
+    await backend.close()
+
+
+@pytest.mark.parametrize("record,prefix", [
+    ({"id": "s1", "messages": []}, b"j"),
+    ({"id": "s1", "messages": ["x" * 50] * (COMPRESS_THRESHOLD // 10)}, b"z"),
+])
+def test_record_encoding_round_trip(record, prefix):
+    data = encode_record(record)
+    assert data[:1] == prefix
+    assert decode_record(data) == record
+
+
+async def test_save_load_round_trip(backend):
+    record = {"id": "s1", "v": "a", "turns": [{"user": "hi", "ai": "hello"}] * 40}
+    await backend.save("conversation", "s1", "u1", record, ttl=60)
+    assert await backend.load("conversation", "s1") == record
+    assert await backend.load("mcp", "s1") is None
+    assert await backend.load("conversation", "missing") is None
+
+
+async def test_user_index_and_load_many(backend):
+    await backend.save("mcp", "a", "u1", {"id": "a"}, ttl=60)
+    await asyncio.sleep(0.01)
+    await backend.save("mcp", "b", "u1", {"id": "b"}, ttl=60)
+    await backend.save("mcp", "c", "u2", {"id": "c"}, ttl=60)
+    assert await backend.user_session_ids("mcp", "u1") == ["a", "b"]
+    records = await backend.load_many("mcp", ["a", "missing", "b"])
+    assert [record["id"] for record in records] == ["a", "b"]
+
+
+async def test_delete_removes_record_and_index_entry(backend):
+    await backend.save("mcp", "a", "u1", {"id": "a"}, ttl=60)
+    await backend.save("mcp", "b", "u1", {"id": "b"}, ttl=60)
+    await backend.delete("mcp", "a", "u1")
+    assert await backend.load("mcp", "a") is None
+    assert await backend.user_session_ids("mcp", "u1") == ["b"]
+
+
+async def test_compare_and_save(backend):
+    await backend.save("conversation", "s1", "u1", {"v": "a", "n": 1}, ttl=60)
+    assert await backend.compare_and_save("conversation", "s1", "u1", {"v": "b", "n": 2}, 60, "a")
+    # A writer that read version "a" lost the race
+    assert not await backend.compare_and_save("conversation", "s1", "u1", {"v": "c", "n": 3}, 60, "a")
+    assert await backend.load("conversation", "s1") == {"v": "b", "n": 2}
+    assert not await backend.compare_and_save("conversation", "missing", "u1", {"v": "b"}, 60, "a")
+    assert await backend.load("conversation", "missing") is None
+
+
+async def test_expired_records_are_gone(backend):
+    if backend.name == "redis":
+        pytest.skip("Redis expiry is native and whole-second")
+    await backend.save("mcp", "a", "u1", {"id": "a", "v": "a"}, ttl=-1)
+    assert await backend.load("mcp", "a") is None
+    assert await backend.user_session_ids("mcp", "u1") == []
+    assert not await backend.compare_and_save("mcp", "a", "u1", {"v": "b"}, 60, "a")
+    await backend.purge_expired()
+
+
+async def test_sqlite_adds_version_column_to_old_databases(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE sessions (kind TEXT NOT NULL, id TEXT NOT NULL, user_id TEXT NOT NULL,"
+        " data BLOB NOT NULL, expires_at REAL NOT NULL, updated_at REAL NOT NULL,"
+        " PRIMARY KEY (kind, id))"
+    )
+    conn.close()
+    backend = SQLiteSessionBackend(path)
+    await backend.save("conversation", "s1", "u1", {"v": "a"}, ttl=60)
+    assert await backend.compare_and_save("conversation", "s1", "u1", {"v": "b"}, 60, "a")
+
+
+def test_create_session_backend(tmp_path, monkeypatch):
+    assert isinstance(create_session_backend("memory"), MemorySessionBackend)
+    assert isinstance(create_session_backend("bogus"), MemorySessionBackend)
+    monkeypatch.setenv("MCP_SESSION_SQLITE_PATH", str(tmp_path / "s.db"))
+    assert isinstance(create_session_backend("sqlite"), SQLiteSessionBackend)
+
+
+async def test_concurrent_turns_from_two_workers_conflict(tmp_path):
+    pytest.importorskip("langchain")
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    from backend.app.mcp.integrations.langchain_enhanced import EnhancedLangChainService
+    from backend.app.mcp.models import LangChainConfig
+
+    def worker(backend):
+        service = EnhancedLangChainService(LangChainConfig(), "key", backend=backend)
+        service.llm = FakeListChatModel(responses=["reply"] * 20, sleep=0.05)
+        return service
+
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+    first, second = worker(backend), worker(backend)
+    session_id = await first.create_conversation_session("u1")
+
+    # Sequential turns on different workers see each other's history
+    await second.continue_conversation(session_id, "one")
+    await first.continue_conversation(session_id, "two")
+    assert len(await second.get_session_history(session_id)) == 4
+
+    results = await asyncio.gather(
+        first.continue_conversation(session_id, "x"),
+        second.continue_conversation(session_id, "y"),
+        return_exceptions=True,
+    )
+    assert sum(isinstance(result, SessionConflictError) for result in results) == 1
+    assert len(await first.get_session_history(session_id)) == 6
+
+    # Turns on one worker queue behind each other instead of conflicting
+    await asyncio.gather(
+        first.continue_conversation(session_id, "p"),
+        first.continue_conversation(session_id, "q"),
+    )
+    assert len(await second.get_session_history(session_id)) == 10
@@ -0,0 +1,161 @@
+"""Tests for the bounded in-process session store"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from backend.app.mcp import session_store
+from backend.app.mcp.session_store import SessionStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(session_store, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def make_store(**kwargs):
+    evicted = []
+    kwargs.setdefault("size_of", lambda value: 100)
+    store = SessionStore("test", on_evict=lambda sid, value, reason: evicted.append((sid, reason)), **kwargs)
+    return store, evicted
+
+
+def test_put_get_remove(clock):
+    store, _ = make_store()
+    store.put("s1", "u1", "one")
+    assert store.get("s1") == "one"
+    assert "s1" in store
+    assert store.remove("s1") == "one"
+    assert store.get("s1") is None
+    assert store.stats()["approx_bytes"] == 0
+
+
+def test_idle_sessions_expire(clock):
+    store, evicted = make_store(idle_ttl=60)
+    store.put("s1", "u1", "one")
+    store.put("s2", "u1", "two")
+    clock.now += 30
+    assert store.get("s2") == "two"
+    clock.now += 45
+    assert store.get("s1") is None
+    assert store.get("s2") == "two"
+    assert evicted == [("s1", "idle_ttl")]
+
+
+def test_sweep_reaps_expired(clock):
+    store, evicted = make_store(idle_ttl=10)
+    store.put("s1", "u1", "one")
+    clock.now += 11
+    store.sweep()
+    assert len(store) == 0
+    assert store.list_user("u1") == []
+    assert evicted == [("s1", "idle_ttl")]
+
+
+def test_per_user_limit_evicts_oldest(clock):
+    store, evicted = make_store(max_per_user=2)
+    store.put("a", "u1", 1)
+    store.put("b", "u1", 2)
+    store.put("x", "u2", 9)
+    store.put("c", "u1", 3)
+    assert store.list_user_items("u1") == [("b", 2), ("c", 3)]
+    assert store.list_user("u2") == [9]
+    assert evicted == [("a", "per_user_limit")]
+
+
+def test_replacing_a_session_does_not_count_twice(clock):
+    store, evicted = make_store(max_per_user=1)
+    store.put("a", "u1", 1)
+    store.put("a", "u1", 2)
+    assert store.get("a") == 2
+    assert evicted == []
+    assert store.stats()["approx_bytes"] == 100
+
+
+def test_memory_limit_evicts_least_recently_used(clock):
+    store, evicted = make_store(max_bytes=250)
+    store.put("a", "u1", 1)
+    store.put("b", "u2", 2)
+    store.get("a")
+    store.put("c", "u3", 3)
+    assert store.get("b") is None
+    assert store.get("a") == 1
+    assert store.get("c") == 3
+    assert evicted == [("b", "memory")]
+    assert store.stats()["approx_bytes"] == 200
+
+
+def test_resize_enforces_memory_limit_but_keeps_the_growing_session(clock):
+    sizes = {"a": 100, "b": 100}
+    store, evicted = make_store(max_bytes=250, size_of=lambda value: sizes[value])
+    store.put("a", "u1", "a")
+    store.put("b", "u2", "b")
+    store.get("b")
+    sizes["b"] = 200
+    store.resize("b")
+    assert store.get("b") == "b"
+    assert store.get("a") is None
+    assert evicted == [("a", "memory")]
+
+
+def test_failing_eviction_hook_does_not_break_put(clock):
+    def on_evict(session_id, value, reason):
+        raise RuntimeError("boom")
+
+    store = SessionStore("test", max_per_user=1, size_of=lambda value: 1, on_evict=on_evict)
+    store.put("a", "u1", 1)
+    store.put("b", "u1", 2)
+    assert store.list_user("u1") == [2]
+
+
+def test_estimate_model_size_falls_back():
+    assert session_store.estimate_model_size(object()) == 1024
+
+
+@pytest.mark.parametrize("max_per_user", [0, -1])
+def test_per_user_limit_must_allow_a_session(max_per_user):
+    with pytest.raises(ValueError, match="max_per_user"):
+        SessionStore("test", max_per_user=max_per_user)
+
+
+def test_config_rejects_a_zero_session_limit():
+    from pydantic import ValidationError
+
+    from backend.app.mcp.models import GeminiConfig, LangChainConfig, MCPConfig, RivaConfig
+
+    parts = dict(gemini=GeminiConfig(api_key="k"), langchain=LangChainConfig(), riva=RivaConfig(server_url="x"))
+    assert MCPConfig(max_sessions_per_user=1, **parts).max_sessions_per_user == 1
+    with pytest.raises(ValidationError):
+        MCPConfig(max_sessions_per_user=0, **parts)
+
+
+@pytest.mark.parametrize("limit, kept", [(1, ["s3"]), (2, ["s2", "s3"]), (5, ["s1", "s2", "s3"])])
+async def test_service_trims_sessions_past_the_limit(limit, kept):
+    from backend.app.mcp.service_enhanced import EnhancedMCPService
+    from backend.app.mcp.session_backend import MemorySessionBackend
+
+    backend = MemorySessionBackend()
+    for session_id in ("s1", "s2", "s3"):
+        await backend.save("mcp", session_id, "u1", {"id": session_id}, ttl=60)
+    await backend.save("mcp", "other", "u2", {"id": "other"}, ttl=60)
+    service = SimpleNamespace(
+        config=SimpleNamespace(max_sessions_per_user=limit),
+        session_backend=backend,
+        sessions=SessionStore("mcp"),
+        langchain_service=None,
+    )
+
+    await EnhancedMCPService._enforce_session_limit(service, "u1")
+
+    assert await backend.user_session_ids("mcp", "u1") == kept
+    assert await backend.user_session_ids("mcp", "u2") == ["other"]
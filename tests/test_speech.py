@@ -0,0 +1,118 @@
+"""Tests for TTS sentence splitting and speech normalization"""
+
+import pytest
+
+from backend.app.mcp.speech import (
+    SentenceSplitter,
+    SpeechNormalizer,
+    normalize_for_speech,
+    speak_identifier,
+    split_sentences,
+)
+
+
+def test_split_on_terminal_punctuation_and_line_breaks():
+    assert split_sentences("First one. Second one! Third?\nFourth line") == [
+        "First one.", "Second one!", "Third?", "Fourth line"
+    ]
+
+
+def test_abbreviations_do_not_end_a_sentence():
+    assert split_sentences("Use a list, e.g. a deque. Then stop.") == [
+        "Use a list, e.g. a deque.", "Then stop."
+    ]
+
+
+def test_closing_quotes_stay_with_their_sentence():
+    assert split_sentences('He said "done." Next.') == ['He said "done."', "Next."]
+
+
+def test_decimal_points_are_not_boundaries():
+    assert split_sentences("Version 3.11 is out. Yes.") == ["Version 3.11 is out.", "Yes."]
+
+
+def test_sentences_complete_as_chunks_arrive():
+    splitter = SentenceSplitter()
+    assert splitter.feed("Hello wor") == []
+    assert splitter.feed("ld. How are") == ["Hello world."]
+    assert splitter.feed(" you? I am") == ["How are you?"]
+    assert splitter.flush() == ["I am"]
+    assert splitter.flush() == []
+
+
+def test_boundary_split_across_chunks():
+    splitter = SentenceSplitter()
+    assert splitter.feed("Done.") == []
+    assert splitter.feed(" Next") == ["Done."]
+
+
+@pytest.mark.parametrize("max_chars", [10, 25])
+def test_long_runs_are_cut_at_word_breaks(max_chars):
+    text = " ".join(["word"] * 30)
+    splitter = SentenceSplitter(max_chars=max_chars)
+    pieces = splitter.feed(text) + splitter.flush()
+    assert all(len(piece) <= max_chars for piece in pieces)
+    assert " ".join(pieces).split() == text.split()
+
+
+def test_text_without_spaces_is_cut_hard():
+    assert split_sentences("x" * 25, max_chars=10) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_blank_input_yields_nothing():
+    assert split_sentences("  \n\n ") == []
+
+
+@pytest.mark.parametrize("text,spoken", [
+    ("Call `parse_http_response` then **check** the [docs](http://x.y).",
+     "Call parse http response then check the docs."),
+    ("See https://example.com/a for more.", "See a link for more."),
+    ("If x >= 10 && y != 3 then return.", "If x is at least 10 and y is not equal to 3 then return."),
+    ("Use getUserName() here.", "Use get user name here."),
+    ("Coverage is 95 % now.", "Coverage is 95 percent now."),
+    ("## Install steps", "Install steps."),
+    ("- first item\n- second item", "first item. second item."),
+])
+def test_prose_is_rewritten_for_the_ear(text, spoken):
+    assert normalize_for_speech(text) == spoken
+
+
+@pytest.mark.parametrize("identifier,spoken", [
+    ("parse_http_response", "parse http response"),
+    ("getUserName()", "get user name"),
+    ("x" * 41, "a code snippet"),
+])
+def test_speak_identifier(identifier, spoken):
+    assert speak_identifier(identifier) == spoken
+
+
+def test_code_blocks_are_summarized():
+    text = "Here:\n```python\nimport os\nprint(1)\n```\nDone."
+    assert normalize_for_speech(text) == (
+        "Here: There is a Python code block of 2 lines in the written answer. Done."
+    )
+
+
+def test_unclosed_code_block_is_summarized_on_flush():
+    assert normalize_for_speech("```js\nx()\n") == "There is a Js code block of 1 line in the written answer."
+
+
+def test_tables_are_summarized_without_the_header():
+    text = "| a | b |\n|---|---|\n| 1 | 2 |\n| 3 | 4 |\nAfter."
+    assert normalize_for_speech(text) == "There is a table with 2 rows in the written answer. After."
+
+
+def test_speech_is_capped_at_max_seconds():
+    text = " ".join(f"Sentence number {i} is here." for i in range(50))
+    assert normalize_for_speech(text, max_seconds=3) == (
+        "Sentence number 0 is here. The rest of the answer is in the written response."
+    )
+
+
+def test_normalizer_stays_silent_once_truncated():
+    normalizer = SpeechNormalizer(max_seconds=1)
+    assert normalizer.push("one two") == ["one two."]
+    assert normalizer.push("three four") == ["The rest of the answer is in the written response."]
+    assert normalizer.truncated
+    assert normalizer.push("five") == []
+    assert normalizer.flush() == []
@@ -0,0 +1,49 @@
+"""Tests for span tracing and exporter start-up"""
+
+import json
+import threading
+
+from backend.app import tracing
+from backend.app.tracing import SpanContext, Tracer, TracingConfig, get_tracing_config
+
+
+def exporter_threads():
+    return [thread for thread in threading.enumerate() if thread.name == "span-exporter"]
+
+
+def test_importing_starts_no_exporter(monkeypatch, tmp_path):
+    monkeypatch.delenv("TRACING_EXPORTER", raising=False)
+    assert get_tracing_config().exporter == "none"
+    assert isinstance(tracing.get_tracer().processor, tracing._NoopProcessor)
+    assert not exporter_threads()
+
+
+def test_file_exporter_writes_spans_once_started(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    tracer = Tracer(TracingConfig(exporter="file", file_path=str(path), sample_rate=1.0))
+    with tracer.span("before start"):
+        pass
+    tracer.start()
+    with tracer.span("request", kind="server", route="/x"):
+        with tracer.span("child"):
+            pass
+    tracer.shutdown()
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [span["name"] for span in spans] == ["child", "request"]
+    assert spans[0]["parent_span_id"] == spans[1]["span_id"]
+    assert spans[1]["attributes"] == {"route": "/x"}
+    assert not exporter_threads()
+
+
+def test_exporter_none_never_starts_a_thread():
+    tracer = Tracer(TracingConfig(exporter="none", sample_rate=1.0))
+    tracer.start()
+    assert isinstance(tracer.processor, tracing._NoopProcessor)
+
+
+def test_traceparent_round_trip():
+    context = SpanContext("a" * 32, "b" * 16, sampled=True)
+    assert SpanContext.from_traceparent(context.to_traceparent()) == context
+    assert SpanContext.from_traceparent("00-" + "0" * 32 + "-" + "b" * 16 + "-01") is None
+    assert SpanContext.from_traceparent("garbage") is None
@@ -0,0 +1,78 @@
+"""Tests for the two-tier TTS result cache"""
+
+import os
+
+from backend.app.mcp.tts_cache import TTSCache
+
+SETTINGS = {"voice": "English-US.Female-1", "language_code": "en-US", "sample_rate": 22050}
+
+
+def test_key_normalizes_whitespace_and_covers_settings():
+    key = TTSCache.key("Hello   world.\n", SETTINGS)
+    assert key == TTSCache.key("Hello world.", SETTINGS)
+    assert key != TTSCache.key("Hello world.", {**SETTINGS, "speaking_rate": 1.2})
+    assert key != TTSCache.key("Hello world.", {**SETTINGS, "voice": "other"})
+
+
+async def test_memory_round_trip():
+    cache = TTSCache()
+    assert await cache.get("k") is None
+    await cache.put("k", b"audio")
+    assert await cache.get("k") == b"audio"
+    await cache.put("empty", b"")
+    assert await cache.get("empty") is None
+
+
+async def test_memory_tier_evicts_least_recently_used():
+    cache = TTSCache(memory_max_bytes=1000)
+    for key in ("a", "b", "c"):
+        await cache.put(key, bytes(250))
+    await cache.get("a")
+    await cache.put("d", bytes(250))
+    await cache.put("e", bytes(250))
+    assert await cache.get("b") is None
+    assert await cache.get("a") is not None
+    assert cache.stats()["memory_bytes"] <= 1000
+
+
+async def test_oversized_clips_skip_the_memory_tier():
+    cache = TTSCache(memory_max_bytes=1000)
+    await cache.put("small", bytes(100))
+    await cache.put("big", bytes(300))
+    assert await cache.get("big") is None
+    assert cache.stats()["memory_entries"] == 1
+
+
+async def test_disk_tier_is_shared_between_workers(tmp_path):
+    first = TTSCache(disk_dir=str(tmp_path))
+    second = TTSCache(disk_dir=str(tmp_path))
+    await first.put("k" * 64, b"audio")
+    assert await second.get("k" * 64) == b"audio"
+    # Promoted to the second worker's memory tier
+    assert second.stats()["memory_entries"] == 1
+
+
+async def test_disk_tier_evicts_oldest_access(tmp_path):
+    cache = TTSCache(memory_max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=300)
+    keys = [f"{name}" * 64 for name in "abcd"]
+    for age, key in zip((400, 300, 200), keys[:3]):
+        await cache.put(key, bytes(100))
+        os.utime(cache._path(key), (0, os.path.getmtime(cache._path(key)) - age))
+    # Reading "a" makes it the most recently used entry on disk
+    assert await cache.get(keys[0]) is not None
+
+    await cache.put(keys[3], bytes(100))
+    remaining = {key for key in keys if os.path.exists(cache._path(key))}
+    assert remaining == {keys[0], keys[3]}
+    assert cache.stats()["disk_bytes"] == 200
+
+
+async def test_disk_write_failure_is_not_raised(tmp_path, monkeypatch):
+    cache = TTSCache(disk_dir=str(tmp_path))
+
+    def disk_full(key, audio):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(cache, "_disk_put", disk_full)
+    await cache.put("k" * 64, b"audio")
+    assert await cache.get("k" * 64) == b"audio"
@@ -0,0 +1,161 @@
+"""Tests for the binary voice audio endpoint"""
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("jwt")
+
+from fastapi import FastAPI, HTTPException  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+from backend.app.auth.router import get_current_user  # noqa: E402
+from backend.app.mcp import router  # noqa: E402
+from backend.app.mcp.audio import to_wav  # noqa: E402
+from backend.app.mcp.models import MCPResponse  # noqa: E402
+
+REPLY_PCM = bytes(range(256)) * 400  # 100 KiB, several stream chunks
+REPLY_RATE = 16000
+
+
+class FakeRiva:
+    def __init__(self):
+        self.calls = []
+
+    async def process_voice_audio(self, request, audio, language, sample_rate, respond):
+        self.calls.append({"prompt": request.prompt, "audio": bytes(audio), "language": language,
+                           "sample_rate": sample_rate})
+        response = MCPResponse(
+            request_id=request.id,
+            status="success",
+            result={"recognized_text": "make a list", "response_text": "done & dusted", "sample_rate": REPLY_RATE},
+        )
+        return response, memoryview(REPLY_PCM)
+
+
+@pytest.fixture
+def riva(monkeypatch):
+    riva = FakeRiva()
+    service = SimpleNamespace(
+        riva_service=riva,
+        config=SimpleNamespace(max_voice_audio_mb=1, riva=SimpleNamespace(sample_rate=22050)),
+        respond_to_voice=None,
+    )
+    monkeypatch.setattr(router, "enhanced_mcp_service", service)
+    return riva
+
+
+@pytest.fixture
+def client(riva):
+    app = FastAPI()
+    app.include_router(router.mcp_router)
+    app.dependency_overrides[get_current_user] = lambda: {"id": "u1"}
+    with TestClient(app) as client:
+        yield client
+
+
+def test_octet_stream_body(client, riva):
+    response = client.post(
+        "/voice/audio", params={"sample_rate": 8000, "language": "de-DE"},
+        content=b"\x01\x02" * 100, headers={"content-type": "application/octet-stream"},
+    )
+    assert response.status_code == 200
+    assert riva.calls == [{"prompt": "", "audio": b"\x01\x02" * 100, "language": "de-DE", "sample_rate": 8000}]
+    assert response.headers["content-type"] == "audio/wav"
+    assert response.content == to_wav(REPLY_PCM, REPLY_RATE)
+    assert response.headers["x-mcp-recognized-text"] == "make%20a%20list"
+    assert response.headers["x-mcp-response-text"] == "done%20%26%20dusted"
+
+
+def test_multipart_audio_part_and_fields(client, riva):
+    response = client.post(
+        "/voice/audio", params={"prompt": "ignored", "language": "en-US"},
+        files={"audio": ("clip.wav", b"RIFF-ish", "audio/wav")},
+        data={"prompt": "from the form", "language": "fr-FR"},
+    )
+    assert response.status_code == 200
+    assert riva.calls == [{"prompt": "from the form", "audio": b"RIFF-ish", "language": "fr-FR", "sample_rate": None}]
+
+
+def test_multipart_without_audio_part(client, riva):
+    response = client.post("/voice/audio", data={"prompt": "hello"}, files={"other": ("x.bin", b"123")})
+    assert response.status_code == 400
+    assert not riva.calls
+
+
+def test_empty_body_without_prompt(client, riva):
+    response = client.post("/voice/audio", content=b"", headers={"content-type": "application/octet-stream"})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("multipart", [False, True])
+def test_audio_over_the_limit(client, riva, multipart):
+    audio = bytes(1024 * 1024 + 2)
+    if multipart:
+        response = client.post("/voice/audio", files={"audio": ("clip.raw", audio)})
+    else:
+        response = client.post("/voice/audio", content=audio, headers={"content-type": "audio/L16"})
+    assert response.status_code == 413
+    assert not riva.calls
+
+
+@pytest.mark.parametrize("content_type", ["multipart/form-data; boundary=xyz", "application/octet-stream"])
+async def test_size_limit_is_enforced_while_reading(content_type):
+    pulled = 0
+
+    async def receive():
+        nonlocal pulled
+        pulled += 1
+        if pulled == 1:
+            chunk = b'--xyz\r\nContent-Disposition: form-data; name="audio"; filename="a"\r\n\r\n'
+        else:
+            chunk = bytes(64 * 1024)
+        return {"type": "http.request", "body": chunk, "more_body": True}
+
+    scope = {"type": "http", "method": "POST", "headers": [(b"content-type", content_type.encode())]}
+    with pytest.raises(HTTPException) as raised:
+        await router._read_voice_audio(Request(scope, receive), 1024 * 1024)
+    assert raised.value.status_code == 413
+    # Reading stops just past the limit instead of spooling the endless body
+    assert pulled * 64 * 1024 < 1024 * 1024 + router.MULTIPART_OVERHEAD_BYTES + 2 * 64 * 1024
+
+
+def test_streamed_wav_reply(client):
+    response = client.post("/voice/audio", params={"prompt": "hi", "stream": True})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/wav"
+    assert "content-length" not in response.headers
+    assert response.content == to_wav(REPLY_PCM, REPLY_RATE)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_accept_header_picks_the_encoding(client, stream):
+    response = client.post(
+        "/voice/audio", params={"prompt": "hi", "stream": stream},
+        headers={"accept": "audio/flac;q=0, audio/basic, audio/wav;q=0.5"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/basic"
+    assert response.headers["x-mcp-sample-rate"] == "8000"
+    # One µ-law byte per sample at half the reply rate
+    assert abs(len(response.content) - len(REPLY_PCM) // 4) <= 2
+
+
+def test_format_parameter_overrides_accept(client):
+    response = client.post(
+        "/voice/audio", params={"prompt": "hi", "format": "pcm"}, headers={"accept": "audio/basic"}
+    )
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert response.headers["x-mcp-sample-rate"] == str(REPLY_RATE)
+    assert response.content == REPLY_PCM
+
+
+def test_failed_reply_is_a_json_error(client, riva, monkeypatch):
+    async def failing(request, *args, **kwargs):
+        return MCPResponse(request_id=request.id, status="error", error_message="no speech"), b""
+
+    monkeypatch.setattr(riva, "process_voice_audio", failing)
+    response = client.post("/voice/audio", params={"prompt": "hi"})
+    assert response.status_code == 500
+    assert response.json()["error_message"] == "no speech"
@@ -0,0 +1,155 @@
+"""Tests for local voice intent routing"""
+
+import pytest
+
+from backend.app.mcp.models import MCPRequest, MCPTaskType, ProgrammingLanguage
+from backend.app.mcp.voice_intent import (
+    KeywordAutomaton, VoiceIntent, VoiceIntentRouter, derive_request, train_intent_model
+)
+
+
+class FakeModel:
+    def __init__(self, classes, probabilities):
+        self.classes_ = classes
+        self.probabilities = probabilities
+        self.calls = 0
+
+    def predict_proba(self, texts):
+        self.calls += 1
+        return [self.probabilities]
+
+
+class TestKeywordAutomaton:
+    def test_whole_word_matches_only(self):
+        automaton = KeywordAutomaton([("test", "t"), ("he", "he"), ("she", "she")])
+        assert automaton.find("shell she latest test") == [(6, 9, "she"), (17, 21, "t")]
+
+    def test_longest_overlapping_match_wins(self):
+        automaton = KeywordAutomaton([("test", "t"), ("unit test", "ut")])
+        assert automaton.find("a unit test") == [(2, 11, "ut")]
+
+    def test_shared_prefixes_and_suffixes(self):
+        automaton = KeywordAutomaton([("c", 1), ("c++", 2), ("spring", 3), ("spring boot", 4)])
+        assert [value for _, _, value in automaton.find("c++ or spring boot or spring or c")] == [2, 4, 3, 1]
+
+    def test_no_patterns(self):
+        assert KeywordAutomaton([]).find("anything") == []
+
+
+@pytest.fixture
+def router():
+    return VoiceIntentRouter()
+
+
+@pytest.mark.parametrize("text,task_type,language", [
+    ("Help me debug this error", MCPTaskType.DEBUGGING, None),
+    ("write unit tests for the flask app", MCPTaskType.TESTING, ProgrammingLanguage.PYTHON),
+    ("Create a REST API endpoint in Django", MCPTaskType.API_INTEGRATION, ProgrammingLanguage.PYTHON),
+    ("speed up this query", MCPTaskType.CODE_OPTIMIZATION, ProgrammingLanguage.SQL),
+    ("set up github actions to deploy", MCPTaskType.WORKFLOW_AUTOMATION, None),
+    ("debug my go code in go", MCPTaskType.DEBUGGING, ProgrammingLanguage.GO),
+])
+def test_keywords_decide_task_and_language(router, text, task_type, language):
+    intent = router.classify(text)
+    assert intent.task_type == task_type
+    assert intent.language == language
+    assert intent.source == "keywords"
+    assert not intent.is_help
+
+
+def test_slots(router):
+    intent = router.classify("write unit tests for the Flask app in main dot py and utils.py")
+    assert intent.slots == {"frameworks": ["flask"], "files": ["main.py", "utils.py"]}
+
+
+def test_bare_help_is_not_a_task(router):
+    intent = router.classify("What can you do?")
+    assert intent.is_help
+    assert intent.task_type is None
+    assert intent.source == "none"
+
+
+def test_nothing_recognized(router):
+    intent = router.classify("hello there")
+    assert intent.as_dict() == {"task_type": None, "language": None, "slots": {},
+                                "confidence": 0.0, "source": "none"}
+
+
+def test_model_decides_close_calls(router):
+    router._model = FakeModel(["code_generation", "debugging"], [0.2, 0.8])
+    intent = router.classify("optimize and write code")
+    assert intent.task_type == MCPTaskType.DEBUGGING
+    assert intent.source == "model"
+    assert intent.confidence == pytest.approx(0.8)
+
+
+def test_model_is_not_consulted_when_keywords_are_clear(router):
+    router._model = FakeModel(["testing"], [1.0])
+    assert router.classify("debug this traceback").task_type == MCPTaskType.DEBUGGING
+    assert router._model.calls == 0
+
+
+@pytest.mark.parametrize("classes,probabilities", [
+    (["documentation", "testing"], [0.4, 0.3]),  # not confident enough
+    (["voice_command", "testing"], [0.9, 0.1]),  # would loop back to the voice router
+    (["not_a_task", "testing"], [0.9, 0.1]),
+])
+def test_unusable_model_answers_are_ignored(router, classes, probabilities):
+    router._model = FakeModel(classes, probabilities)
+    intent = router.classify("hello there")
+    assert intent.task_type is None
+    assert intent.source == "none"
+
+
+def test_missing_model_file_is_tried_once(tmp_path):
+    pytest.importorskip("joblib")
+    router = VoiceIntentRouter(model_path=str(tmp_path / "missing.joblib"))
+    router.classify("hello there")
+    assert router._model_failed
+    assert router.classify("debug this").task_type == MCPTaskType.DEBUGGING
+
+
+def test_trained_model_round_trip(tmp_path):
+    pytest.importorskip("sklearn")
+    joblib = pytest.importorskip("joblib")
+    texts = ["the page shows a blank screen", "the button does nothing when clicked",
+             "describe the module for new developers", "summarize what this file is for"] * 5
+    labels = ["debugging", "debugging", "documentation", "documentation"] * 5
+    path = tmp_path / "intent.joblib"
+    joblib.dump(train_intent_model(texts, labels), path)
+
+    router = VoiceIntentRouter(model_path=str(path))
+    intent = router.classify("the page shows a blank screen")
+    assert intent.task_type == MCPTaskType.DEBUGGING
+    assert intent.source == "model"
+
+
+def voice_request(**kwargs):
+    return MCPRequest(task_type=MCPTaskType.VOICE_COMMAND, user_id="u1", prompt="", **kwargs)
+
+
+def test_derived_request_carries_the_callers_fields(router):
+    request = voice_request(
+        project_id="p1", priority=3, files=[{"name": "main.py"}], context={"repo": "x"},
+        metadata={"include_voice": True, "audio_format": "opus", "trace": "t1"},
+    )
+    intent = router.classify("fix the bug in main.py using flask")
+    derived = derive_request("fix the bug in main.py using flask", request, intent)
+
+    assert derived.task_type == MCPTaskType.DEBUGGING
+    assert derived.prompt == "fix the bug in main.py using flask"
+    assert (derived.user_id, derived.project_id, derived.priority) == ("u1", "p1", 3)
+    assert derived.files == [{"name": "main.py"}]
+    assert derived.context == {"repo": "x", "voice_slots": intent.slots}
+    assert derived.metadata == {"trace": "t1", "parent_request_id": request.id, "voice_intent": intent.as_dict()}
+    assert request.context == {"repo": "x"}
+
+
+def test_derived_request_has_no_empty_slots():
+    request = voice_request(language=ProgrammingLanguage.GO)
+    intent = VoiceIntent("hello", language=ProgrammingLanguage.PYTHON)
+    derived = derive_request("hello", request, intent, MCPTaskType.CODE_GENERATION)
+
+    assert derived.task_type == MCPTaskType.CODE_GENERATION
+    assert derived.language == ProgrammingLanguage.GO
+    assert derived.context == {}
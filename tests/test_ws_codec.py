@@ -0,0 +1,125 @@
+"""Tests for WebSocket frame codecs and subprotocol negotiation"""
+
+import base64
+import zlib
+
+import pytest
+
+from backend.app.mcp import ws_connection
+from backend.app.mcp.ws_connection import (
+    FLAG_ZLIB,
+    SUBPROTOCOL_JSON,
+    SUBPROTOCOL_MSGPACK,
+    FrameDecodeError,
+    JSONFrameCodec,
+    MsgpackFrameCodec,
+    negotiate_codec,
+)
+
+msgpack = pytest.importorskip("msgpack")
+
+AUDIO = bytes(range(256)) * 8
+
+
+def test_small_frames_are_uncompressed():
+    data = MsgpackFrameCodec().encode({"type": "chunk", "request_id": "r1", "data": "hi"})
+    assert data[0] == 0
+    assert msgpack.unpackb(data[1:], raw=False) == {"type": "chunk", "request_id": "r1", "data": "hi"}
+
+
+def test_text_heavy_frames_are_compressed():
+    frame = {"type": "done", "request_id": "r1", "response": "all work and no play " * 200}
+    data = MsgpackFrameCodec().encode(frame)
+    assert data[0] & FLAG_ZLIB
+    assert msgpack.unpackb(zlib.decompress(data[1:]), raw=False) == frame
+    assert MsgpackFrameCodec.decode(data) == frame
+
+
+def test_base64_fields_travel_as_raw_bytes():
+    frame = {"type": "audio", "request_id": "r1", "audio_data": base64.b64encode(AUDIO).decode()}
+    data = MsgpackFrameCodec().encode(frame)
+    # Audio is not worth compressing
+    assert data[0] == 0
+    assert msgpack.unpackb(data[1:], raw=False)["audio_data"] == AUDIO
+    assert len(data) < len(frame["audio_data"])
+
+
+def test_raw_bytes_fields_are_sent_as_is():
+    # Server-side audio is already raw bytes; it must not trigger compression either
+    data = MsgpackFrameCodec().encode({"type": "audio", "audio_data": AUDIO})
+    assert data[0] == 0
+    assert msgpack.unpackb(data[1:], raw=False)["audio_data"] == AUDIO
+
+
+def test_nested_response_fields_are_converted():
+    voice = base64.b64encode(AUDIO).decode()
+    frame = {"type": "response", "data": {"voice_output": voice, "explanation": "x"}}
+    data = MsgpackFrameCodec().encode(frame)
+    assert msgpack.unpackb(data[1:], raw=False)["data"]["voice_output"] == AUDIO
+    # The caller's frame is left untouched
+    assert frame["data"]["voice_output"] == voice
+
+
+def test_decoded_binary_fields_become_base64():
+    body = msgpack.packb({"type": "request", "voice_input": AUDIO}, use_bin_type=True)
+    frame = MsgpackFrameCodec.decode(b"\x00" + body)
+    assert frame["voice_input"] == base64.b64encode(AUDIO).decode("ascii")
+
+
+def test_invalid_base64_strings_are_left_alone():
+    data = MsgpackFrameCodec().encode({"type": "request", "voice_input": "not base64!"})
+    assert msgpack.unpackb(data[1:], raw=False)["voice_input"] == "not base64!"
+
+
+@pytest.mark.parametrize("data", [b"", b"\x01garbage", b"\x00\xc1"])
+def test_undecodable_frames_raise(data):
+    with pytest.raises(FrameDecodeError):
+        MsgpackFrameCodec.decode(data)
+
+
+def test_non_object_frames_are_returned_for_the_caller_to_reject():
+    assert MsgpackFrameCodec.decode(b"\x00" + msgpack.packb([1, 2])) == [1, 2]
+
+
+def test_negotiate_codec(monkeypatch):
+    codec = negotiate_codec([SUBPROTOCOL_JSON, SUBPROTOCOL_MSGPACK])
+    assert isinstance(codec, MsgpackFrameCodec)
+    assert codec.subprotocol == SUBPROTOCOL_MSGPACK
+    assert negotiate_codec([SUBPROTOCOL_JSON]).subprotocol == SUBPROTOCOL_JSON
+    assert negotiate_codec([]).subprotocol is None
+
+    monkeypatch.setattr(ws_connection, "msgpack", None)
+    assert isinstance(negotiate_codec([SUBPROTOCOL_MSGPACK]), JSONFrameCodec)
+
+
+def test_msgpack_connection_round_trip():
+    from fastapi import FastAPI, WebSocket
+    from fastapi.testclient import TestClient
+
+    from backend.app.mcp.models import MCPSession
+    from backend.app.mcp.ws_connection import MCPWebSocketConnection
+
+    class FakeService:
+        riva_service = None
+
+        async def stream_conversation(self, session_id, message):
+            yield message
+
+    app = FastAPI()
+
+    @app.websocket("/ws")
+    async def endpoint(websocket: WebSocket):
+        codec = negotiate_codec(websocket.scope.get("subprotocols", []))
+        await websocket.accept(subprotocol=codec.subprotocol)
+        await MCPWebSocketConnection(websocket, FakeService(), MCPSession(user_id="u1"), codec=codec).serve()
+
+    codec = MsgpackFrameCodec()
+    with TestClient(app).websocket_connect("/ws", subprotocols=[SUBPROTOCOL_MSGPACK]) as ws:
+        ws.send_bytes(b"\x01garbage")
+        assert MsgpackFrameCodec.decode(ws.receive_bytes())["code"] == "invalid_frame"
+        ws.send_bytes(codec.encode({"type": "continue", "request_id": "t1", "message": "hi"}))
+        assert MsgpackFrameCodec.decode(ws.receive_bytes()) == {"type": "chunk", "request_id": "t1", "data": "hi"}
+        assert MsgpackFrameCodec.decode(ws.receive_bytes())["type"] == "done"
+        # Text frames are still accepted on a binary connection
+        ws.send_text('{"type": "cancel", "request_id": "none"}')
+        assert MsgpackFrameCodec.decode(ws.receive_bytes())["type"] == "error"
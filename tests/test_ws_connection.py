@@ -0,0 +1,142 @@
+"""Tests for multiplexed MCP WebSocket connections"""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+
+from backend.app.mcp.models import MCPResponse, MCPSession
+from backend.app.mcp.ws_connection import MCPWebSocketConnection, negotiate_codec
+
+
+class FakeService:
+    """Requests sleep for the number of seconds in their prompt; turns stream one word at a time"""
+
+    riva_service = None
+
+    async def process_request(self, request):
+        await asyncio.sleep(float(request.prompt))
+        return MCPResponse(request_id=request.id, status="success", explanation=request.prompt)
+
+    async def stream_conversation(self, session_id, message):
+        for word in message.split():
+            await asyncio.sleep(0.05)
+            yield word + " "
+
+
+def make_client(max_in_flight=8):
+    app = FastAPI()
+
+    @app.websocket("/ws")
+    async def endpoint(websocket: WebSocket):
+        codec = negotiate_codec(websocket.scope.get("subprotocols", []))
+        await websocket.accept(subprotocol=codec.subprotocol)
+        connection = MCPWebSocketConnection(websocket, FakeService(), MCPSession(user_id="u1"),
+                                            max_in_flight=max_in_flight, codec=codec)
+        await connection.serve()
+
+    return TestClient(app)
+
+
+def request(request_id, seconds):
+    return {"type": "request", "id": request_id, "task_type": "code_generation", "prompt": str(seconds)}
+
+
+def receive_until(ws, predicate):
+    """Frames up to and including the first one matching ``predicate``"""
+    frames = []
+    while True:
+        frames.append(ws.receive_json())
+        if predicate(frames[-1]):
+            return frames
+
+
+def test_responses_interleave_by_request_id():
+    with make_client().websocket_connect("/ws") as ws:
+        ws.send_json(request("slow", 0.3))
+        ws.send_json(request("fast", 0))
+        frames = receive_until(ws, lambda f: f["type"] == "response" and f["request_id"] == "slow")
+    responses = [f["request_id"] for f in frames if f["type"] == "response"]
+    assert responses == ["fast", "slow"]
+    assert {f["request_id"] for f in frames if f["type"] == "status"} == {"slow", "fast"}
+    assert frames[-1]["data"]["explanation"] == "0.3"
+
+
+def test_cancel_stops_an_in_flight_request():
+    with make_client().websocket_connect("/ws") as ws:
+        ws.send_json(request("r1", 30))
+        assert ws.receive_json()["type"] == "status"
+        ws.send_json({"type": "cancel", "request_id": "r1"})
+        assert ws.receive_json() == {"type": "cancelled", "request_id": "r1"}
+        ws.send_json({"type": "cancel", "request_id": "r1"})
+        assert ws.receive_json()["message"] == "No such request in flight"
+
+
+def test_in_flight_limit_and_duplicate_ids():
+    with make_client(max_in_flight=2).websocket_connect("/ws") as ws:
+        ws.send_json(request("a", 30))
+        ws.send_json(request("a", 30))
+        ws.send_json(request("b", 30))
+        ws.send_json(request("c", 30))
+        errors = [f for f in (ws.receive_json() for _ in range(4)) if f["type"] == "error"]
+    assert [(f["request_id"], f.get("code")) for f in errors] == [("a", None), ("c", "too_many_requests")]
+
+
+def test_invalid_request_is_reported():
+    with make_client().websocket_connect("/ws") as ws:
+        ws.send_json({"type": "request", "id": "bad", "prompt": "x"})
+        frame = ws.receive_json()
+    assert frame["type"] == "error"
+    assert frame["request_id"] == "bad"
+    assert frame["message"].startswith("Invalid request")
+
+
+def test_conversation_turn_streams_chunks():
+    with make_client().websocket_connect("/ws") as ws:
+        ws.send_json({"type": "continue", "request_id": "t1", "message": "one two"})
+        frames = receive_until(ws, lambda f: f["type"] == "done")
+    assert [f["data"] for f in frames if f["type"] == "chunk"] == ["one ", "two "]
+    assert frames[-1] == {"type": "done", "request_id": "t1", "response": "one two "}
+
+
+def test_second_turn_while_one_is_streaming_is_rejected():
+    with make_client().websocket_connect("/ws") as ws:
+        ws.send_json({"type": "continue", "request_id": "t1", "message": "one two three"})
+        ws.send_json({"type": "continue", "request_id": "t2", "message": "four"})
+        frames = receive_until(ws, lambda f: f["type"] == "done")
+        busy = [f for f in frames if f["type"] == "error"]
+        assert [(f["request_id"], f["code"]) for f in busy] == [("t2", "conversation_busy")]
+        assert frames[-1]["response"] == "one two three "
+
+        # Once the turn is done the next one is accepted
+        ws.send_json({"type": "continue", "request_id": "t3", "message": "again"})
+        frames = receive_until(ws, lambda f: f["type"] == "done")
+        assert frames[-1]["request_id"] == "t3"
+
+
+def test_cancelled_turn_frees_the_conversation():
+    with make_client().websocket_connect("/ws") as ws:
+        ws.send_json({"type": "continue", "request_id": "t1", "message": " ".join(["w"] * 100)})
+        assert ws.receive_json()["type"] == "chunk"
+        ws.send_json({"type": "cancel", "request_id": "t1"})
+        receive_until(ws, lambda f: f["type"] == "cancelled")
+        ws.send_json({"type": "continue", "request_id": "t2", "message": "next"})
+        frames = receive_until(ws, lambda f: f["type"] == "done")
+    assert frames[-1]["request_id"] == "t2"
+
+
+@pytest.mark.parametrize("payload", [
+    "not json",
+    "[1, 2]",
+    '{"type": "continue", "request_id": "t1"}',
+])
+def test_malformed_frames_keep_the_connection_serving(payload):
+    with make_client().websocket_connect("/ws") as ws:
+        ws.send_text(payload)
+        frame = ws.receive_json()
+        assert frame["type"] == "error"
+        assert frame["code"] == "invalid_frame"
+        ws.send_json(request("after", 0))
+        frames = receive_until(ws, lambda f: f["type"] == "response")
+    assert frames[-1]["request_id"] == "after"